@@ -0,0 +1,111 @@
+"""
+Cost of decoding and encoding large multi-file torrents, and calculating their info hash.
+
+Run from the repository root::
+
+  python benchmarks/bench_bittorrent.py
+"""
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flexget.utils.bittorrent import Torrent, bdecode, bencode
+
+FILES = 5000
+PIECES = 40000
+REPEAT = 5
+
+
+# Previous tokenizer based codec, for comparison
+def old_tokenize(text, match=re.compile("([idel])|(\d+):|(-?\d+)").match):
+    i = 0
+    while i < len(text):
+        m = match(text, i)
+        s = m.group(m.lastindex)
+        i = m.end()
+        if m.lastindex == 2:
+            yield "s"
+            yield text[i:i + int(s)]
+            i += int(s)
+        else:
+            yield s
+
+
+def old_decode_item(next, token):
+    if token == "i":
+        data = int(next())
+        if next() != "e":
+            raise ValueError
+    elif token == "s":
+        data = next()
+    elif token == "l" or token == "d":
+        data = []
+        tok = next()
+        while tok != "e":
+            data.append(old_decode_item(next, tok))
+            tok = next()
+        if token == "d":
+            data = dict(zip(data[0::2], data[1::2]))
+    else:
+        raise ValueError
+    return data
+
+
+def old_bdecode(text):
+    src = old_tokenize(text)
+    return old_decode_item(src.next, src.next())
+
+
+def old_bencode(data):
+    if isinstance(data, basestring):
+        return "%d:%s" % (len(data), data)
+    if isinstance(data, (int, long)):
+        return "i%de" % data
+    if isinstance(data, list):
+        encoded = "l"
+        for item in data:
+            encoded += old_bencode(item)
+        return encoded + "e"
+    encoded = "d"
+    for key, value in sorted(data.items()):
+        encoded += old_bencode(key)
+        encoded += old_bencode(value)
+    return encoded + "e"
+
+
+def make_torrent():
+    files = [{'length': 1024 * 1024 + i, 'path': ['Some Directory %s' % (i // 100), 'Some File Name %s.ext' % i]}
+             for i in xrange(FILES)]
+    info = {'name': 'Some Torrent', 'piece length': 262144, 'pieces': os.urandom(20 * PIECES), 'files': files}
+    return bencode({'announce': 'http://localhost/announce', 'comment': 'Benchmark', 'info': info})
+
+
+def main():
+    data = make_torrent()
+    decoded = bdecode(data)
+    assert old_bdecode(data) == decoded and old_bencode(decoded) == data
+
+    def info_hash():
+        torrent = Torrent(data)
+        torrent.get_info_hash()
+
+    def old_info_hash():
+        import hashlib
+        hashlib.sha1(old_bencode(old_bdecode(data)['info'])).hexdigest()
+
+    print 'Torrent of %.1f MB with %s files, best of %s:' % (len(data) / 1024.0 / 1024, FILES, REPEAT)
+    for name, func in [('decode (old)', lambda: old_bdecode(data)),
+                       ('decode', lambda: bdecode(data)),
+                       ('encode (old)', lambda: old_bencode(decoded)),
+                       ('encode', lambda: bencode(decoded)),
+                       ('info hash (old)', old_info_hash),
+                       ('info hash', info_hash)]:
+        best = min(timeit.repeat(func, number=1, repeat=REPEAT))
+        print '  %-16s %8.1f ms' % (name, best * 1000)
+
+
+if __name__ == '__main__':
+    main()
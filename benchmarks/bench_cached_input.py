@@ -0,0 +1,55 @@
+"""
+Cost of restoring entries from the @cached memory cache.
+
+Run from the repository root::
+
+  python benchmarks/bench_cached_input.py
+"""
+import os
+import sys
+import copy
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flexget.entry import Entry
+from flexget.utils.cached_input import FrozenEntry
+
+ENTRIES = 10000
+REPEAT = 5
+
+
+def make_entries(count):
+    entries = []
+    for i in xrange(count):
+        entry = Entry(title=u'Some.Series.S01E%02d.720p.HDTV.x264-GRP' % (i % 100),
+                      url=u'http://localhost/torrents/%s.torrent' % i)
+        entry['description'] = u'Some description of the release number %s' % i
+        entry['guid'] = u'http://localhost/details/%s' % i
+        entry['rss_pubdate'] = datetime(2012, 1, 1, 12, 0, i % 60)
+        entry['size'] = 1024 * i
+        entry['urls'] = [entry['url'], u'http://mirror/torrents/%s.torrent' % i]
+        entries.append(entry)
+    return entries
+
+
+def main():
+    entries = make_entries(ENTRIES)
+    deepcopied = copy.deepcopy(entries)
+    frozen = [FrozenEntry(e) for e in entries]
+
+    def hit_deepcopy():
+        return [copy.deepcopy(e) for e in deepcopied]
+
+    def hit_frozen():
+        return [e.thaw() for e in frozen]
+
+    print 'Cache hit for %s entries, best of %s:' % (ENTRIES, REPEAT)
+    for name, func in [('deepcopy', hit_deepcopy), ('frozen', hit_frozen)]:
+        best = min(timeit.repeat(func, number=1, repeat=REPEAT))
+        print '  %-10s %8.1f ms' % (name, best * 1000)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Cost of parsing quality from release titles.
+
+Run from the repository root::
+
+  python benchmarks/bench_qualities.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flexget.utils import qualities
+from flexget.utils.qualities import Quality
+
+TITLES = [
+    'Some.Show.S01E02.720p.HDTV.x264-DIMENSION',
+    'Some.Show.S01E02.HDTV.XviD-LOL',
+    'Some Show S01E02 1080i HDTV DD5.1 MPEG2-TrollHD',
+    'Some.Show.S01E02.PROPER.720p.WEB-DL.DD5.1.H.264-BS',
+    'Some.Show.S01E02.REPACK.480p.HDTV.x264-mSD',
+    'Some_Show_1x02_PDTV_XviD-FQM',
+    '[HorribleSubs] Some Show - 02 [720p].mkv',
+    '[Commie] Some Show - 02 [10bit][1080p][0F3A2C81].mkv',
+    'Some.Show.2012.03.14.Guest.Name.HDTV.x264-2HD',
+    'Some Show - 3x07 - Episode Name (DVDRip)',
+    'Movie.Name.2012.1080p.BluRay.x264-SPARKS',
+    'Movie.Name.2012.720p.BluRay.DTS.x264-HiDt',
+    'Movie Name 2012 DVDRip XviD AC3-BTN',
+    'Movie.Name.2012.DVDSCR.XViD-NYDIC',
+    'Movie.Name.2012.CAM.XViD-26k',
+    'Movie.Name.2012.TS.XViD-TiTAN',
+    'Movie.Name.2012.R5.LiNE.XviD-PSiG',
+    'Movie Name (2012) 1080p BrRip x264 - YIFY',
+    'Movie.Name.2012.BDRip.XviD.AC3-EVO',
+    'Movie.Name.2012.WEBRip.720p.AAC2.0.x264-NoGroup',
+    'Movie.Name.2012.HDRip.XviD.MP3-RARBG',
+    'Movie.Name.2012.1080p.WEB-DL.AAC2.0.H264-FGT',
+    'Movie.Name.2012.PPVRip.XviD-IGUANA',
+    'Movie.Name.2012.LIMITED.DVDRip.XviD-DOCUMENT',
+    'Movie.Name.2012.576p.BluRay.x264-HANDJOB',
+    'Documentary Name 2012 HR HDTV AC3 5.1 XviD-FQM',
+    'Documentary.Name.Part1.DSR.XviD-2HD',
+    'Documentary.Name.Part2.TVRip.XviD-ETACH',
+    'Concert.Name.2012.1080p.BluRay.FLAC.x264-HDC',
+    'Some title without any quality in it',
+]
+REPEAT = 5
+NUMBER = 100
+
+
+def main():
+    def uncached():
+        qualities._parse_cache.clear()
+        for title in TITLES:
+            Quality(title)
+
+    def cached():
+        for title in TITLES:
+            Quality(title)
+
+    print 'Parsing %s titles %s times, best of %s:' % (len(TITLES), NUMBER, REPEAT)
+    for name, func in [('uncached', uncached), ('cached', cached)]:
+        best = min(timeit.repeat(func, number=NUMBER, repeat=REPEAT))
+        print '  %-10s %8.1f us per title' % (name, best * 1000000 / NUMBER / len(TITLES))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Latency of web UI style reads while a task is writing, with default and wal storage profiles.
+
+Run from the repository root::
+
+  python benchmarks/bench_sqlite_profile.py
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import sqlalchemy
+from sqlalchemy.pool import NullPool, QueuePool
+from flexget.manager import DB_LOCK_TIMEOUT, DB_READER_POOL_SIZE, DB_WAL_PRAGMAS
+from flexget.utils.sqlalchemy_utils import set_sqlite_pragmas
+
+READERS = 4
+DURATION = 5
+# rows written per transaction, and pause between rows to mimic a task doing other work
+ROWS = 200
+PAUSE = 0.001
+
+
+def make_engines(uri, profile):
+    if profile == 'wal':
+        writer = sqlalchemy.create_engine(uri, poolclass=NullPool, connect_args={'timeout': DB_LOCK_TIMEOUT})
+        set_sqlite_pragmas(writer, DB_WAL_PRAGMAS)
+        reader = sqlalchemy.create_engine(uri, poolclass=QueuePool, pool_size=DB_READER_POOL_SIZE,
+                                          connect_args={'timeout': DB_LOCK_TIMEOUT, 'check_same_thread': False})
+        set_sqlite_pragmas(reader, DB_WAL_PRAGMAS)
+    else:
+        writer = reader = sqlalchemy.create_engine(uri, poolclass=NullPool)
+    return writer, reader
+
+
+def run(profile):
+    tmpdir = tempfile.mkdtemp()
+    try:
+        uri = 'sqlite:///%s' % os.path.join(tmpdir, 'bench.sqlite')
+        writer, reader = make_engines(uri, profile)
+        writer.execute('CREATE TABLE seen (id INTEGER PRIMARY KEY, title VARCHAR, task VARCHAR)')
+        stop = threading.Event()
+        latencies = []
+        errors = [0]
+
+        def write():
+            while not stop.is_set():
+                conn = writer.connect()
+                trans = conn.begin()
+                for i in xrange(ROWS):
+                    conn.execute('INSERT INTO seen (title, task) VALUES (?, ?)', ('Some.Title.%s' % i, 'bench'))
+                    time.sleep(PAUSE)
+                trans.commit()
+                conn.close()
+
+        def read():
+            while not stop.is_set():
+                start = time.time()
+                try:
+                    reader.execute('SELECT count(*) FROM seen WHERE task = ?', ('bench',)).scalar()
+                except sqlalchemy.exc.OperationalError:
+                    errors[0] += 1
+                latencies.append(time.time() - start)
+
+        threads = [threading.Thread(target=write)] + [threading.Thread(target=read) for i in xrange(READERS)]
+        for thread in threads:
+            thread.start()
+        time.sleep(DURATION)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        writer.dispose()
+        reader.dispose()
+        latencies.sort()
+        return len(latencies), latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)], errors[0]
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def main():
+    print '%s readers during %s seconds of task writes:' % (READERS, DURATION)
+    for profile in ['default', 'wal']:
+        reads, median, p99, errors = run(profile)
+        print '  %-10s %8s reads, median %8.3f ms, 99%% %8.3f ms, %s errors' % \
+            (profile, reads, median * 1000, p99 * 1000, errors)
+
+
+if __name__ == '__main__':
+    main()
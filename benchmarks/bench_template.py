@@ -0,0 +1,73 @@
+"""
+Cost of rendering typical path templates against entries.
+
+Run from the repository root::
+
+  python benchmarks/bench_template.py
+"""
+import os
+import sys
+import timeit
+from copy import copy
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flexget.entry import Entry
+from flexget.utils import template
+from flexget.utils.template import render_from_entry
+
+ENTRIES = 10000
+REPEAT = 2
+TEMPLATES = [
+    '/storage/tv/{{series_name}}/Season {{series_season}}',
+    '/storage/tv/{{series_name|pathscrub}}/S{{series_season|pad(2)}}E{{series_episode|pad(2)}}',
+    '/storage/movies/%(imdb_name)s (%(imdb_year)s)',
+    '/storage/downloads',
+]
+
+
+class FakeManager(object):
+    config_base = os.path.dirname(__file__)
+
+
+def make_entries(count):
+    entries = []
+    for i in xrange(count):
+        entry = Entry(title=u'Some.Series.S01E%02d.720p.HDTV.x264-GRP' % (i % 100),
+                      url=u'http://localhost/torrents/%s.torrent' % i)
+        entry['series_name'] = u'Some Series %s' % (i % 50)
+        entry['series_season'] = 1
+        entry['series_episode'] = i % 100
+        entry['imdb_name'] = u'Some Movie %s' % i
+        entry['imdb_year'] = 2012
+        entries.append(entry)
+    return entries
+
+
+def old_render(template_string, entry):
+    """Previous implementation, compiling the template and copying the entry for every render."""
+    compiled = template.environment.from_string(template_string)
+    variables = copy(entry)
+    variables['now'] = datetime.now()
+    result = u''.join(compiled.root_render_func(compiled.new_context(variables, shared=True)))
+    if result == template_string:
+        result = template_string % entry
+    return result
+
+
+def main():
+    template.make_environment(FakeManager())
+    entries = make_entries(ENTRIES)
+
+    print 'Rendering %s entries, best of %s:' % (ENTRIES, REPEAT)
+    for template_string in TEMPLATES:
+        print '  %s' % template_string
+        for name, func in [('previous', old_render), ('current', render_from_entry)]:
+            best = min(timeit.repeat(lambda: [func(template_string, entry) for entry in entries],
+                                     number=1, repeat=REPEAT))
+            print '    %-10s %8.1f ms' % (name, best * 1000)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,9 +4,10 @@ import os
 import sys
 import logging
 from flexget import logger
-from flexget.options import CoreArgumentParser
+from flexget.options import CoreArgumentParser, get_config_option
 from flexget import plugin
-from flexget.manager import Manager
+from flexget.manager import Manager, find_config_file
+from flexget.utils import startup_profile
 
 __version__ = '{subversion}'
 
@@ -18,19 +19,29 @@ def main():
 
     logger.initialize()
 
+    # options are parsed only after plugins have been loaded, which is already profiled
+    startup_profile.enabled = any(arg.startswith('--profile-startup') for arg in sys.argv[1:])
+
     parser = CoreArgumentParser()
-    plugin.load_plugins(parser)
+    # plugin manifest is kept in the config directory, which must be found before plugins add their options
+    config = find_config_file(get_config_option())
+    plugin.load_plugins(parser, config_base=config and os.path.normpath(os.path.dirname(config)))
 
     options = parser.parse_args()
 
     try:
-        manager = Manager(options)
+        manager = startup_profile.timed('startup', 'manager init', Manager, options)
     except IOError, e:
         # failed to load config, TODO: why should it be handled here? So sys.exit isn't called in webui?
         log.critical(e)
         logger.flush_logging_to_console()
         sys.exit(1)
 
+    if options.profile_startup:
+        startup_profile.report()
+    if options.profile_startup_json:
+        startup_profile.dump(options.profile_startup_json)
+
     log_level = logging.getLevelName(options.loglevel.upper())
     log_file = os.path.expanduser(manager.options.logfile)
     # If an absolute path is not specified, use the config directory.
@@ -83,7 +83,7 @@ class Entry(dict):
         if self.rejected:
             log.debug('tried to accept rejected %r' % self)
         elif not self.accepted:
-            self._state = 'accepted'
+            self._set_state('accepted')
             # Run on_entry_accept phase
             self.task._run_entry_phase('accept', self, reason=reason, **kwargs)
 
@@ -95,18 +95,24 @@ class Entry(dict):
             self.task.trace(self, 'Tried to reject immortal %s' % reason_str)
             return
         if not self.rejected:
-            self._state = 'rejected'
+            self._set_state('rejected')
             # Run on_entry_reject phase
             self.task._run_entry_phase('reject', self, reason=reason, **kwargs)
 
     def fail(self, reason=None, **kwargs):
         log.debug('Marking entry \'%s\' as failed' % self['title'])
         if not self.failed:
-            self._state = 'failed'
+            self._set_state('failed')
             log.error('Failed %s (%s)' % (self['title'], reason))
             # Run on_entry_fail phase
             self.task._run_entry_phase('fail', self, reason=reason, **kwargs)
 
+    def _set_state(self, state):
+        old_state, self._state = self._state, state
+        # keep state index of task entries up to date
+        if self.task:
+            self.task.all_entries.state_changed(self, old_state)
+
     @property
     def accepted(self):
         return self._state == 'accepted'
@@ -5,7 +5,23 @@ import logging
 
 log = logging.getLogger('event')
 
+# name -> list of Events ordered by priority. Lists are replaced instead of modified, so that handlers being fired
+# are not affected by handlers added or removed meanwhile.
 _events = {}
+# Changes whenever handlers are added, removed or their priorities change, orderings of handlers can be cached by it
+_version = 0
+
+
+def _changed():
+    global _version
+    _version += 1
+
+
+def get_version():
+    """
+    :return: Number which changes whenever event handlers are added, removed or their priorities change
+    """
+    return _version
 
 
 class Event(object):
@@ -16,6 +32,18 @@ class Event(object):
         self.func = func
         self.priority = priority
 
+    def _get_priority(self):
+        return self._priority
+
+    def _set_priority(self, priority):
+        self._priority = priority
+        events = _events.get(self.name)
+        if events and any(event is self for event in events):
+            _events[self.name] = sorted(events, reverse=True)
+        _changed()
+
+    priority = property(_get_priority, _set_priority)
+
     def __call__(self, *args, **kwargs):
         return self.func(*args, **kwargs)
 
@@ -51,10 +79,19 @@ def get_events(name):
     """
     if not name in _events:
         raise KeyError('No such event %s' % name)
-    _events[name].sort(reverse=True)
     return _events[name]
 
 
+def has_listeners(name):
+    """
+    Cheap check for call sites which would otherwise build arguments for an event nobody listens.
+
+    :param string name: Event name
+    :return: True if any handler is registered to *name*
+    """
+    return bool(_events.get(name))
+
+
 def add_event_handler(name, func, priority=128):
     """
     :param string name: Event name
@@ -64,22 +101,39 @@ def add_event_handler(name, func, priority=128):
     :rtype: Event
     :raises Exception: If *func* is already registered in an event
     """
-    events = _events.setdefault(name, [])
+    events = _events.get(name, [])
     for event in events:
         if event.func == func:
             raise Exception('%s has already been registered as event listener under name %s' % (func.__name__, name))
     log.trace('registered function %s to event %s' % (func.__name__, name))
     event = Event(name, func, priority)
-    events.append(event)
+    # after handlers with same priority, so that handlers run in registration order
+    index = len(events)
+    for i, other in enumerate(events):
+        if other.priority < priority:
+            index = i
+            break
+    _events[name] = events[:index] + [event] + events[index:]
+    _changed()
     return event
 
 
 def remove_event_handler(name, func):
     """
-    .. warning:: Not implemented!
+    :param string name: Event name
+    :param function func: Function previously registered to *name*
+    :raises ValueError: If *func* is not registered in an event
     """
-    # TODO: implement
-    raise NotImplementedError
+    events = _events.get(name, [])
+    remaining = [event for event in events if event.func != func]
+    if len(remaining) == len(events):
+        raise ValueError('%s is not registered as event listener under name %s' % (func.__name__, name))
+    log.trace('removed function %s from event %s' % (func.__name__, name))
+    if remaining:
+        _events[name] = remaining
+    else:
+        del _events[name]
+    _changed()
 
 
 def fire_event(name, *args, **kwargs):
@@ -90,7 +144,8 @@ def fire_event(name, *args, **kwargs):
     :param args: List of arguments passed to handler function
     :param kwargs: Key Value arguments passed to handler function
     """
-    if not name in _events:
+    events = _events.get(name)
+    if not events:
         return
-    for event in get_events(name):
+    for event in events:
         event(*args, **kwargs)
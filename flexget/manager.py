@@ -1,23 +1,47 @@
 import os
 import sys
+import time
 import shutil
 import logging
 import yaml
 import atexit
+import threading
+import itertools
+from Queue import Queue, Empty
 from datetime import datetime, timedelta
 import sqlalchemy
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.pool import SingletonThreadPool
-from flexget.event import fire_event
+from sqlalchemy.pool import SingletonThreadPool, NullPool, QueuePool
+from flexget.event import fire_event, get_events, has_listeners
 from flexget import validator
+from flexget.utils.startup_profile import timed, record
+from flexget.utils.sqlalchemy_utils import set_sqlite_pragmas
 
 log = logging.getLogger('manager')
 
 Base = declarative_base()
 Session = sessionmaker()
+# Sessions for short lived, mostly reading work like web UI requests, see :attr:`Manager.reader_engine`
+ReaderSession = sessionmaker()
 manager = None
 DB_CLEANUP_INTERVAL = timedelta(days=7)
+# Seconds a cron run may spend on database cleanup, unfinished cleanup jobs are continued on next run
+DB_CLEANUP_TIME = 60
+# Seconds to wait for other connections to release the database lock, when executing tasks concurrently
+DB_LOCK_TIMEOUT = 300
+# Number of connections kept open for readers with wal storage profile
+DB_READER_POOL_SIZE = 4
+# SQLite settings of wal storage profile
+DB_WAL_PRAGMAS = [
+    # readers do not block writer and writer does not block readers
+    ('journal_mode', 'WAL'),
+    # with WAL database cannot get corrupted on power loss with NORMAL, last commits may be lost though
+    ('synchronous', 'NORMAL'),
+    # negative value is in KiB
+    ('cache_size', -16000),
+    ('mmap_size', 64 * 1024 * 1024),
+    ('temp_store', 'MEMORY')]
 
 # Validator that handles root structure of config.
 _config_validator = validator.factory('dict')
@@ -53,6 +77,56 @@ def useExecLogging(func):
     return wrapper
 
 
+def config_search_paths(config):
+    """
+    :param config: Configuration file given with -c
+    :return: List of paths where configuration file is looked from, in order
+    """
+    startup_path = os.path.dirname(os.path.abspath(sys.path[0]))
+    home_path = os.path.join(os.path.expanduser('~'), '.flexget')
+    current_path = os.getcwd()
+    exec_path = sys.path[0]
+
+    config_path = os.path.dirname(config)
+    path_given = config_path != ''
+
+    possible = []
+    if path_given:
+        # explicit path given, don't try anything too fancy
+        possible.append(config)
+    else:
+        log.debug('Figuring out config load paths')
+        # normal lookup locations
+        possible.append(startup_path)
+        possible.append(home_path)
+        if sys.platform.startswith('win'):
+            # On windows look in ~/flexget as well, as explorer does not let you create a folder starting with a dot
+            possible.append(os.path.join(os.path.expanduser('~'), 'flexget'))
+        else:
+            # The freedesktop.org standard config location
+            xdg_config = os.environ.get('XDG_CONFIG_HOME', os.path.join(os.path.expanduser('~'), '.config'))
+            possible.append(os.path.join(xdg_config, 'flexget'))
+        # for virtualenv / dev sandbox
+        from flexget import __version__ as version
+        if version == '{subversion}':
+            log.debug('Running subversion, adding virtualenv / sandbox paths')
+            possible.append(os.path.join(exec_path, '..'))
+            possible.append(current_path)
+            possible.append(exec_path)
+    return possible
+
+
+def find_config_file(config):
+    """
+    :param config: Configuration file given with -c
+    :return: Path of the configuration file, or None if it was not found from :func:`config_search_paths`
+    """
+    for path in config_search_paths(config):
+        config_file = os.path.join(path, config)
+        if os.path.exists(config_file):
+            return config_file
+
+
 class Manager(object):
 
     """Manager class for FlexGet
@@ -96,6 +170,7 @@ class Manager(object):
         self.config_name = None
         self.db_filename = None
         self.engine = None
+        self.reader_engine = None
         self.lockfile = None
         self.database_uri = None
         self.db_upgraded = False
@@ -107,17 +182,17 @@ class Manager(object):
 
         # cannot be imported at module level because of circular references
         from flexget.utils.simple_persistence import SimplePersistence
-        self.persist = SimplePersistence('manager')
+        self.persist = timed('startup', 'load persistence', SimplePersistence, 'manager')
 
         log.debug('sys.defaultencoding: %s' % sys.getdefaultencoding())
         log.debug('sys.getfilesystemencoding: %s' % sys.getfilesystemencoding())
         log.debug('os.path.supports_unicode_filenames: %s' % os.path.supports_unicode_filenames)
 
-        fire_event('manager.upgrade', self)
+        timed('startup', 'schema upgrades', fire_event, 'manager.upgrade', self)
         if manager.db_upgraded:
             fire_event('manager.db_upgraded', self)
-        fire_event('manager.startup', self)
-        self.db_cleanup()
+        timed('startup', 'manager.startup event', fire_event, 'manager.startup', self)
+        timed('startup', 'db cleanup', self.db_cleanup)
 
     def __del__(self):
         global manager
@@ -126,15 +201,15 @@ class Manager(object):
     def initialize(self):
         """Separated from __init__ so that unit tests can modify options before loading config."""
         self.setup_yaml()
-        self.find_config()
+        timed('startup', 'find and load config', self.find_config)
         self.acquire_lock()
-        self.init_sqlalchemy()
-        errors = self.validate_config()
+        timed('startup', 'init sqlalchemy', self.init_sqlalchemy)
+        errors = timed('startup', 'validate config', self.validate_config)
         if errors:
             for error in errors:
                 log.critical(error)
             return
-        self.create_tasks()
+        timed('startup', 'create tasks', self.create_tasks)
 
     def setup_yaml(self):
         """ Set up the yaml loader to return unicode objects for strings by default
@@ -165,45 +240,12 @@ class Manager(object):
 
     def find_config(self):
         """Find the configuration file and then call :meth:`.load_config` to load it"""
-        startup_path = os.path.dirname(os.path.abspath(sys.path[0]))
-        home_path = os.path.join(os.path.expanduser('~'), '.flexget')
-        current_path = os.getcwd()
-        exec_path = sys.path[0]
-
-        config_path = os.path.dirname(self.options.config)
-        path_given = config_path != ''
-
-        possible = []
-        if path_given:
-            # explicit path given, don't try anything too fancy
-            possible.append(self.options.config)
-        else:
-            log.debug('Figuring out config load paths')
-            # normal lookup locations
-            possible.append(startup_path)
-            possible.append(home_path)
-            if sys.platform.startswith('win'):
-                # On windows look in ~/flexget as well, as explorer does not let you create a folder starting with a dot
-                possible.append(os.path.join(os.path.expanduser('~'), 'flexget'))
-            else:
-                # The freedesktop.org standard config location
-                xdg_config = os.environ.get('XDG_CONFIG_HOME', os.path.join(os.path.expanduser('~'), '.config'))
-                possible.append(os.path.join(xdg_config, 'flexget'))
-            # for virtualenv / dev sandbox
-            from flexget import __version__ as version
-            if version == '{subversion}':
-                log.debug('Running subversion, adding virtualenv / sandbox paths')
-                possible.append(os.path.join(exec_path, '..'))
-                possible.append(current_path)
-                possible.append(exec_path)
-
-        for path in possible:
-            config = os.path.join(path, self.options.config)
-            if os.path.exists(config):
-                log.debug('Found config: %s' % config)
-                self.load_config(config)
-                return
-        log.info('Tried to read from: %s' % ', '.join(possible))
+        config = find_config_file(self.options.config)
+        if config:
+            log.debug('Found config: %s' % config)
+            self.load_config(config)
+            return
+        log.info('Tried to read from: %s' % ', '.join(config_search_paths(self.options.config)))
         raise IOError('Failed to find configuration file %s' % self.options.config)
 
     def load_config(self, config):
@@ -217,9 +259,9 @@ class Manager(object):
         """
         if not self.options.quiet:
             # pre-check only when running without --cron
-            self.pre_check_config(config)
+            timed('startup', 'pre-check config', self.pre_check_config, config)
         try:
-            self.config = yaml.safe_load(file(config)) or {}
+            self.config = timed('startup', 'parse config', yaml.safe_load, file(config)) or {}
         except Exception, e:
             log.critical(e)
             print ''
@@ -412,12 +454,42 @@ class Manager(object):
             filename = self.db_filename.replace('\\', '\\\\')
             self.database_uri = 'sqlite:///%s' % filename
 
+        poolclass = SingletonThreadPool
+        connect_args = {}
+        if self.options.workers > 1 and not self.in_memory_database:
+            # tasks executed concurrently use connections from multiple threads, SingletonThreadPool would
+            # close connections still in use by running tasks once pool size is exceeded
+            poolclass = NullPool
+            # wait for other tasks to commit instead of failing immediately on locked database
+            connect_args['timeout'] = DB_LOCK_TIMEOUT
+
+        wal = self.options.db_profile == 'wal' and self.database_uri.startswith('sqlite') and \
+              not self.in_memory_database
+        if wal:
+            # retry on busy database instead of failing right away
+            connect_args['timeout'] = DB_LOCK_TIMEOUT
+
         # fire up the engine
         log.debug('Connecting to: %s' % self.database_uri)
         try:
             self.engine = sqlalchemy.create_engine(self.database_uri,
                                                    echo=self.options.debug_sql,
-                                                   poolclass=SingletonThreadPool)
+                                                   poolclass=poolclass,
+                                                   connect_args=connect_args)
+            if wal:
+                log.debug('Using wal storage profile')
+                set_sqlite_pragmas(self.engine, DB_WAL_PRAGMAS)
+                # Separate pool of connections for readers, so they don't have to wait for connection of a
+                # long running task. Pool hands connections to one thread at a time.
+                self.reader_engine = sqlalchemy.create_engine(self.database_uri,
+                                                              echo=self.options.debug_sql,
+                                                              poolclass=QueuePool,
+                                                              pool_size=DB_READER_POOL_SIZE,
+                                                              connect_args={'timeout': DB_LOCK_TIMEOUT,
+                                                                            'check_same_thread': False})
+                set_sqlite_pragmas(self.reader_engine, DB_WAL_PRAGMAS)
+            else:
+                self.reader_engine = self.engine
         except ImportError:
             print >> sys.stderr, ('FATAL: Unable to use SQLite. Are you running Python 2.5 - 2.7 ?\n'
             'Python should normally have SQLite support built in.\n'
@@ -425,12 +497,13 @@ class Manager(object):
             'You can try installing `pysqlite`. If you have compiled python yourself, recompile it with SQLite support.')
             sys.exit(1)
         Session.configure(bind=self.engine)
+        ReaderSession.configure(bind=self.reader_engine)
         # create all tables, doesn't do anything to existing tables
         from sqlalchemy.exc import OperationalError
         try:
             if self.options.reset or self.options.del_db:
                 Base.metadata.drop_all(bind=self.engine)
-            Base.metadata.create_all(bind=self.engine)
+            timed('startup', 'create tables', Base.metadata.create_all, bind=self.engine)
         except OperationalError, e:
             if os.path.exists(self.db_filename):
                 print >> sys.stderr, '%s - make sure you have write permissions to file %s' % (e.message, self.db_filename)
@@ -438,6 +511,11 @@ class Manager(object):
                 print >> sys.stderr, '%s - make sure you have write permissions to directory %s' % (e.message, self.config_base)
             raise Exception(e.message)
 
+    @property
+    def in_memory_database(self):
+        """True if database only exists in memory and cannot be shared between connections."""
+        return self.database_uri in ['sqlite://', 'sqlite:///:memory:']
+
     def check_lock(self):
         """Checks if there is already a lock, returns True if there is."""
         if os.path.exists(self.lockfile):
@@ -589,41 +667,181 @@ class Manager(object):
         fire_event('manager.execute.started', self)
         self.process_start(tasks=run_tasks)
 
-        for task in sorted(run_tasks):
-            if not task.enabled or task._abort:
-                continue
-            try:
-                task.execute(disable_phases=disable_phases, entries=entries)
-            except Exception, e:
-                task.enabled = False
-                log.exception('Task %s: %s' % (task.name, e))
-            except KeyboardInterrupt:
-                # show real stack trace in debug mode
-                if self.options.debug:
-                    raise
-                print '**** Keyboard Interrupt ****'
-                return
+        workers = self.options.workers
+        if workers > 1 and self.in_memory_database:
+            log.warning('Tasks cannot be executed concurrently when using in-memory database')
+            workers = 1
+        if workers > 1 and entries:
+            log.debug('Tasks are executed sequentially, entries cannot be shared between concurrent tasks')
+            workers = 1
+
+        try:
+            if workers > 1:
+                self.execute_concurrently(run_tasks, workers, disable_phases=disable_phases)
+            else:
+                for task in sorted(run_tasks):
+                    self.execute_task(task, disable_phases=disable_phases, entries=entries)
+        except KeyboardInterrupt:
+            # show real stack trace in debug mode
+            if self.options.debug:
+                raise
+            print '**** Keyboard Interrupt ****'
+            return
 
         self.process_end(tasks=run_tasks)
         fire_event('manager.execute.completed', self)
 
+    def execute_task(self, task, disable_phases=None, entries=None):
+        """Execute single task, disables task if it raises unhandled exception.
+
+        :param Task task: :class:`~flexget.task.Task` instance to be executed
+        :param list disable_phases: Optional list of phases to disabled
+        :param list entries: Optional list of entries to pass into task
+        """
+        if not task.enabled or task._abort:
+            return
+        try:
+            task.execute(disable_phases=disable_phases, entries=entries)
+        except Exception, e:
+            task.enabled = False
+            log.exception('Task %s: %s' % (task.name, e))
+
+    def execute_concurrently(self, tasks, workers, disable_phases=None):
+        """Execute tasks using a pool of worker threads.
+
+        Tasks are grouped by their priority. Tasks within a group are executed concurrently, while groups
+        are executed in priority order, ie. all tasks with lower priority value have completed before tasks
+        with higher value are started.
+
+        Each task uses it's own database session, since sessions are created by the task itself. Tasks using
+        plugins which cannot be used concurrently (see :class:`~flexget.plugin.PluginInfo`) are executed one at
+        a time after other tasks of their group.
+
+        :param list tasks: List of :class:`~flexget.task.Task` instances to execute
+        :param int workers: Maximum number of tasks to execute at the same time
+        :param list disable_phases: Optional list of phases to disabled
+        """
+        from flexget import logger
+        from flexget.plugin import load_plugins_for_config, get_plugins_for_config
+        # plugins must not be registered while worker threads are using them
+        load_plugins_for_config(self.config)
+        for task in tasks:
+            load_plugins_for_config(task.config)
+        # execution name is thread local, pass it to worker threads
+        execution = getattr(logger.FlexGetLogger.local, 'execution', '')
+        interrupted = threading.Event()
+
+        def worker(queue):
+            logger.set_execution(execution)
+            while not interrupted.is_set():
+                try:
+                    task = queue.get_nowait()
+                except Empty:
+                    return
+                self.execute_task(task, disable_phases=disable_phases)
+
+        def concurrent(task):
+            return all(p.concurrent for p in itertools.chain(task.plugins(), get_plugins_for_config(task.config)))
+
+        for priority, group in itertools.groupby(sorted(tasks), key=lambda task: task.priority):
+            queue = Queue()
+            serial = []
+            for task in group:
+                if concurrent(task):
+                    queue.put(task)
+                else:
+                    serial.append(task)
+            if serial:
+                log.debug('Tasks %s use plugins which cannot be used concurrently, executing them one at a time' %
+                          ', '.join(task.name for task in serial))
+            log.debug('Executing %s tasks with priority %s using %s workers' %
+                      (queue.qsize(), priority, min(workers, queue.qsize())))
+            threads = []
+            for i in xrange(min(workers, queue.qsize())):
+                thread = threading.Thread(target=worker, name='task-worker-%s' % i, args=(queue,))
+                thread.daemon = True
+                thread.start()
+                threads.append(thread)
+            try:
+                for thread in threads:
+                    # join with timeout, otherwise main thread would not receive KeyboardInterrupt
+                    while thread.is_alive():
+                        thread.join(0.1)
+            except KeyboardInterrupt:
+                # let running tasks finish, but do not start new ones
+                interrupted.set()
+                raise
+            for task in serial:
+                self.execute_task(task, disable_phases=disable_phases)
+
     def db_cleanup(self):
-        """ Perform database cleanup if cleanup interval has been met.
+        """ Perform database cleanup if cleanup interval has been met, or continue unfinished cleanup.
+
+        Each `manager.db_cleanup` event handler is a cleanup job, run with its own session. Jobs are run until
+        :data:`DB_CLEANUP_TIME` is used, jobs done so far are remembered in :attr:`persist` and remaining ones
+        continued on next run. A job returning False has more work to do and is run again on next run.
         """
-        if (self.options.db_cleanup or not self.persist.get('last_cleanup') or
+        done = self.persist.get('db_cleanup_done')
+        if (self.options.db_cleanup or done is not None or not self.persist.get('last_cleanup') or
             self.persist['last_cleanup'] < datetime.now() - DB_CLEANUP_INTERVAL):
             if not self.options.db_cleanup and not self.options.quiet:
                 log.verbose('Not running database cleanup on manual run. It will be run on next --cron run.')
                 return
-            log.info('Running database cleanup.')
-            session = Session()
-            fire_event('manager.db_cleanup', session)
-            session.commit()
-            session.close()
-            self.persist['last_cleanup'] = datetime.now()
+            if done is None:
+                log.info('Running database cleanup.')
+            else:
+                log.info('Continuing database cleanup.')
+            if self.run_cleanup_jobs(set(done or [])):
+                self.persist['last_cleanup'] = datetime.now()
+                if done is not None:
+                    del self.persist['db_cleanup_done']
         else:
             log.debug('Not running db cleanup, last run %s' % self.persist.get('last_cleanup'))
 
+    def run_cleanup_jobs(self, done):
+        """
+        :param set done: Names of jobs already done during this cleanup
+        :return: True if all jobs are done
+        """
+        from flexget.utils import database
+
+        if not has_listeners('manager.db_cleanup'):
+            return True
+        # cleanup forced by user is run to the end
+        if not self.options.db_cleanup:
+            database.cleanup_deadline = time.time() + DB_CLEANUP_TIME
+        try:
+            for handler in get_events('manager.db_cleanup'):
+                job = '%s.%s' % (handler.func.__module__, handler.func.__name__)
+                if job in done:
+                    continue
+                if not database.cleanup_time_left():
+                    break
+                start = time.time()
+                session = Session()
+                try:
+                    finished = handler(session) is not False
+                    session.commit()
+                except Exception, e:
+                    log.error('Database cleanup job %s failed: %s' % (job, e))
+                    log.debug('Traceback:', exc_info=True)
+                    finished = True
+                finally:
+                    session.close()
+                took = time.time() - start
+                record('cleanup', job, took)
+                log.verbose('Cleanup job %s took %.2f seconds' % (job, took))
+                if not finished:
+                    break
+                done.add(job)
+            else:
+                return True
+        finally:
+            database.cleanup_deadline = None
+        log.info('Database cleanup did not finish in %s seconds, it will be continued on next run.' % DB_CLEANUP_TIME)
+        self.persist['db_cleanup_done'] = sorted(done)
+        return False
+
     def shutdown(self):
         """ Application is being exited
         """
@@ -631,6 +849,8 @@ class Manager(object):
         if not self.unit_test: # don't scroll "nosetests" summary results when logging is enabled
             log.debug('Shutting down')
         self.engine.dispose()
+        if self.reader_engine is not self.engine:
+            self.reader_engine.dispose()
         # remove temporary database used in test mode
         if self.options.test:
             if not 'test' in self.db_filename:
@@ -13,6 +13,13 @@ def required_length(nmin,nmax):
     return RequiredLength
 
 
+def get_config_option(args=None):
+    """Returns configuration file given with -c, parsed before plugins have added their options."""
+    parser = ArgParser(add_help=False)
+    parser.add_argument('-c', dest='config', default='config.yml')
+    return parser.parse_known_args(args)[0].config
+
+
 class ArgumentParser(ArgParser):
     """Contains all the options that both the core and webui should have"""
 
@@ -47,6 +54,10 @@ class ArgumentParser(ArgParser):
         self.add_argument('--del-db', action='store_true', dest='del_db', default=False,
                         help=SUPPRESS)
         self.add_argument('--profile', action='store_true', default=False, help=SUPPRESS)
+        self.add_argument('--profile-startup', action='store_true', dest='profile_startup', default=False,
+                          help='Print report of where time went during startup.')
+        self.add_argument('--profile-startup-json', dest='profile_startup_json', metavar='FILE',
+                          help='Write startup timings as JSON into FILE.')
 
     def add_argument(self, *args, **kwargs):
         if isinstance(kwargs.get('nargs'), basestring) and '-' in kwargs['nargs']:
@@ -103,6 +114,13 @@ class CoreArgumentParser(ArgumentParser):
                         help='Disables stdout and stderr output, log file used. Reduces logging level slightly.')
         self.add_argument('--db-cleanup', action='store_true', dest='db_cleanup', default=False,
                         help='Forces the database cleanup event to run right now.')
+        self.add_argument('--workers', action='store', type=int, dest='workers', default=1, metavar='NUM',
+                        help='Execute up to NUM tasks concurrently. Tasks with different priorities are still '
+                             'executed in priority order. Default is 1.')
+        self.add_argument('--db-profile', action='store', dest='db_profile', default='default',
+                        choices=['default', 'wal'],
+                        help='SQLite storage profile. wal lets web UI and other readers work while tasks are '
+                             'writing, and tunes cache and sync settings. Default is default.')
 
         # Plugins should respect this flag and retry where appropriate
         self.add_argument('--retry', action='store_true', dest='retry', default=0, help=SUPPRESS)
@@ -7,14 +7,16 @@ import os
 import re
 import logging
 import time
+import threading
 from requests import RequestException
-from event import add_event_handler as add_phase_handler
+from event import add_event_handler as add_phase_handler, get_version as get_events_version
+from flexget.utils import startup_profile
 
 log = logging.getLogger('plugin')
 
 __all__ = ['PluginWarning', 'PluginError', 'register_plugin', 'register_parser_option', 'register_task_phase',
            'get_plugin_by_name', 'get_plugins_by_group', 'get_plugin_keywords', 'get_plugins_by_phase',
-           'get_phases_by_plugin', 'internet', 'priority']
+           'get_phases_by_plugin', 'get_loaded_plugins', 'load_all_plugins', 'internet', 'priority']
 
 
 class DependencyError(Exception):
@@ -185,6 +187,28 @@ _parser = None
 _loaded_plugins = {}
 _plugin_options = []
 _new_phase_queue = {}
+# Changes whenever plugins are registered or modified
+_registry_version = 0
+# phase -> (registry version, plugins hooking phase in handler priority order)
+_phase_plugins = {}
+
+
+def _registry_changed():
+    global _registry_version
+    _registry_version += 1
+
+# Plugin manifest lists what importing each plugin module registers, so that modules which only register
+# (non-builtin) plugins can be imported when those plugins are needed, see load_plugins
+MANIFEST_VERSION = 1
+# module name -> info, from manifest used by load_plugins_from_dir
+_manifest_modules = None
+# module name -> info, for all imported plugin modules
+_module_info = {}
+# module name -> (directory, info), for modules not imported yet
+_lazy_modules = {}
+# plugin name -> module name, for plugins not imported yet
+_lazy_plugins = {}
+_lazy_lock = threading.RLock()
 
 
 def register_parser_option(*args, **kwargs):
@@ -282,7 +306,8 @@ class PluginInfo(dict):
         """Convention is to take camel-case class name and rewrite it to an underscore form, e.g. 'PluginName' to 'plugin_name'"""
         return re.sub('[A-Z]+', lambda i: '_' + i.group(0).lower(), plugin_class.__name__).lstrip('_')
 
-    def __init__(self, plugin_class, name=None, groups=None, builtin=False, debug=False, api_ver=1):
+    def __init__(self, plugin_class, name=None, groups=None, builtin=False, debug=False, api_ver=1,
+                 concurrent=None):
         """
         Register a plugin.
 
@@ -292,8 +317,12 @@ class PluginInfo(dict):
         :builtin: Auto-activated?
         :debug: True if plugin is for debugging purposes.
         :api_ver: Signature of callback hooks (1=task; 2=task,config).
+        :concurrent: True if plugin can be used by tasks executing at the same time, ie. it does not keep
+          per task state in the plugin instance or change process wide state. Tasks using other plugins are
+          executed serially with --workers. Defaults to True for core plugins, which have been checked.
         """
         dict.__init__(self)
+        start_time = time.time()
 
         if groups is None:
             groups = []
@@ -306,6 +335,9 @@ class PluginInfo(dict):
         self.groups = groups
         self.builtin = builtin
         self.debug = debug
+        if concurrent is None:
+            concurrent = _is_core_plugin(plugin_class)
+        self.concurrent = concurrent
         self.phase_handlers = {}
 
         # Create plugin instance
@@ -331,6 +363,8 @@ class PluginInfo(dict):
         else:
             self.build_phase_handlers()
             plugins[self.name] = self
+            _registry_changed()
+        startup_profile.record('plugin', name, time.time() - start_time)
 
     def reset_phase_handlers(self):
         """Temporary utility method"""
@@ -358,6 +392,7 @@ class PluginInfo(dict):
                 # provides backwards compatibility
                 event.plugin = self
                 self.phase_handlers[phase] = event
+                _registry_changed()
 
     def __getattr__(self, attr):
         if attr in self:
@@ -366,6 +401,8 @@ class PluginInfo(dict):
 
     def __setattr__(self, attr, value):
         self[attr] = value
+        # eg. builtin flag affects which plugins tasks run
+        _registry_changed()
 
     def __str__(self):
         return '<PluginInfo(name=%s)>' % self.name
@@ -376,6 +413,14 @@ class PluginInfo(dict):
 register_plugin = PluginInfo
 
 
+def _is_core_plugin(plugin_class):
+    """True if :plugin_class: is defined in a module of flexget.plugins package, not in a user plugin directory."""
+    module = sys.modules.get(plugin_class.__module__)
+    path = getattr(module, '__file__', None)
+    core_path = os.path.dirname(os.path.abspath(plugins_pkg.__file__))
+    return bool(path) and os.path.abspath(path).startswith(core_path + os.sep)
+
+
 def register(plugin_class, groups=None, auto=False):
     """
     Register plugin with attributes according to C{PLUGIN_INFO} class variable.
@@ -405,7 +450,7 @@ def register(plugin_class, groups=None, auto=False):
         if auto:
             log.trace("Auto-registering plugin %s" % name)
         return PluginInfo(plugin_class, name, list(set(info.get('groups', []) + (groups or []))),
-            info.get('builtin', False), info.get('debug', False), info.get('api_ver', 1))
+            info.get('builtin', False), info.get('debug', False), info.get('api_ver', 1), info.get('concurrent'))
 
 
 def get_standard_plugins_path():
@@ -524,37 +569,13 @@ def load_plugins_from_dir(basepath, subpkg=None):
                     found_plugins.add(namespace + f_base)
 
     for modulename in found_plugins:
-        try:
-            __import__(modulename, level=0)
-        except DependencyError, e:
-            if e.has_message():
-                msg = e.message
-            else:
-                msg = 'Plugin `%s` requires `%s` to load.' % (e.issued_by or modulename, e.missing or 'N/A')
-            if not e.silent:
-                log.warning(msg)
-            else:
-                log.debug(msg)
-        except ImportError, e:
-            log.critical('Plugin `%s` failed to import dependencies' % modulename)
-            log.exception(e)
-        except Exception, e:
-            log.critical('Exception while loading plugin %s' % modulename)
-            log.exception(e)
-            raise
-        else:
-            log.trace('Loaded module %s from %s' % (modulename[len(PLUGIN_NAMESPACE) + 1:], dirpath))
-
-            # Auto-register plugins that inherit from plugin base classes,
-            # and weren't already registered manually
-            for obj in vars(sys.modules[modulename]).values():
-                try:
-                    if not issubclass(obj, Plugin):
-                        continue
-                except TypeError:
-                    continue # not a class
-                else:
-                    register(obj, auto=True)
+        info = _manifest_modules and _manifest_modules.get(modulename)
+        if info and not info['eager']:
+            _lazy_modules[modulename] = (dirpath, info)
+            for name in info['plugins']:
+                _lazy_plugins[name] = modulename
+            continue
+        load_plugin_module(modulename, dirpath)
 
     if _new_phase_queue:
         for phase, args in _new_phase_queue.iteritems():
@@ -562,9 +583,219 @@ def load_plugins_from_dir(basepath, subpkg=None):
                       'point (before, after). Plugin is not working properly.' % (args[0], phase))
 
 
-def load_plugins(parser):
-    """Load plugins from the standard plugin paths."""
-    global plugins_loaded, _parser
+def load_plugin_module(modulename, dirpath):
+    """
+    Import plugin module and register plugins it contains. Registrations caused by the import are recorded
+    for the plugin manifest.
+    """
+    before = _registry_state()
+    start_time = time.time()
+    try:
+        __import__(modulename, level=0)
+    except DependencyError, e:
+        if e.has_message():
+            msg = e.message
+        else:
+            msg = 'Plugin `%s` requires `%s` to load.' % (e.issued_by or modulename, e.missing or 'N/A')
+        if not e.silent:
+            log.warning(msg)
+        else:
+            log.debug(msg)
+        startup_profile.record('import', modulename, time.time() - start_time)
+        # always retry modules that failed to load, missing dependency may have been installed
+        _module_info[modulename] = {'eager': True, 'plugins': {}}
+        return
+    except ImportError, e:
+        log.critical('Plugin `%s` failed to import dependencies' % modulename)
+        log.exception(e)
+        startup_profile.record('import', modulename, time.time() - start_time)
+        _module_info[modulename] = {'eager': True, 'plugins': {}}
+        return
+    except Exception, e:
+        log.critical('Exception while loading plugin %s' % modulename)
+        log.exception(e)
+        raise
+    else:
+        log.trace('Loaded module %s from %s' % (modulename[len(PLUGIN_NAMESPACE) + 1:], dirpath))
+
+        # Auto-register plugins that inherit from plugin base classes,
+        # and weren't already registered manually
+        for obj in vars(sys.modules[modulename]).values():
+            try:
+                if not issubclass(obj, Plugin):
+                    continue
+            except TypeError:
+                continue # not a class
+            else:
+                register(obj, auto=True)
+
+    startup_profile.record('import', modulename, time.time() - start_time)
+    _module_info[modulename] = _module_record(before)
+
+
+def _registry_state():
+    """Returns registered plugin names, and counts of everything else a plugin module can register on import."""
+    from flexget import event, schema
+    from flexget.manager import Base, _config_validator
+    events = sum(len(handlers) for name, handlers in event._events.iteritems() if not name.startswith('plugin.'))
+    counts = (len(_plugin_options), events, len(_config_validator.valid), len(task_phases) + len(_new_phase_queue),
+              len(Base.metadata.tables), len(schema.plugin_schemas))
+    return set(plugins), counts
+
+
+def _module_record(before):
+    """Manifest info for plugin module imported since :before: state was taken."""
+    names, counts = before
+    after_names, after_counts = _registry_state()
+    # modules registering anything but plugins (options, events, tables, config keys ...) can not be imported
+    # on demand, they are needed before it is known what plugins are used
+    info = {'eager': after_counts != counts, 'plugins': {}}
+    for name in after_names - names:
+        plugin = plugins[name]
+        info['plugins'][name] = {'groups': list(plugin.groups), 'phases': list(plugin.phase_handlers),
+                                 'builtin': plugin.builtin}
+        if plugin.builtin:
+            info['eager'] = True
+    return info
+
+
+def _load_lazy_modules(modulenames):
+    """Import given plugin modules which have not been imported yet."""
+    _lazy_lock.acquire()
+    try:
+        for modulename in modulenames:
+            if modulename not in _lazy_modules:
+                continue
+            dirpath, info = _lazy_modules.pop(modulename)
+            for name in info['plugins']:
+                _lazy_plugins.pop(name, None)
+            log.debug('Loading plugin module %s on demand' % modulename)
+            load_plugin_module(modulename, dirpath)
+    finally:
+        _lazy_lock.release()
+
+
+def _lazy_modules_with(key, value):
+    """Names of modules not imported yet, having plugin with :value: in manifest info :key: list."""
+    return [modulename for modulename, (dirpath, info) in _lazy_modules.items()
+            if any(value in plugin[key] for plugin in info['plugins'].itervalues())]
+
+
+def load_all_plugins():
+    """Import all plugin modules which have been left to be loaded on demand."""
+    _load_lazy_modules(_lazy_modules.keys())
+
+
+def _config_keywords(config):
+    """Dict keys and list items of :config: and all configs nested in it, plugins are referenced by them."""
+    names = set()
+
+    def collect(item):
+        if isinstance(item, dict):
+            names.update(key for key in item if isinstance(key, basestring))
+            for value in item.itervalues():
+                collect(value)
+        elif isinstance(item, list):
+            for value in item:
+                if isinstance(value, basestring):
+                    names.add(value)
+                else:
+                    collect(value)
+
+    collect(config)
+    return names
+
+
+def load_plugins_for_config(config):
+    """
+    Import modules left to be loaded on demand for all plugins referenced anywhere in :config:, so that tasks
+    executed by worker threads do not need to register plugins while other threads are using them.
+    """
+    names = _config_keywords(config)
+    _lazy_lock.acquire()
+    try:
+        modulenames = set(_lazy_plugins[name] for name in names if name in _lazy_plugins)
+    finally:
+        _lazy_lock.release()
+    _load_lazy_modules(modulenames)
+
+
+def get_plugins_for_config(config):
+    """Return list of loaded plugins referenced anywhere in :config:, including configs nested in other plugins."""
+    names = _config_keywords(config)
+    return [p for p in get_loaded_plugins() if p.name in names]
+
+
+def get_manifest_path(config_base):
+    """Plugin manifest is kept in the configuration directory."""
+    return os.path.join(config_base, 'plugins.manifest')
+
+
+def get_plugin_files(dirs):
+    """Returns dict of plugin module path -> modification time, for all plugin modules in :dirs:"""
+    files = {}
+    for dir in dirs:
+        if not dir or not os.path.isdir(dir):
+            continue
+        for dirpath in [dir] + [os.path.join(dir, n) for n in os.listdir(dir)]:
+            if not os.path.isdir(dirpath):
+                continue
+            for filename in os.listdir(dirpath):
+                path = os.path.join(dirpath, filename)
+                if filename.endswith('.py') and os.path.isfile(path):
+                    files[path] = os.path.getmtime(path)
+    return files
+
+
+def read_manifest(path, dirs):
+    """
+    :param path: Manifest file
+    :param dirs: Plugin directories
+    :return: Module name -> info dict from manifest, or None if manifest is missing or out of date
+    """
+    from flexget.utils import json
+    try:
+        f = open(path)
+        try:
+            manifest = json.load(f)
+        finally:
+            f.close()
+        if manifest['version'] != MANIFEST_VERSION or manifest['dirs'] != dirs:
+            return None
+        if manifest['files'] != get_plugin_files(dirs):
+            log.debug('Plugin files have changed, rebuilding plugin manifest')
+            return None
+        return manifest['modules']
+    except (IOError, ValueError, KeyError, TypeError), e:
+        log.debug('Unable to read plugin manifest %s: %s' % (path, e))
+        return None
+
+
+def write_manifest(path, dirs):
+    """Write manifest of imported plugin modules into :path:"""
+    from flexget.utils import json
+    manifest = {'version': MANIFEST_VERSION, 'dirs': dirs, 'files': get_plugin_files(dirs),
+                'modules': _module_info}
+    try:
+        f = open(path, 'w')
+        try:
+            json.dump(manifest, f)
+        finally:
+            f.close()
+    except IOError, e:
+        log.debug('Unable to write plugin manifest %s: %s' % (path, e))
+
+
+def load_plugins(parser, config_base=None):
+    """
+    Load plugins from the standard plugin paths.
+
+    :param parser: Parser where plugins add their options
+    :param config_base: Directory of configuration file. When given, plugin manifest kept there is used to import
+      modules which only register plugins when those plugins are needed (eg. referenced from config). Manifest is
+      rebuilt by loading all plugins when plugin files change.
+    """
+    global plugins_loaded, _parser, _manifest_modules
 
     if plugins_loaded:
         if parser is not None:
@@ -577,21 +808,63 @@ def load_plugins(parser):
     warnings.simplefilter('ignore', DeprecationWarning)
 
     start_time = time.time()
+    dirs = get_standard_plugins_path()
+    lazy = config_base is not None
+    manifest_path = lazy and get_manifest_path(config_base)
+    if lazy:
+        _manifest_modules = read_manifest(manifest_path, dirs)
     _parser = parser
     try:
-        load_plugins_from_dirs(get_standard_plugins_path())
+        load_plugins_from_dirs(dirs)
     finally:
         _parser = None
+        manifest_used = _manifest_modules is not None
+        _manifest_modules = None
+    if lazy and not manifest_used and os.path.isdir(os.path.dirname(manifest_path)):
+        write_manifest(manifest_path, dirs)
     took = time.time() - start_time
+    startup_profile.record('startup', 'load plugins', took)
     plugins_loaded = True
-    log.debug('Plugins took %.2f seconds to load' % took)
+    log.debug('Plugins took %.2f seconds to load, %s modules left to be loaded on demand' %
+              (took, len(_lazy_modules)))
+
+
+def get_loaded_plugins():
+    """
+    Return list of loaded plugins. Unlike :data:`plugins` it is safe to iterate while other threads import
+    plugin modules on demand.
+    """
+    _lazy_lock.acquire()
+    try:
+        return plugins.values()
+    finally:
+        _lazy_lock.release()
 
 
 def get_plugins_by_phase(phase):
     """Return an iterator over all plugins that hook :phase:"""
     if not phase in phase_methods:
         raise Exception('Unknown phase %s' % phase)
-    return (p for p in plugins.itervalues() if phase in p.phase_handlers)
+    _load_lazy_modules(_lazy_modules_with('phases', phase))
+    return (p for p in get_loaded_plugins() if phase in p.phase_handlers)
+
+
+def get_plugins_by_phase_sorted(phase):
+    """
+    Return list of loaded plugins that hook :phase:, in order their handlers should be run. Plugins left to be
+    loaded on demand are not included, they are not used by any task. List is cached until plugins or handler
+    priorities change, it must not be modified.
+    """
+    if not phase in phase_methods:
+        raise Exception('Unknown phase %s' % phase)
+    version = (_registry_version, get_events_version())
+    cached = _phase_plugins.get(phase)
+    if cached and cached[0] == version:
+        return cached[1]
+    result = sorted((p for p in get_loaded_plugins() if phase in p.phase_handlers),
+                    key=lambda p: p.phase_handlers[phase], reverse=True)
+    _phase_plugins[phase] = (version, result)
+    return result
 
 
 def get_phases_by_plugin(name):
@@ -601,16 +874,19 @@ def get_phases_by_plugin(name):
 
 def get_plugins_by_group(group):
     """Return an iterator over all plugins with in specified group."""
-    return (p for p in plugins.itervalues() if group in p.get('groups'))
+    _load_lazy_modules(_lazy_modules_with('groups', group))
+    return (p for p in get_loaded_plugins() if group in p.get('groups'))
 
 
 def get_plugin_keywords():
-    """Return iterator over all plugin keywords."""
-    return plugins.iterkeys()
+    """Return iterator over all plugin keywords, including plugins not loaded yet."""
+    return iter(plugins.keys() + _lazy_plugins.keys())
 
 
 def get_plugin_by_name(name, issued_by='???'):
     """Get plugin by name, preferred way since this structure may be changed at some point."""
+    if not name in plugins and name in _lazy_plugins:
+        _load_lazy_modules([_lazy_plugins[name]])
     if not name in plugins:
         raise DependencyError(issued_by=issued_by, missing=name, message='Unknown plugin %s' % name)
     return plugins[name]
@@ -1,7 +1,7 @@
 import logging
 import sys
 from flexget.event import event
-from flexget.plugin import register_parser_option, plugins
+from flexget.plugin import register_parser_option, plugins, load_all_plugins
 
 log = logging.getLogger('doc')
 
@@ -37,6 +37,7 @@ def print_doc(manager):
     if manager.options.doc:
         manager.disable_tasks()
         plugin_name = manager.options.doc
+        load_all_plugins()
         plugin = plugins.get(plugin_name, None)
         if plugin:
             if not plugin.instance.__doc__:
@@ -1,7 +1,7 @@
 import logging
 from argparse import SUPPRESS
 from flexget.plugin import register_parser_option
-from flexget.event import event
+from flexget.event import event, fire_event
 
 log = logging.getLogger('performance')
 
@@ -62,6 +62,11 @@ def startup(manager):
                     queries = results['queries']
                     if took > 0.1 or queries > 10:
                         log.info('%-15s took %0.2f sec (%s queries)' % (keyword, took, queries))
+            # plugins may report their own counters (eg. cache hits) by hooking performance.stats event
+            stats = {}
+            fire_event('performance.stats', stats)
+            for name, counters in sorted(stats.iteritems()):
+                log.info('%-15s %s' % (name, ', '.join('%s: %s' % item for item in sorted(counters.iteritems()))))
 
 
 register_parser_option('--debug-perf', action='store_true', dest='debug_perf', default=False,
@@ -1,6 +1,6 @@
 import logging
 from argparse import SUPPRESS
-from flexget.plugin import register_parser_option, plugins
+from flexget.plugin import register_parser_option, plugins, load_all_plugins
 from flexget.event import event
 
 log = logging.getLogger('plugins')
@@ -10,6 +10,7 @@ log = logging.getLogger('plugins')
 def plugins_summary(manager):
     if manager.options.plugins:
         manager.disable_tasks()
+        load_all_plugins()
         print '-' * 79
         print '%-20s%-30s%s' % ('Name', 'Roles (priority)', 'Info')
         print '-' * 79
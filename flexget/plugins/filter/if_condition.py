@@ -4,7 +4,8 @@ import datetime
 from copy import copy
 from collections import defaultdict
 from flexget.task import Task
-from flexget.plugin import register_plugin, plugins as all_plugins, get_plugin_by_name, phase_methods
+from flexget.plugin import register_plugin, get_loaded_plugins, get_plugin_by_name, phase_methods, \
+    load_all_plugins
 
 log = logging.getLogger('if')
 
@@ -38,7 +39,8 @@ class FilterIf(object):
         action.accept('choice').accept_choices(['accept', 'reject', 'fail'])
         filter_action = action.accept('dict')
         # Build a dict validator that accepts all api > 2 plugins except input plugins.
-        for plugin in all_plugins.itervalues():
+        load_all_plugins()
+        for plugin in get_loaded_plugins():
             if plugin.api_ver > 1 and hasattr(plugin.instance, 'validator') and 'input' not in plugin.phase_handlers:
                 filter_action.accept(plugin.instance.validator, key=plugin.name)
         return root
@@ -7,6 +7,7 @@ from flexget.event import event
 from flexget.plugin import register_plugin, register_parser_option, priority
 from flexget.utils.sqlalchemy_utils import table_columns, drop_tables, table_add_column
 from flexget.utils.tools import parse_timedelta
+from flexget.utils.database import delete_chunked
 
 log = logging.getLogger('remember_rej')
 Base = schema.versioned_base('remember_rejected', 3)
@@ -147,9 +148,10 @@ class FilterRememberRejected(object):
 @event('manager.db_cleanup')
 def db_cleanup(session):
     # Remove entries older than 30 days
-    result = session.query(RememberEntry).filter(RememberEntry.added < datetime.now() - timedelta(days=30)).delete()
+    result, finished = delete_chunked(session, RememberEntry, RememberEntry.added < datetime.now() - timedelta(days=30))
     if result:
         log.verbose('Removed %d entries from remember rejected table.' % result)
+    return finished
 
 
 register_plugin(FilterRememberRejected, 'remember_rejected', builtin=True, api_ver=2)
@@ -6,23 +6,41 @@ forget (string)
     Given string can be task name, remembered field (url, imdb_url) or a title. If given value is a
     task name then everything in that task will be forgotten. With title all learned fields from it and the
     title will be forgotten. With field value only that particular field is forgotten.
+
+Seen entries are kept in seen_entry and seen_field tables (hot tier). Tasks configuring a retention policy with
+cold_after opt in to moving their entries older than that into seen_cold table (cold tier) during database cleanup.
+Cold tier only stores 64 bit hashes of values, it is looked up when value is not found from hot tier.
 """
 
+import struct
+import hashlib
 import logging
-from datetime import datetime, timedelta
-from sqlalchemy import Column, Integer, String, DateTime, Unicode, asc, or_, select, update, Index
-from sqlalchemy.schema import ForeignKey
+import itertools
+import threading
+from datetime import datetime
+from sqlalchemy import (Column, Integer, BigInteger, String, DateTime, Unicode, Float, LargeBinary, asc, or_, select,
+                        update, Index, func)
+from sqlalchemy.schema import ForeignKey, Table
 from sqlalchemy.orm import relation
-from flexget.manager import Session
+from flexget.manager import Session, ReaderSession
 from flexget.event import event
 from flexget.plugin import register_plugin, priority, register_parser_option
 from flexget import schema
-from flexget.utils.sqlalchemy_utils import table_schema
+from flexget.utils.sqlalchemy_utils import table_schema, bulk_insert
 from flexget.utils.imdb import is_imdb_url, extract_id
+from flexget.utils.bloom import BloomFilter
+from flexget.utils.tools import parse_timedelta
+from flexget.utils.simple_persistence import SimpleKeyValue
+from flexget.utils import database
 
 log = logging.getLogger('seen')
 Base = schema.versioned_base('seen', 2)
 
+# Maximum amount of values looked up in one query, SQLite limits the number of bound parameters
+LOOKUP_CHUNK_SIZE = 500
+# Minimum number of values seen index is sized for
+MIN_INDEX_CAPACITY = 10000
+
 
 @schema.upgrade('seen')
 def upgrade(ver, session):
@@ -82,6 +100,352 @@ class SeenField(Base):
         return '<SeenField(field=%s,value=%s,added=%s)>' % (self.field, self.value, self.added)
 
 
+# Cold tier, rows are only inserted and queried in bulk without the ORM
+seen_cold = Table('seen_cold', Base.metadata,
+                  Column('id', Integer, primary_key=True),
+                  # identifies fields of the same entry, so that whole entry can be forgotten
+                  Column('entry_hash', BigInteger, nullable=False, index=True),
+                  Column('value_hash', BigInteger, nullable=False, index=True),
+                  Column('field', Unicode),
+                  Column('task', Unicode, index=True),
+                  Column('added', DateTime))
+
+
+# Seen index saved between runs, at most one row
+seen_index_table = Table('seen_index', Base.metadata,
+                         Column('id', Integer, primary_key=True),
+                         Column('capacity', Integer),
+                         Column('error_rate', Float),
+                         Column('count', Integer),
+                         Column('bits', LargeBinary),
+                         # index contains values of rows up to these ids
+                         Column('last_id', Integer),
+                         Column('last_cold_id', Integer))
+
+
+def value_hash(value):
+    """
+    :param value: Unicode value
+    :return: Signed 64 bit hash of value, used as key in cold tier
+    """
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    return struct.unpack('<q', hashlib.md5(value).digest()[:8])[0]
+
+
+def cold_key(hash):
+    """Key of value hash from cold tier in seen index."""
+    return 'cold:%d' % hash
+
+
+def lookup_seen(session, values):
+    """
+    Find which of given values have been seen, using as few queries as possible. Values not found from hot tier
+    are looked up from cold tier by their hash.
+
+    :param session: Database session
+    :param values: Iterable of unicode values
+    :return: Dict mapping seen values to name of the field they were learned as
+    """
+    values = list(set(values))
+    seen = {}
+    for i in xrange(0, len(values), LOOKUP_CHUNK_SIZE):
+        chunk = values[i:i + LOOKUP_CHUNK_SIZE]
+        for field, value in session.query(SeenField.field, SeenField.value).filter(SeenField.value.in_(chunk)):
+            seen.setdefault(value, field)
+    remaining = dict((value_hash(value), value) for value in values if value not in seen)
+    hashes = remaining.keys()
+    for i in xrange(0, len(hashes), LOOKUP_CHUNK_SIZE):
+        chunk = hashes[i:i + LOOKUP_CHUNK_SIZE]
+        query = select([seen_cold.c.value_hash, seen_cold.c.field], seen_cold.c.value_hash.in_(chunk))
+        for hash, field in session.execute(query):
+            seen.setdefault(remaining[hash], field)
+    return seen
+
+
+def get_cold_after(session):
+    """
+    Retention policies are remembered by each task when it is executed with its presets applied.
+
+    :param session: Database session
+    :return: Dict mapping names of tasks configuring cold_after to time their entries are kept in hot tier
+    """
+    query = session.query(SimpleKeyValue).filter(SimpleKeyValue.plugin == 'seen').\
+        filter(SimpleKeyValue.key == 'cold_after')
+    return dict((skv.task, parse_timedelta(skv.value)) for skv in query)
+
+
+def move_to_cold(session, task_name, before):
+    """
+    Moves entries of task learned before given time from hot tier to cold tier, a chunk at a time committing
+    after each, until all are moved or database cleanup time budget is used.
+
+    :param session: Database session
+    :param task_name: Name of the task
+    :param datetime before: Entries learned before this are moved
+    :return: Tuple of (number of entries moved, True if all were moved)
+    """
+    entry_table = SeenEntry.__table__
+    field_table = SeenField.__table__
+    moved = 0
+    while True:
+        entries = session.execute(select([entry_table.c.id, entry_table.c.title, entry_table.c.added]).
+            where(entry_table.c.feed == task_name).where(entry_table.c.added < before).
+            limit(database.CLEANUP_CHUNK_SIZE)).fetchall()
+        if entries:
+            ids = [row['id'] for row in entries]
+            entry_hashes = dict((row['id'], value_hash(u'%s %s %s' % (row['id'], row['title'], row['added'])))
+                                for row in entries)
+            fields = session.execute(select([field_table.c.seen_entry_id, field_table.c.field, field_table.c.value,
+                                             field_table.c.added], field_table.c.seen_entry_id.in_(ids)))
+            rows = [{'entry_hash': entry_hashes[row['seen_entry_id']], 'value_hash': value_hash(row['value']),
+                     'field': row['field'], 'task': task_name, 'added': row['added']} for row in fields]
+            if rows:
+                session.execute(seen_cold.insert(), rows)
+            session.execute(field_table.delete(field_table.c.seen_entry_id.in_(ids)))
+            session.execute(entry_table.delete(entry_table.c.id.in_(ids)))
+            seen_index.rows_removed(session)
+            session.commit()
+            moved += len(ids)
+        if len(entries) < database.CLEANUP_CHUNK_SIZE:
+            return moved, True
+        if not database.cleanup_time_left():
+            return moved, False
+
+
+def move_expired_to_cold(session):
+    """
+    Moves entries older than retention policy of their task into cold tier. Entries of tasks without retention
+    policy are not moved.
+
+    :return: Tuple of (number of entries moved, True if all were moved)
+    """
+    total = 0
+    for task_name, cold_after in sorted(get_cold_after(session).iteritems()):
+        moved, finished = move_to_cold(session, task_name, datetime.now() - cold_after)
+        total += moved
+        if moved:
+            log.verbose('Moved %d seen entries of task %s to cold tier.' % (moved, task_name))
+        if not finished:
+            return total, False
+    return total, True
+
+
+class SeenIndex(object):
+    """
+    Bloom filter of all seen values, and hashes of values in cold tier. Values not found from the index have never
+    been seen and are not looked up from the database at all.
+
+    Index is saved into the database after each execution and loaded from there on first lookup, it is built by
+    scanning all seen values only when there is no saved index or it has grown over its capacity. Values learned
+    are added as they are learned, rows added to the database by other means are picked up by their id before each
+    lookup.
+
+    Values cannot be removed from a bloom filter, removed values just cause a database lookup. When rows are
+    removed :meth:`rows_removed` must be called, new rows may reuse their ids.
+    """
+
+    def __init__(self, error_rate=0.001):
+        self.error_rate = error_rate
+        # tasks may be executed concurrently
+        self.lock = threading.RLock()
+        self.reset_stats()
+        self.invalidate()
+
+    def invalidate(self):
+        """Discard index from memory, it will be loaded from the database on next lookup."""
+        self.lock.acquire()
+        try:
+            self.bloom = None
+            self.last_id = 0
+            self.last_cold_id = 0
+            # values learned while index is not loaded, they may not be committed to database yet
+            self.pending = set()
+            # index has changed since it was loaded or saved
+            self.dirty = False
+        finally:
+            self.lock.release()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.false_positives = 0
+
+    def stats(self):
+        """
+        :return: Dict with lookup counters. Misses did not require database lookup, false positives did
+          unnecessarily.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'false positives': self.false_positives}
+
+    def add(self, value):
+        """Add learned *value* into the index."""
+        self.lock.acquire()
+        try:
+            if self.bloom is None:
+                self.pending.add(value)
+            else:
+                self.bloom.add(value)
+                self.dirty = True
+        finally:
+            self.lock.release()
+
+    def lower_ids(self, last_id, last_cold_id):
+        """Make sure rows after given ids are added to the index on next sync."""
+        self.lock.acquire()
+        try:
+            self.last_id = min(self.last_id, last_id)
+            self.last_cold_id = min(self.last_cold_id, last_cold_id)
+        finally:
+            self.lock.release()
+
+    def rows_removed(self, session):
+        """
+        Must be called after seen rows have been removed in `session`. Ids of removed rows may be reused by new rows,
+        so ids of saved and in-memory index are lowered to the highest remaining ones.
+        """
+        session.flush()
+        last_id = session.query(func.max(SeenField.id)).scalar() or 0
+        last_cold_id = session.execute(select([func.max(seen_cold.c.id)])).scalar() or 0
+        table = seen_index_table
+        session.execute(table.update().where(table.c.last_id > last_id).values(last_id=last_id))
+        session.execute(table.update().where(table.c.last_cold_id > last_cold_id).values(last_cold_id=last_cold_id))
+        self.lower_ids(last_id, last_cold_id)
+
+    def load(self, session):
+        """
+        Load saved index.
+
+        :return: True if saved index was loaded
+        """
+        row = session.execute(select([seen_index_table])).first()
+        if not row:
+            return False
+        try:
+            self.bloom = BloomFilter.restore(row['capacity'], row['error_rate'], row['bits'], row['count'])
+        except ValueError, e:
+            log.debug('Saved seen index is invalid: %s' % e)
+            return False
+        self.last_id = row['last_id']
+        self.last_cold_id = row['last_cold_id']
+        log.debug('Loaded seen index with %s values' % row['count'])
+        return True
+
+    def build(self, session):
+        count = session.query(func.count(SeenField.id)).scalar()
+        count += session.execute(select([func.count(seen_cold.c.id)])).scalar()
+        log.debug('Building seen index for %s values' % count)
+        self.bloom = BloomFilter(max(count * 2, MIN_INDEX_CAPACITY), self.error_rate)
+        self.last_id = 0
+        self.last_cold_id = 0
+
+    def sync(self, session):
+        """Load or build the index, and add values from rows added to database since last sync."""
+        self.lock.acquire()
+        try:
+            if self.bloom is None:
+                if not self.load(session):
+                    self.build(session)
+                for value in self.pending:
+                    self.bloom.add(value)
+                self.pending = set()
+            elif self.bloom.full:
+                self.build(session)
+            else:
+                # other processes lower ids of saved index when they remove rows
+                row = session.execute(select([seen_index_table.c.last_id, seen_index_table.c.last_cold_id])).first()
+                if row:
+                    self.lower_ids(row['last_id'], row['last_cold_id'])
+            for id, value in session.query(SeenField.id, SeenField.value).filter(SeenField.id > self.last_id):
+                self.bloom.add(value)
+                self.last_id = max(self.last_id, id)
+                self.dirty = True
+            query = select([seen_cold.c.id, seen_cold.c.value_hash], seen_cold.c.id > self.last_cold_id)
+            for id, hash in session.execute(query):
+                self.bloom.add(cold_key(hash))
+                self.last_cold_id = max(self.last_cold_id, id)
+                self.dirty = True
+        finally:
+            self.lock.release()
+
+    def save(self, session):
+        """Save index into the database, if it has changed."""
+        self.lock.acquire()
+        try:
+            if self.bloom is None or not self.dirty:
+                return
+            last_id, last_cold_id = self.last_id, self.last_cold_id
+            # ids may have been lowered by other processes since last sync
+            row = session.execute(select([seen_index_table.c.last_id, seen_index_table.c.last_cold_id])).first()
+            if row:
+                last_id = min(last_id, row['last_id'])
+                last_cold_id = min(last_cold_id, row['last_cold_id'])
+            session.execute(seen_index_table.delete())
+            session.execute(seen_index_table.insert(), {'id': 1, 'capacity': self.bloom.capacity,
+                                                        'error_rate': self.bloom.error_rate,
+                                                        'count': self.bloom.count, 'bits': str(self.bloom.bits),
+                                                        'last_id': last_id, 'last_cold_id': last_cold_id})
+            self.dirty = False
+        finally:
+            self.lock.release()
+
+    def discard(self, session):
+        """Remove saved index, it is rebuilt on next lookup without values removed meanwhile."""
+        session.execute(seen_index_table.delete())
+        self.invalidate()
+
+    def lookup(self, session, values):
+        """
+        Same as :func:`lookup_seen`, but queries database only for values which may have been seen.
+        """
+        # sync only committed rows, ids of rows in uncommitted transactions may still be reused
+        sync_session = ReaderSession()
+        self.lock.acquire()
+        try:
+            self.sync(sync_session)
+            values = set(values)
+            candidates = [value for value in values
+                          if value in self.bloom or cold_key(value_hash(value)) in self.bloom]
+        finally:
+            self.lock.release()
+            sync_session.close()
+        seen = lookup_seen(session, candidates)
+        self.lock.acquire()
+        try:
+            self.misses += len(values) - len(candidates)
+            self.hits += len(seen)
+            self.false_positives += len(candidates) - len(seen)
+        finally:
+            self.lock.release()
+        return seen
+
+
+seen_index = SeenIndex()
+
+
+@event('manager.startup')
+@event('manager.db_upgraded')
+def reset_index(manager):
+    # database may have been changed by other processes meanwhile
+    seen_index.invalidate()
+    seen_index.reset_stats()
+
+
+@event('manager.execute.completed')
+def save_index(manager):
+    session = Session()
+    try:
+        seen_index.save(session)
+        session.commit()
+    finally:
+        session.close()
+
+
+@event('performance.stats')
+def index_stats(stats):
+    stats['seen index'] = seen_index.stats()
+
+
 @event('forget')
 def forget(value):
     """
@@ -107,6 +471,17 @@ def forget(value):
             count += 1
             log.debug('forgetting %s' % se)
             session.delete(se)
+
+        # whole entries having the value in cold tier are forgotten
+        criterion = or_(seen_cold.c.value_hash == value_hash(value), seen_cold.c.task == value)
+        cold_count = session.execute(select([func.count(func.distinct(seen_cold.c.entry_hash))], criterion)).scalar()
+        if cold_count:
+            log.debug('forgetting %s entries from cold tier' % cold_count)
+            count += cold_count
+            entry_hashes = select([seen_cold.c.entry_hash], criterion)
+            field_count += session.execute(seen_cold.delete(seen_cold.c.entry_hash.in_(entry_hashes))).rowcount
+        if count:
+            seen_index.rows_removed(session)
         return count, field_count
     finally:
         session.commit()
@@ -247,6 +622,29 @@ class SeenForget(object):
         task.manager.config_changed()
 
 
+class SeenCompact(object):
+
+    def on_process_start(self, task):
+        if not task.manager.options.seen_compact:
+            return
+
+        task.manager.disable_tasks()
+
+        session = Session()
+        try:
+            moved, finished = move_expired_to_cold(session)
+            log.info('Moved %s seen entries to cold tier.' % moved)
+            for table in ['seen_entry', 'seen_field', 'seen_cold']:
+                log.verbose('Rebuilding indexes of %s' % table)
+                session.execute('REINDEX %s' % table)
+            session.execute('ANALYZE')
+            # rebuild index without the values moved and forgotten
+            seen_index.discard(session)
+            session.commit()
+        finally:
+            session.close()
+
+
 class SeenCmd(object):
 
     def on_process_start(self, task):
@@ -267,6 +665,7 @@ class SeenCmd(object):
         se.fields.append(sf)
         session.add(se)
         session.commit()
+        seen_index.add(sf.value)
 
         log.info('Added %s as seen. This will affect all tasks.' % seen_name)
 
@@ -291,8 +690,19 @@ class FilterSeen(object):
         root = validator.factory()
         root.accept('boolean')
         root.accept('list').accept('text')
+        advanced = root.accept('dict')
+        advanced.accept('list', key='fields').accept('text')
+        advanced.accept('interval', key='cold_after')
         return root
 
+    def get_fields(self, config):
+        """Fields to remember and filter by with given config"""
+        if isinstance(config, dict):
+            config = config.get('fields')
+        if isinstance(config, list):
+            return self.fields + config
+        return self.fields
+
     @priority(255)
     def on_task_filter(self, task, config, remember_rejected=False):
         """Filter seen entries"""
@@ -300,12 +710,11 @@ class FilterSeen(object):
             log.debug('%s is disabled' % self.keyword)
             return
 
-        fields = self.fields
-        if isinstance(config, list):
-            fields.extend(config)
+        fields = self.get_fields(config)
 
+        # construct list of looked values for each entry
+        entry_values = []
         for entry in task.entries:
-            # construct list of values looked
             values = []
             for field in fields:
                 if field not in entry:
@@ -313,13 +722,20 @@ class FilterSeen(object):
                 if entry[field] not in values and entry[field]:
                     values.append(unicode(entry[field]))
             if values:
-                log.trace('querying for: %s' % ', '.join(values))
-                # check if SeenField.value is any of the values
-                found = task.session.query(SeenField).filter(SeenField.value.in_(values)).first()
-                if found:
-                    log.debug("Rejecting '%s' '%s' because of seen '%s'" % (entry['url'], entry['title'], found.value))
-                    task.reject(entry, 'Entry with %s `%s` is already seen' % (found.field, found.value),
+                entry_values.append((entry, values))
+        if not entry_values:
+            return
+
+        # resolve values of all entries at once instead of querying for each entry separately
+        seen = seen_index.lookup(task.session, itertools.chain(*[values for entry, values in entry_values]))
+        log.trace('%s seen values found' % len(seen))
+        for entry, values in entry_values:
+            for value in values:
+                if value in seen:
+                    log.debug("Rejecting '%s' '%s' because of seen '%s'" % (entry['url'], entry['title'], value))
+                    task.reject(entry, 'Entry with %s `%s` is already seen' % (seen[value], value),
                                 remember=remember_rejected)
+                    break
 
     def on_task_exit(self, task, config):
         """Remember succeeded entries"""
@@ -327,36 +743,59 @@ class FilterSeen(object):
             log.debug('disabled')
             return
 
-        fields = self.fields
-        if isinstance(config, list):
-            fields.extend(config)
+        fields = self.get_fields(config)
+
+        # remember retention policy for database cleanup, configs are not merged with presets then
+        cold_after = config.get('cold_after') if isinstance(config, dict) else None
+        if cold_after:
+            if task.simple_persistence.get('cold_after') != cold_after:
+                task.simple_persistence['cold_after'] = cold_after
+        elif 'cold_after' in task.simple_persistence:
+            del task.simple_persistence['cold_after']
 
-        for entry in task.accepted:
-            self.learn(task, entry, fields=fields)
-            # verbose if in learning mode
-            if task.manager.options.learn:
+        self.learn_entries(task, task.accepted, fields=fields)
+        # verbose if in learning mode
+        if task.manager.options.learn:
+            for entry in task.accepted:
                 log.info("Learned '%s' (will skip this in the future)" % (entry['title']))
 
     def learn(self, task, entry, fields=None, reason=None):
         """Marks entry as seen"""
+        self.learn_entries(task, [entry], fields=fields, reason=reason)
+
+    def learn_entries(self, task, entries, fields=None, reason=None):
+        """Marks all given entries as seen, using bulk inserts instead of the ORM."""
         # no explicit fields given, use default
         if not fields:
             fields = self.fields
-        se = SeenEntry(entry['title'], unicode(task.name), reason)
-        remembered = []
-        for field in fields:
-            if not field in entry:
-                continue
-            # removes duplicate values (eg. url, original_url are usually same)
-            if entry[field] in remembered:
-                continue
-            remembered.append(entry[field])
-            sf = SeenField(unicode(field), unicode(entry[field]))
-            se.fields.append(sf)
-            log.debug("Learned '%s' (field: %s)" % (entry[field], field))
-        # Only add the entry to the session if it has one of the required fields
-        if se.fields:
-            task.session.add(se)
+        now = datetime.now()
+        entry_rows = []
+        field_rows = []
+        for entry in entries:
+            remembered = []
+            rows = []
+            for field in fields:
+                if not field in entry:
+                    continue
+                # removes duplicate values (eg. url, original_url are usually same)
+                if entry[field] in remembered:
+                    continue
+                remembered.append(entry[field])
+                value = unicode(entry[field])
+                rows.append({'field': unicode(field), 'value': value, 'added': now})
+                seen_index.add(value)
+                log.debug("Learned '%s' (field: %s)" % (entry[field], field))
+            # Only remember the entry if it has one of the required fields
+            if rows:
+                entry_rows.append({'title': entry['title'], 'feed': unicode(task.name), 'reason': reason,
+                                   'added': now})
+                field_rows.append(rows)
+
+        ids = bulk_insert(task.session, SeenEntry.__table__, entry_rows)
+        for seen_entry_id, rows in zip(ids, field_rows):
+            for row in rows:
+                row['seen_entry_id'] = seen_entry_id
+        bulk_insert(task.session, SeenField.__table__, list(itertools.chain(*field_rows)))
 
     def forget(self, task, title):
         """Forget SeenEntry with :title:. Return True if forgotten."""
@@ -364,23 +803,21 @@ class FilterSeen(object):
         if se:
             log.debug("Forgotten '%s' (%s fields)" % (title, len(se.fields)))
             task.session.delete(se)
+            seen_index.rows_removed(task.session)
             return True
 
 
 @event('manager.db_cleanup')
 def db_cleanup(session):
-    log.debug('TODO: Disabled because of ticket #1321')
-    return
-
-    # Remove seen fields over a year old
-    result = session.query(SeenField).filter(SeenField.added < datetime.now() - timedelta(days=365)).delete()
-    if result:
-        log.verbose('Removed %d seen fields older than 1 year.' % result)
+    # Seen values must not be removed (ticket #1321), old ones are moved to cold tier instead
+    moved, finished = move_expired_to_cold(session)
+    return finished
 
 
 register_plugin(FilterSeen, 'seen', builtin=True, api_ver=2)
 register_plugin(SeenSearch, '--seen-search', builtin=True)
 register_plugin(SeenCmd, '--seen', builtin=True)
+register_plugin(SeenCompact, '--seen-compact', builtin=True)
 register_plugin(SeenForget, '--forget', builtin=True)
 register_plugin(MigrateSeen, 'migrate_seen', builtin=True)
 
@@ -390,3 +827,6 @@ register_parser_option('--seen', action='store', dest='seen', default=False,
                        metavar='VALUE', help='Add title or url to what has been seen in tasks.')
 register_parser_option('--seen-search', action='store', dest='seen_search', default=False,
                        metavar='VALUE', help='Search given text from seen database.')
+register_parser_option('--seen-compact', action='store_true', dest='seen_compact', default=False,
+                       help='Move seen entries older than retention policy (cold_after) of their task to cold '
+                            'tier and rebuild seen database indexes.')
@@ -13,10 +13,11 @@ from flexget.event import event
 from flexget.utils import qualities
 from flexget.utils.log import log_once
 from flexget.utils.titles import SeriesParser, ParseWarning, ID_TYPES
+from flexget.utils.titles.series import SeriesNameIndex
 from flexget.utils.sqlalchemy_utils import (table_columns, table_exists, drop_tables, table_schema, table_add_column,
                                             create_index)
 from flexget.utils.tools import merge_dict_from_to, parse_timedelta
-from flexget.utils.database import quality_property
+from flexget.utils.database import quality_property, delete_chunked
 from flexget.manager import Session
 from flexget.plugin import (register_plugin, register_parser_option, get_plugin_by_name, get_plugin_keywords,
     PluginWarning, DependencyError, priority)
@@ -120,18 +121,23 @@ def upgrade(ver, session):
 @event('manager.db_cleanup')
 def db_cleanup(session):
     # Clean up old undownloaded releases
-    result = session.query(Release).filter(Release.downloaded == False).\
-                                    filter(Release.first_seen < datetime.now() - timedelta(days=120)).delete()
+    result, finished = delete_chunked(session, Release, Release.downloaded == False,
+                                      Release.first_seen < datetime.now() - timedelta(days=120))
     if result:
         log.verbose('Removed %d undownloaded episode releases.' % result)
+    if not finished:
+        return False
     # Clean up episodes without releases
-    result = session.query(Episode).filter(~Episode.releases.any()).delete(False)
+    result, finished = delete_chunked(session, Episode, ~Episode.releases.any())
     if result:
         log.verbose('Removed %d episodes without releases.' % result)
+    if not finished:
+        return False
     # Clean up series without episodes
-    result = session.query(Series).filter(~Series.episodes.any()).delete(False)
+    result, finished = delete_chunked(session, Series, ~Series.episodes.any())
     if result:
         log.verbose('Removed %d series without episodes.' % result)
+    return finished
 
 
 @event('manager.startup')
@@ -622,6 +628,7 @@ class FilterSeries(SeriesDatabase, FilterSeriesBase):
     """
 
     def __init__(self):
+        # task name -> {parser: entry}
         self.parser2entry = {}
         self.backlog = None
 
@@ -694,18 +701,22 @@ class FilterSeries(SeriesDatabase, FilterSeriesBase):
 
     def on_task_start(self, task):
         # ensure clean state
-        self.parser2entry = {}
+        self.parser2entry[task.name] = {}
 
     # Run after metainfo_quality and before metainfo_series
     @priority(125)
     def on_task_metainfo(self, task):
         config = self.prepare_config(task.config.get('series', {}))
         self.auto_exact(config)
+        candidates = self.find_candidates(task.entries, config)
         for series_item in config:
             series_name, series_config = series_item.items()[0]
             log.trace('series_name: %s series_config: %s' % (series_name, series_config))
+            if series_name not in candidates:
+                log.trace('No entries look like %s' % series_name)
+                continue
             start_time = time.clock()
-            self.parse_series(task.session, task.entries, series_name, series_config)
+            self.parse_series(task.session, candidates[series_name], series_name, series_config)
             took = time.clock() - start_time
             log.trace('parsing %s took %s' % (series_name, took))
 
@@ -719,7 +730,7 @@ class FilterSeries(SeriesDatabase, FilterSeriesBase):
         for entry in task.entries:
             if entry.get('series_name') and entry.get('series_id') and entry.get('series_parser'):
                 parser = entry['series_parser']
-                self.parser2entry[parser] = entry
+                self.parser2entry.setdefault(task.name, {})[parser] = entry
                 found_series.setdefault(entry['series_name'], {}).setdefault(parser.identifier, []).append(parser)
 
         config = self.prepare_config(task.config.get('series', {}))
@@ -742,7 +753,7 @@ class FilterSeries(SeriesDatabase, FilterSeriesBase):
                 for parser in eps:
                     # store found episodes into database and save reference for later use
                     releases = self.store(task.session, parser)
-                    entry = self.parser2entry[parser]
+                    entry = self.parser2entry[task.name][parser]
                     entry['series_releases'] = releases
 
                     # set custom download path
@@ -766,6 +777,35 @@ class FilterSeries(SeriesDatabase, FilterSeriesBase):
             took = time.clock() - start_time
             log.trace('processing %s took %s' % (series_name, took))
 
+    def find_candidates(self, entries, config):
+        """
+        Finds entries which may belong to configured series, so that each entry is parsed only against a handful
+        of series instead of all of them.
+
+        :param entries: List of entries to process
+        :param config: Prepared series config
+        :return: Dict from series name to list of candidate entries, in original order
+        """
+        index = SeriesNameIndex()
+        for series_item in config:
+            series_name, series_config = series_item.items()[0]
+            index.add(series_name, name_regexps=series_config.get('name_regexp'))
+
+        candidates = {}
+        for entry in entries:
+            names = set()
+            for field in ('title', 'description'):
+                if entry.is_lazy(field):
+                    # don't trigger lookups, series will try the field if needed
+                    names.update(series_item.keys()[0] for series_item in config)
+                    break
+                data = entry.get(field)
+                if isinstance(data, basestring) and data:
+                    names.update(index.candidates(data))
+            for name in names:
+                candidates.setdefault(name, []).append(entry)
+        return candidates
+
     def parse_series(self, session, entries, series_name, config):
         """
         Search for `series_name` and populate all `series_*` fields in entries when successfully parsed
@@ -889,7 +929,7 @@ class FilterSeries(SeriesDatabase, FilterSeriesBase):
             # Remove any eps we already have from the list
             for ep in reversed(eps): # Iterate in reverse so we can safely remove from the list while iterating
                 if ep.quality in downloaded_qualities:
-                    task.reject(self.parser2entry[ep], 'quality already downloaded')
+                    task.reject(self.parser2entry[task.name][ep], 'quality already downloaded')
                     eps.remove(ep)
             if not eps:
                 continue
@@ -900,7 +940,7 @@ class FilterSeries(SeriesDatabase, FilterSeriesBase):
                     # Remove all the qualities lower than what we have
                     for ep in reversed(eps):
                         if ep.quality < max(downloaded_qualities):
-                            task.reject(self.parser2entry[ep], 'worse quality than already downloaded.')
+                            task.reject(self.parser2entry[task.name][ep], 'worse quality than already downloaded.')
                             eps.remove(ep)
                 if not eps:
                     continue
@@ -915,12 +955,12 @@ class FilterSeries(SeriesDatabase, FilterSeriesBase):
                     self.process_qualities(task, config, eps, downloaded)
                     continue
                 elif config.get('upgrade'):
-                    task.accept(self.parser2entry[eps[0]], 'is an upgrade to existing quality')
+                    task.accept(self.parser2entry[task.name][eps[0]], 'is an upgrade to existing quality')
                     continue
 
                 # Reject eps because we have them
                 for ep in eps:
-                    task.reject(self.parser2entry[ep], 'episode has already been downloaded')
+                    task.reject(self.parser2entry[task.name][ep], 'episode has already been downloaded')
                 continue
 
             best = eps[0]
@@ -957,7 +997,7 @@ class FilterSeries(SeriesDatabase, FilterSeriesBase):
                     continue
 
             # Just pick the best ep if we get here
-            task.accept(self.parser2entry[best], reason)
+            task.accept(self.parser2entry[task.name][best], reason)
 
     def process_propers(self, task, config, eps, downloaded):
         """
@@ -976,7 +1016,7 @@ class FilterSeries(SeriesDatabase, FilterSeriesBase):
                 best_propers.append(ep)
             if ep.proper_count < best_proper:
                 # nuke qualities which there is a better proper available
-                task.reject(self.parser2entry[ep], 'nuked')
+                task.reject(self.parser2entry[task.name][ep], 'nuked')
             else:
                 pass_filter.append(ep)
 
@@ -1006,7 +1046,7 @@ class FilterSeries(SeriesDatabase, FilterSeriesBase):
         # Accept propers we actually need, and remove them from the list of entries to continue processing
         for ep in best_propers:
             if ep.quality in downloaded_qualities and ep.proper_count > downloaded_qualities[ep.quality]:
-                task.accept(self.parser2entry[ep], 'proper')
+                task.accept(self.parser2entry[task.name][ep], 'proper')
                 pass_filter.remove(ep)
 
         return pass_filter
@@ -1025,9 +1065,9 @@ class FilterSeries(SeriesDatabase, FilterSeriesBase):
         # scan for quality
         for ep in eps:
             if req.allows(ep.quality):
-                entry = self.parser2entry[ep]
+                entry = self.parser2entry[task.name][ep]
                 log.debug('Series accepting. %s meets quality %s' % (entry['title'], req))
-                task.accept(self.parser2entry[ep], 'target quality')
+                task.accept(self.parser2entry[task.name][ep], 'target quality')
                 return True
 
     def process_quality(self, config, eps):
@@ -1061,7 +1101,7 @@ class FilterSeries(SeriesDatabase, FilterSeriesBase):
         if best.season < season or (best.season == season and best.episode <= episode):
             log.debug('%s episode %s is already watched, rejecting all occurrences' % (best.name, best.identifier))
             for ep in eps:
-                entry = self.parser2entry[ep]
+                entry = self.parser2entry[task.name][ep]
                 task.reject(entry, 'watched')
             return True
 
@@ -1080,15 +1120,15 @@ class FilterSeries(SeriesDatabase, FilterSeriesBase):
                (current.season == latest.season and current.episode < (latest.number - grace))):
                 log.debug('too old! rejecting all occurrences')
                 for ep in eps:
-                    task.reject(self.parser2entry[ep], 'Too much in the past from latest downloaded episode %s' %
-                        latest.identifier)
+                    task.reject(self.parser2entry[task.name][ep],
+                                'Too much in the past from latest downloaded episode %s' % latest.identifier)
                 return True
 
             if (current.season > latest.season + 1 or (current.season > latest.season and current.episode > 1)  or
                (current.season == latest.season and current.episode > (latest.number + grace))):
                 log.debug('too new! rejecting all occurrences')
                 for ep in eps:
-                    task.reject(self.parser2entry[ep],
+                    task.reject(self.parser2entry[task.name][ep],
                         ('Too much in the future from latest downloaded episode %s. '
                          'See `--disable-advancement` if this should be downloaded.') % latest.identifier)
                 return True
@@ -1131,7 +1171,7 @@ class FilterSeries(SeriesDatabase, FilterSeriesBase):
             hours += diff.days * 24
             minutes, seconds = divmod(remainder, 60)
 
-            entry = self.parser2entry[best]
+            entry = self.parser2entry[task.name][best]
             log.info('Timeframe waiting %s for %sh:%smin, currently best is %s' % \
                 (series_name, hours, minutes, entry['title']))
 
@@ -1175,7 +1215,7 @@ class FilterSeries(SeriesDatabase, FilterSeriesBase):
                 if config.get('upgrade'):
                     if downloaded_qualities and ep.quality < max(downloaded_qualities):
                         continue
-                task.accept(self.parser2entry[ep], 'quality wanted')
+                task.accept(self.parser2entry[task.name][ep], 'quality wanted')
                 downloaded_qualities.append(ep.quality)
                 downloaded.append(ep)
                 # Re-calculate what is still needed
@@ -1193,7 +1233,10 @@ class FilterSeries(SeriesDatabase, FilterSeriesBase):
             else:
                 log.debug('%s is not a series' % entry['title'])
         # clear task state
-        self.parser2entry = {}
+        self.parser2entry.pop(task.name, None)
+
+    def on_task_abort(self, task):
+        self.parser2entry.pop(task.name, None)
 
 
 # Register plugin
@@ -1,50 +1,49 @@
 import logging
-import threading
-from httplib import BadStatusLine
+from datetime import datetime, timedelta
 from urllib import quote
-from urllib2 import URLError
-from flexget.utils.tools import urlopener
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from flexget import schema
+from flexget.event import event
+from flexget.utils import requests
 from flexget.utils.bittorrent import bdecode
+from flexget.utils.database import delete_chunked
 from flexget.plugin import register_plugin, priority
 
 log = logging.getLogger('torrent_alive')
+Base = schema.versioned_base('torrent_alive', 0)
 
+# Maximum number of info hashes asked from a tracker in one scrape request
+SCRAPE_BATCH = 50
+# Maximum number of scrape requests in progress at once
+SCRAPE_WORKERS = 4
+# Timeout in seconds for a single scrape request
+SCRAPE_TIMEOUT = 10
+# Time seed counts are trusted before trackers are scraped again
+SEEDS_CACHE_TIME = timedelta(minutes=30)
 
-class TorrentAliveThread(threading.Thread):
 
-    def __init__(self, tracker, info_hash):
-        threading.Thread.__init__(self)
-        self.tracker = tracker
-        self.info_hash = info_hash
-        self.tracker_seeds = 0
+class TrackerSeeds(Base):
+    """Seed counts scraped from trackers, shared by all tasks."""
 
-    def run(self):
-        try:
-            self.tracker_seeds = get_tracker_seeds(self.tracker, self.info_hash)
-        except URLError, e:
-            log.debug('Error scraping %s: %s' % (self.tracker, e))
-            self.tracker_seeds = 0
-        else:
-            log.debug('%s seeds found from %s' % (self.tracker_seeds, get_scrape_url(self.tracker, self.info_hash)))
+    __tablename__ = 'torrent_alive_seeds'
 
+    id = Column(Integer, primary_key=True)
+    tracker = Column(String)
+    info_hash = Column(String)
+    seeds = Column(Integer)
+    updated = Column(DateTime, default=datetime.now)
 
-def max_seeds_from_threads(threads):
-    """
-    Joins the threads and returns the maximum seeds found from any of them.
-
-    :param threads: A list of started `TorrentAliveThread`
-    :return: Maximum seeds found from any of the threads
-    """
-    seeds = 0
-    for background in threads:
-        log.debug('Coming up next: %s' % background.tracker)
-        background.join()
-        seeds = max(seeds, background.tracker_seeds)
-        log.debug('Current hightest number of seeds found: %s' % seeds)
-    return seeds
+Index('ix_torrent_alive_seeds_tracker_info_hash', TrackerSeeds.tracker, TrackerSeeds.info_hash)
 
 
-def get_scrape_url(tracker_url, info_hash):
+def get_scrape_url(tracker_url, info_hashes):
+    """
+    :param tracker_url: Announce url of the tracker
+    :param info_hashes: Info hash in hex, or list of them
+    :return: Scrape url asking for all given info hashes
+    """
+    if isinstance(info_hashes, basestring):
+        info_hashes = [info_hashes]
     if 'announce' in tracker_url:
         result = tracker_url.replace('announce', 'scrape')
     else:
@@ -53,33 +52,92 @@ def get_scrape_url(tracker_url, info_hash):
     if result.startswith('udp:'):
         result = result.replace('udp:', 'http:')
     result += '&' if '?' in result else '?'
-    result += 'info_hash=%s' % quote(info_hash.decode('hex'))
+    result += '&'.join('info_hash=%s' % quote(info_hash.decode('hex')) for info_hash in info_hashes)
     return result
 
 
-def get_tracker_seeds(url, info_hash):
-    url = get_scrape_url(url, info_hash)
-    if not url:
-        log.debug('if not url is true returning 0')
-        return 0
+def scrape_tracker(tracker, info_hashes):
+    """
+    Asks seed counts for all `info_hashes` from `tracker` with one scrape request.
+
+    :return: Dict mapping info hash to seeds. Hashes the tracker does not know about have 0 seeds.
+    :raises: RequestException or SyntaxError if scraping fails
+    """
+    url = get_scrape_url(tracker, info_hashes)
     log.debug('Checking for seeds from %s' % url)
-    data = None
-    try:
-        data = bdecode(urlopener(url, log, retries=1, timeout=10).read()).get('files')
-    except SyntaxError, e:
-        log.warning('Error decoding tracker response: %s' % e)
-        return 0
-    except BadStatusLine, e:
-        log.warning('Error BadStatusLine: %s' % e)
-        return 0
-    except IOError, e:
-        log.warning('Server error: %s' % e)
-        return 0
-    if not data:
-        log.debug('No data received from tracker scrape.')
-        return 0
-    log.debug('get_tracker_seeds is returning: %s' % data.values()[0]['complete'])
-    return data.values()[0]['complete']
+    data = bdecode(requests.get(url, timeout=SCRAPE_TIMEOUT).content).get('files') or {}
+    seeds = dict((info_hash, 0) for info_hash in info_hashes)
+    for raw_hash, stats in data.iteritems():
+        info_hash = raw_hash.encode('hex').upper()
+        if info_hash in seeds:
+            seeds[info_hash] = stats.get('complete', 0)
+    return seeds
+
+
+def scrape_batches(wanted):
+    """
+    Groups info hashes per tracker into batches of at most :data:`SCRAPE_BATCH`.
+
+    :param wanted: Dict mapping tracker to a list of info hashes
+    :return: List of (tracker, info hashes) tuples
+    """
+    batches = []
+    for tracker, info_hashes in sorted(wanted.iteritems()):
+        for i in xrange(0, len(info_hashes), SCRAPE_BATCH):
+            batches.append((tracker, info_hashes[i:i + SCRAPE_BATCH]))
+    return batches
+
+
+def get_seeds(session, torrents):
+    """
+    Finds out maximum seeds any tracker has for given torrents. Seed counts are taken from cache when fresh enough,
+    remaining ones are scraped concurrently, many info hashes per request.
+
+    :param session: Database session, only used from calling thread
+    :param torrents: Dict mapping info hash to list of trackers
+    :return: Dict mapping info hash to maximum seeds found
+    """
+    result = dict((info_hash, 0) for info_hash in torrents)
+    wanted = {}
+    for info_hash, trackers in torrents.iteritems():
+        for tracker in trackers:
+            wanted.setdefault(tracker, set()).add(info_hash)
+
+    # Use cached seeds where possible
+    cached = session.query(TrackerSeeds).filter(TrackerSeeds.info_hash.in_(torrents.keys())).\
+        filter(TrackerSeeds.updated > datetime.now() - SEEDS_CACHE_TIME).all()
+    for item in cached:
+        if item.info_hash in wanted.get(item.tracker, ()):
+            wanted[item.tracker].discard(item.info_hash)
+            result[item.info_hash] = max(result[item.info_hash], item.seeds)
+    wanted = dict((tracker, sorted(info_hashes)) for tracker, info_hashes in wanted.iteritems() if info_hashes)
+    if not wanted:
+        return result
+
+    batches = scrape_batches(wanted)
+    log.debug('Scraping %s info hashes from %s trackers with %s requests' %
+              (len(torrents), len(wanted), len(batches)))
+    scraped = requests.map_concurrently(lambda batch: scrape_tracker(*batch), batches, workers=SCRAPE_WORKERS)
+    for (tracker, info_hashes), seeds in zip(batches, scraped):
+        if isinstance(seeds, Exception):
+            # failed scrapes are not cached, tracker is asked again next time
+            log.debug('Error scraping %s: %s' % (tracker, seeds))
+            continue
+        session.query(TrackerSeeds).filter(TrackerSeeds.tracker == tracker).\
+            filter(TrackerSeeds.info_hash.in_(info_hashes)).delete(synchronize_session=False)
+        for info_hash, count in seeds.iteritems():
+            log.debug('%s seeds found for %s from %s' % (count, info_hash, tracker))
+            session.add(TrackerSeeds(tracker=tracker, info_hash=info_hash, seeds=count))
+            result[info_hash] = max(result[info_hash], count)
+    return result
+
+
+@event('manager.db_cleanup')
+def db_cleanup(session):
+    result, finished = delete_chunked(session, TrackerSeeds, TrackerSeeds.updated < datetime.now() - SEEDS_CACHE_TIME)
+    if result:
+        log.verbose('Removed %d expired seed counts from torrent_alive cache.' % result)
+    return finished
 
 
 class TorrentAlive(object):
@@ -121,50 +179,34 @@ class TorrentAlive(object):
         config = self.prepare_config(config)
         min_seeds = config['min_seeds']
 
+        # Collect all torrents first, so that trackers can be asked about all of them at once
+        checked = []
+        torrents = {}
         for entry in task.accepted:
             # TODO: shouldn't this still check min_seeds ?
             if entry.get('torrent_seeds'):
                 log.debug('Not checking trackers for seeds, as torrent_seeds is already filled.')
                 continue
-            log.debug('Checking for seeds for %s:' % entry['title'])
             torrent = entry.get('torrent')
-            if torrent:
-                seeds = 0
-                info_hash = torrent.get_info_hash()
-                announce_list = torrent.content.get('announce-list')
-                if announce_list:
-                    # Multitracker torrent
-                    threadlist = []
-                    for tier in announce_list:
-                        for tracker in tier:
-                            background = TorrentAliveThread(tracker, info_hash)
-                            try:
-                                background.start()
-                                threadlist.append(background)
-                            except threading.ThreadError:
-                                # If we can't start a new thread, wait for current ones to complete and continue
-                                log.debug('Reached max threads, finishing current threads.')
-                                seeds = max(seeds, max_seeds_from_threads(threadlist))
-                                background.start()
-                                threadlist = [background]
-                            log.debug('Started thread to scrape %s with info hash %s' % (tracker, info_hash))
-
-                    seeds = max(seeds, max_seeds_from_threads(threadlist))
-                    log.debug('Highest number of seeds found: %s' % seeds)
-                else:
-                    # Single tracker
-                    tracker = torrent.content['announce']
-                    try:
-                        seeds = get_tracker_seeds(tracker, info_hash)
-                    except URLError, e:
-                        log.debug('Error scraping %s: %s' % (tracker, e))
-
-                # Reject if needed
-                if seeds < min_seeds:
-                    task.reject(entry, reason='Tracker(s) had < %s required seeds. (%s)' % (min_seeds, seeds),
-                        remember_time=config['reject_for'])
-                    task.rerun()
-                else:
-                    log.debug('Found %i seeds from trackers' % seeds)
+            if not torrent:
+                continue
+            log.debug('Checking for seeds for %s:' % entry['title'])
+            info_hash = torrent.get_info_hash()
+            # the spec says, if announce-list present use ONLY that
+            trackers = torrent.get_multitrackers() or filter(None, [torrent.get_announce()])
+            torrents.setdefault(info_hash, set()).update(trackers)
+            checked.append((entry, info_hash))
+        if not checked:
+            return
+
+        seeds = get_seeds(task.session, torrents)
+        for entry, info_hash in checked:
+            # Reject if needed
+            if seeds[info_hash] < min_seeds:
+                task.reject(entry, reason='Tracker(s) had < %s required seeds. (%s)' % (min_seeds, seeds[info_hash]),
+                    remember_time=config['reject_for'])
+                task.rerun()
+            else:
+                log.debug('Found %i seeds from trackers' % seeds[info_hash])
 
 register_plugin(TorrentAlive, 'torrent_alive', api_ver=2)
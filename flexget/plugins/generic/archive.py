@@ -4,18 +4,20 @@ from argparse import Action, ArgumentError
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.schema import Table, ForeignKey
-from sqlalchemy import Column, Integer, DateTime, Unicode, Index
+from sqlalchemy import Column, Integer, DateTime, Unicode, Index, select
 from flexget import schema
 from flexget.event import event
 from flexget.entry import Entry
 from flexget.plugin import priority, register_parser_option, register_plugin
-from flexget.utils.sqlalchemy_utils import table_schema, get_index_by_name
+from flexget.utils.sqlalchemy_utils import table_schema, get_index_by_name, bulk_insert
 from flexget.utils.tools import console, strip_html
 from flexget.manager import Session
 
 log = logging.getLogger('archive')
 
 SCHEMA_VER = 0
+# Maximum amount of values used in one IN query, SQLite limits the number of bound parameters
+CHUNK_SIZE = 500
 
 Base = schema.versioned_base('archive', SCHEMA_VER)
 
@@ -104,6 +106,23 @@ def get_tag(name, session):
         return source
 
 
+def missing_links(session, table, column, entry_ids, ids):
+    """
+    :param table: Association table between archive entries and tags or sources
+    :param column: Column in *table* referencing tag or source
+    :param list entry_ids: Archive entry ids
+    :param list ids: Tag or source ids
+    :return: List of rows for *table* needed to link all entries to all given ids
+    """
+    existing = set()
+    for i in xrange(0, len(entry_ids), CHUNK_SIZE):
+        query = select([table.c.entry_id, column]).where(table.c.entry_id.in_(entry_ids[i:i + CHUNK_SIZE])).\
+            where(column.in_(ids))
+        existing.update(tuple(row) for row in session.execute(query))
+    return [{'entry_id': entry_id, column.name: id} for entry_id in entry_ids for id in ids
+            if (entry_id, id) not in existing]
+
+
 @schema.upgrade('archive')
 def upgrade(ver, session):
     if ver is None:
@@ -156,51 +175,58 @@ class Archive(object):
         else:
             tag_names = config
 
-        tags = []
-        for tag_name in set(tag_names):
-            tags.append(get_tag(tag_name, task.session))
-
-        count = 0
-        processed = []
+        # unique entries by title and url, in task order
+        entries = []
+        keys = set()
         for entry in task.entries + task.rejected + task.failed:
-            # I think entry can be in multiple of those lists .. not sure though!
-            if entry in processed:
-                continue
-            else:
-                processed.append(entry)
-
-            ae = task.session.query(ArchiveEntry).\
-                 filter(ArchiveEntry.title == entry['title']).\
-                 filter(ArchiveEntry.url == entry['url']).first()
-            if ae:
-                # add (missing) sources
-                source = get_source(task.name, task.session)
-                if not source in ae.sources:
-                    log.debug('Adding `%s` into `%s` sources' % (task.name, ae))
-                    ae.sources.append(source)
-                # add (missing) tags
-                for tag_name in tag_names:
-                    atag = get_tag(tag_name, task.session)
-                    if not atag in ae.tags:
-                        log.debug('Adding tag %s into %s' % (tag_name, ae))
-                        ae.tags.append(atag)
-            else:
-                # create new archive entry
-                ae = ArchiveEntry()
-                ae.title = entry['title']
-                ae.url = entry['url']
-                if 'description' in entry:
-                    ae.description = entry['description']
-                ae.task = task.name
-                ae.sources.append(get_source(task.name, task.session))
-                if tags:
-                    # note, we're extending empty list
-                    ae.tags.extend(tags)
-                log.debug('Adding `%s` with %i tags to archive' % (ae, len(tags)))
-                task.session.add(ae)
-                count += 1
-        if count:
-            log.verbose('Added %i new entries to archive' % count)
+            key = (entry['title'], entry['url'])
+            if key not in keys:
+                keys.add(key)
+                entries.append(entry)
+        if not entries:
+            return
+
+        # resolve tag and source ids, creating missing ones
+        tags = [get_tag(tag_name, task.session) for tag_name in set(tag_names)]
+        source = get_source(task.name, task.session)
+        task.session.add_all(tags + [source])
+        task.session.flush()
+        tag_ids = [tag.id for tag in tags]
+
+        # find entries already in the archive
+        existing = {}
+        titles = list(set(title for title, url in keys))
+        for i in xrange(0, len(titles), CHUNK_SIZE):
+            query = task.session.query(ArchiveEntry.id, ArchiveEntry.title, ArchiveEntry.url).\
+                filter(ArchiveEntry.title.in_(titles[i:i + CHUNK_SIZE]))
+            for id, title, url in query:
+                if (title, url) in keys:
+                    existing.setdefault((title, url), id)
+
+        # create new archive entries
+        now = datetime.now()
+        new_entries = [entry for entry in entries if (entry['title'], entry['url']) not in existing]
+        rows = [{'title': entry['title'], 'url': entry['url'], 'description': entry.get('description'),
+                 'feed': task.name, 'added': now} for entry in new_entries]
+        new_ids = bulk_insert(task.session, ArchiveEntry.__table__, rows)
+        for entry in new_entries:
+            log.debug('Adding `%s` with %i tags to archive' % (entry['title'], len(tag_ids)))
+
+        # add (missing) sources and tags
+        entry_ids = existing.values() + new_ids
+        source_rows = missing_links(task.session, archive_sources_table, archive_sources_table.c.source_id,
+                                    entry_ids, [source.id])
+        tag_rows = []
+        if tag_ids:
+            tag_rows = missing_links(task.session, archive_tags_table, archive_tags_table.c.tag_id,
+                                     entry_ids, tag_ids)
+        if source_rows:
+            task.session.execute(archive_sources_table.insert(), source_rows)
+        if tag_rows:
+            task.session.execute(archive_tags_table.insert(), tag_rows)
+
+        if new_ids:
+            log.verbose('Added %i new entries to archive' % len(new_ids))
 
     def on_task_abort(self, task, config):
         """
@@ -42,7 +42,6 @@ class AppleTrailers(InputRSS):
         get_plugin_by_name('headers')
         # configure them
         task.config['headers'] = {'User-Agent': 'QuickTime/7.6.6'}
-        self.quality = str(config)
 
     @priority(127)
     @cached('apple_trailers')
@@ -73,7 +72,7 @@ class AppleTrailers(InputRSS):
             for link in links:
                 url = link.get('href')
                 url = url[:url.rfind('_')]
-                quality = self.quality.lower()
+                quality = str(config).lower()
 
                 if quality == 'ipod':
                     url += '_i320.m4v'
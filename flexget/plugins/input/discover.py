@@ -1,5 +1,6 @@
 import logging
 from flexget.utils.cached_input import cached
+from flexget.utils.requests import map_concurrently
 from flexget.utils.search import StringComparator, MovieComparator, AnyComparator, clean_title
 from flexget.plugin import register_plugin, get_plugin_by_name, PluginError, \
     get_plugins_by_group, get_plugins_by_phase, PluginWarning
@@ -81,6 +82,20 @@ class Discover(object):
                         entry_urls.update(urls)
         return entries
 
+    def comparator(self, config):
+        """
+        :param config: Discover plugin config
+        :return: New comparator instance for `type` configuration
+        """
+        if config.get('type', 'normal') == 'normal':
+            return StringComparator(cutoff=0.7, cleaner=clean_title)
+        elif config['type'] == 'exact':
+            return StringComparator(cutoff=0.9)
+        elif config['type'] == 'any':
+            return AnyComparator()
+        else:
+            return MovieComparator()
+
     def execute_searches(self, config, entries):
         """
         :param config: Discover plugin config
@@ -89,14 +104,6 @@ class Discover(object):
         """
 
         result = []
-        if config.get('type', 'normal') == 'normal':
-            comparator = StringComparator(cutoff=0.7, cleaner=clean_title)
-        elif config['type'] == 'exact':
-            comparator = StringComparator(cutoff=0.9)
-        elif config['type'] == 'any':
-            comparator = AnyComparator()
-        else:
-            comparator = MovieComparator()
         for item in config['from']:
             if isinstance(item, dict):
                 plugin_name, plugin_config = item.items()[0]
@@ -105,13 +112,18 @@ class Discover(object):
             search = get_plugin_by_name(plugin_name).instance
             if not callable(getattr(search, 'search')):
                 log.critical('Search plugin %s does not implement search method' % plugin_name)
-            for entry in entries:
-                try:
-                    search_results = search.search(entry['title'], comparator, plugin_config)
-                    log.debug('Discovered %s entries from %s' % (len(search_results), plugin_name))
-                    result.extend(search_results[:config.get('limit')])
-                except (PluginError, PluginWarning):
+            # searches do not get the task, so they can be safely run concurrently
+            # comparators hold state, each search needs it's own
+            all_results = map_concurrently(
+                lambda entry: search.search(entry['title'], self.comparator(config), plugin_config), entries)
+            for search_results in all_results:
+                if isinstance(search_results, (PluginError, PluginWarning)):
                     log.debug('No results from %s' % plugin_name)
+                    continue
+                elif isinstance(search_results, Exception):
+                    raise search_results
+                log.debug('Discovered %s entries from %s' % (len(search_results), plugin_name))
+                result.extend(search_results[:config.get('limit')])
         return sorted(result, reverse=True, key=lambda x: x.get('search_sort'))
 
     @cached('discover')
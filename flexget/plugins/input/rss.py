@@ -9,7 +9,7 @@ import feedparser
 from requests import RequestException
 from flexget.entry import Entry
 from flexget.plugin import register_plugin, internet, PluginError
-from flexget.utils.cached_input import cached
+from flexget.utils.cached_input import cached, http_cache
 from flexget.utils.tools import decode_html
 
 log = logging.getLogger('rss')
@@ -173,25 +173,12 @@ class InputRSS(object):
 
         log.debug('Requesting task `%s` url `%s`' % (task.name, config['url']))
 
-        # Used to identify which etag/modified to use
+        # Used to identify last processed entry
         url_hash = str(hash(config['url']))
 
-        # set etag and last modified headers if config has not changed since
+        # send etag and last modified headers if config has not changed since
         # last run and if caching wasn't disabled with --no-cache argument.
         all_entries = config['all_entries'] or task.config_modified or task.manager.options.nocache
-        headers = {}
-        if not all_entries:
-            etag = task.simple_persistence.get('%s_etag' % url_hash, None)
-            if etag:
-                log.debug('Sending etag %s for task %s' % (etag, task.name))
-                headers['If-None-Match'] = etag
-            modified = task.simple_persistence.get('%s_modified' % url_hash, None)
-            if modified:
-                if not isinstance(modified, basestring):
-                    log.debug('Invalid date was stored for last modified time.')
-                else:
-                    headers['If-Modified-Since'] = modified
-                    log.debug('Sending last-modified %s for task %s' % (headers['If-Modified-Since'], task.name))
 
         # Get the feed content
         if config['url'].startswith(('http', 'https', 'ftp', 'file')):
@@ -199,6 +186,14 @@ class InputRSS(object):
             auth = None
             if 'username' in config and 'password' in config:
                 auth = (config['username'], config['password'])
+            headers = {}
+            http = http_cache(task.session, task.name, config['url'])
+            # in all_entries mode validators are only useful when there are entries from last run to fall back on
+            if not (task.config_modified or task.manager.options.nocache) and \
+                    (not config['all_entries'] or http.entries is not None):
+                headers = http.headers
+                if headers:
+                    log.debug('Sending conditional headers %s for task %s' % (headers, task.name))
             try:
                 # Use the raw response so feedparser can read the headers and status values
                 response = task.requests.get(config['url'], timeout=60, headers=headers, raise_status=False, auth=auth)
@@ -210,9 +205,13 @@ class InputRSS(object):
             # status checks
             status = response.status_code
             if status == 304:
-                log.verbose('%s hasn\'t changed since last run. Not creating entries.' % config['url'])
                 # Let details plugin know that it is ok if this feed doesn't produce any entries
                 task.no_entries_ok = True
+                if config['all_entries']:
+                    # feed is unchanged, no need to parse it again
+                    log.verbose('%s hasn\'t changed since last run. Using entries from last run.' % config['url'])
+                    return http.get_entries()
+                log.verbose('%s hasn\'t changed since last run. Not creating entries.' % config['url'])
                 return []
             elif status == 401:
                 raise PluginError('Authentication needed for task %s (%s): %s' %\
@@ -223,19 +222,9 @@ class InputRSS(object):
                 raise PluginError('Internal server exception on task %s (%s)' % (task.name, config['url']), log)
             elif status != 200:
                 raise PluginError('HTTP error %s received from %s' % (status, config['url']), log)
-
-            # update etag and last modified
-            if not config['all_entries']:
-                etag = response.headers.get('etag')
-                if etag:
-                    task.simple_persistence['%s_etag' % url_hash] = etag
-                    log.debug('etag %s saved for task %s' % (etag, task.name))
-                if  response.headers.get('last-modified'):
-                    modified = response.headers['last-modified']
-                    task.simple_persistence['%s_modified' % url_hash] = modified
-                    log.debug('last modified %s saved for task %s' % (modified, task.name))
         else:
             # This is a file, open it
+            http = None
             content = open(config['url'], 'rb').read()
 
         if not content:
@@ -451,6 +440,11 @@ class InputRSS(object):
             if not config.get('silent'):
                 log.warning('Skipped %s RSS-entries without required information (title, link or enclosures)' % ignored)
 
+        # remember etag and last modified, when all entries are produced they are also reused if the feed has
+        # not changed on next run
+        if http is not None:
+            http.store(response, entries if config['all_entries'] else None)
+
         return entries
 
 register_plugin(InputRSS, 'rss', api_ver=2)
@@ -45,7 +45,7 @@ class MetainfoSeries(object):
     def guess_series(self, title, allow_seasonless=False, quality=None):
         """Returns a valid series parser if this `title` appears to be a series"""
 
-        parser = SeriesParser(identified_by='auto', allow_seasonless=allow_seasonless)
+        parser = SeriesParser(identified_by='auto', allow_seasonless=allow_seasonless, name_guessed=True)
         # We need to replace certain characters with spaces to make sure episode parsing works right
         # We don't remove anything, as the match positions should line up with the original title
         clean_title = re.sub('[_.,\[\]\(\):]', ' ', title)
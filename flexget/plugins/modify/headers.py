@@ -71,4 +71,5 @@ class PluginHeaders(object):
 
     on_task_abort = on_task_exit
 
-register_plugin(PluginHeaders, 'headers', api_ver=2)
+# installs process wide urllib2 opener, tasks using it cannot be executed concurrently
+register_plugin(PluginHeaders, 'headers', api_ver=2, concurrent=False)
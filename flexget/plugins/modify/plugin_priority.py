@@ -1,5 +1,5 @@
 import logging
-from flexget.plugin import plugins, register_plugin
+from flexget.plugin import get_plugin_by_name, register_plugin
 
 log = logging.getLogger('p_priority')
 
@@ -22,35 +22,13 @@ class PluginPriority(object):
         config.accept_any_key('integer')
         return config
 
-    def __init__(self):
-        self.priorities = {}
-
     def on_task_start(self, task):
-        self.priorities = {}
-        names = []
+        # priorities are changed only for this task, plugin registry is shared with tasks executing concurrently
         for name, priority in task.config.get('plugin_priority', {}).iteritems():
-            names.append(name)
-            originals = self.priorities.setdefault(name, {})
-            for phase, event in plugins[name].phase_handlers.iteritems():
-                originals[phase] = event.priority
-                log.debug('stored %s original value %s' % (phase, event.priority))
-                event.priority = priority
-                log.debug('set %s new value %s' % (phase, priority))
-        log.debug('Changed priority for: %s' % ', '.join(names))
-
-    def on_task_exit(self, task):
-        if not self.priorities:
-            log.debug('nothing changed, aborting restore')
-            return
-        names = []
-        for name in task.config.get('plugin_priority', {}).keys():
-            names.append(name)
-            originals = self.priorities[name]
-            for phase, priority in originals.iteritems():
-                plugins[name].phase_handlers[phase].priority = priority
-        log.debug('Restored priority for: %s' % ', '.join(names))
-        self.priorities = {}
-
-    on_task_abort = on_task_exit
+            # make sure plugin exists
+            get_plugin_by_name(name)
+            task.plugin_priorities[name] = priority
+            log.debug('set %s priority to %s' % (name, priority))
+        log.debug('Changed priority for: %s' % ', '.join(task.plugin_priorities))
 
 register_plugin(PluginPriority, 'plugin_priority')
@@ -56,10 +56,9 @@ class TorrentScrub(plugin.Plugin):
             if mode in ("on", "all", "true"):
                 modified = bittorrent.clean_meta(metainfo, including_info=(mode == "all"), logger=self.log.debug)
             elif mode in ("resume", "rtorrent"):
-                if mode == "resume":
-                    self.RT_KEYS = self.RT_KEYS[:1]
+                rt_keys = self.RT_KEYS[:1] if mode == "resume" else self.RT_KEYS
 
-                for key in self.RT_KEYS:
+                for key in rt_keys:
                     if key in metainfo:
                         self.log.debug("Removing key '%s'..." % (key,))
                         del metainfo[key]
@@ -1,22 +1,17 @@
 import logging
-from flexget import plugin
-from flexget.plugin import priority, register_plugin, plugins
+from flexget.plugin import priority, register_plugin, get_loaded_plugins
 
 log = logging.getLogger('builtins')
 
 
 def all_builtins():
     """Helper function to return an iterator over all builtin plugins."""
-    return (plugin for plugin in plugins.itervalues() if plugin.builtin)
+    return (plugin for plugin in get_loaded_plugins() if plugin.builtin)
 
 
 class PluginDisableBuiltins(object):
     """Disables all (or specific) builtin plugins from a task."""
 
-    def __init__(self):
-        # cannot trust that on_task_start would have been executed
-        self.disabled = []
-
     def validator(self):
         from flexget import validator
         root = validator.factory()
@@ -29,26 +24,13 @@ class PluginDisableBuiltins(object):
 
     @priority(255)
     def on_task_start(self, task, config):
-        self.disabled = []
         if not config:
             return
 
+        # builtins are disabled only for this task, plugin registry is shared with tasks executing concurrently
         for plugin in all_builtins():
             if config is True or plugin.name in config:
-                plugin.builtin = False
-                self.disabled.append(plugin.name)
-        log.debug('Disabled builtin plugin(s): %s' % ', '.join(self.disabled))
-
-    @priority(-255)
-    def on_task_exit(self, task, config):
-        if not self.disabled:
-            return
-
-        for name in self.disabled:
-            plugin.plugins[name].builtin = True
-        log.debug('Enabled builtin plugin(s): %s' % ', '.join(self.disabled))
-        self.disabled = []
-
-    on_task_abort = on_task_exit
+                task.disabled_builtins.add(plugin.name)
+        log.debug('Disabled builtin plugin(s): %s' % ', '.join(task.disabled_builtins))
 
 register_plugin(PluginDisableBuiltins, 'disable_builtins', api_ver=2)
@@ -173,4 +173,5 @@ class PluginCookies:
     def on_process_end(self, task, config):
         self.cookiejars = {}
 
-register_plugin(PluginCookies, 'cookies', api_ver=2)
+# installs process wide urllib2 opener, tasks using it cannot be executed concurrently
+register_plugin(PluginCookies, 'cookies', api_ver=2, concurrent=False)
@@ -769,5 +769,6 @@ class OutputDeluge(DelugePlugin):
         self.on_task_exit(task, config)
 
 
-register_plugin(InputDeluge, 'from_deluge', api_ver=2)
-register_plugin(OutputDeluge, 'deluge', api_ver=2)
+# twisted reactor can only be run by one task at a time
+register_plugin(InputDeluge, 'from_deluge', api_ver=2, concurrent=False)
+register_plugin(OutputDeluge, 'deluge', api_ver=2, concurrent=False)
@@ -91,4 +91,5 @@ class FormLogin(object):
     # Task aborted, unhook the cookiejar
     on_task_abort = on_task_exit
 
-register_plugin(FormLogin, 'form', api_ver=2)
+# installs process wide urllib2 opener, tasks using it cannot be executed concurrently
+register_plugin(FormLogin, 'form', api_ver=2, concurrent=False)
@@ -1,7 +1,8 @@
 import logging
 from flexget import validator
 from flexget.manager import register_config_key
-from flexget.plugin import priority, register_plugin, PluginError, register_parser_option, plugins as all_plugins
+from flexget.plugin import priority, register_plugin, PluginError, register_parser_option, get_plugin_keywords, \
+    plugins as all_plugins
 
 log = logging.getLogger('preset')
 
@@ -142,7 +143,9 @@ class DisablePlugin(object):
 def root_config_validator():
     """Returns a validator for the 'presets' key of config."""
     # TODO: better error messages
-    valid_plugins = [p for p in all_plugins if hasattr(all_plugins[p].instance, 'validator')]
+    # plugins not loaded yet are assumed to have a validator
+    valid_plugins = [p for p in get_plugin_keywords()
+                     if p not in all_plugins or hasattr(all_plugins[p].instance, 'validator')]
     root = validator.factory('dict')
     root.reject_keys(valid_plugins, message='plugins should go under a specific preset. '
         '(and presets are not allowed to be named the same as any plugins)')
@@ -100,4 +100,5 @@ class PluginSpyHeaders(object):
     # remove also on abort
     on_task_abort = on_task_exit
 
-register_plugin(PluginSpyHeaders, 'spy_headers')
+# installs process wide urllib2 opener, tasks using it cannot be executed concurrently
+register_plugin(PluginSpyHeaders, 'spy_headers', concurrent=False)
@@ -360,5 +360,6 @@ class PluginTransmission(TransmissionBase):
 
     on_task_abort = on_task_exit
 
-register_plugin(PluginTransmission, 'transmission', api_ver=2)
-register_plugin(PluginTransmissionInput, 'from_transmission', api_ver=2)
+# client is kept in plugin instance and urllib2 opener is swapped process wide
+register_plugin(PluginTransmission, 'transmission', api_ver=2, concurrent=False)
+register_plugin(PluginTransmissionInput, 'from_transmission', api_ver=2, concurrent=False)
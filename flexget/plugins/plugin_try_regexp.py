@@ -1,4 +1,5 @@
 import logging
+import threading
 from flexget.plugin import register_plugin, register_parser_option
 
 log = logging.getLogger('try_regexp')
@@ -11,6 +12,8 @@ class PluginTryRegexp:
 
     def __init__(self):
         self.abort = False
+        # tasks executed concurrently take turns at the prompt
+        self.prompt_lock = threading.Lock()
 
     def matches(self, entry, regexp):
         """Return True if any of the entry string fields match given regexp"""
@@ -25,6 +28,13 @@ class PluginTryRegexp:
     def on_task_filter(self, task):
         if not task.manager.options.try_regexp:
             return
+        self.prompt_lock.acquire()
+        try:
+            self.try_regexps(task)
+        finally:
+            self.prompt_lock.release()
+
+    def try_regexps(self, task):
         if self.abort:
             return
 
@@ -17,7 +17,9 @@ class UrlRewrite(object):
           format: http://www.demonoid.com/files/download/HTTP/
     """
 
-    resolves = {}
+    def __init__(self):
+        # task name -> resolves configured for the task
+        self.resolves = {}
 
     # built-in resolves
 
@@ -37,16 +39,18 @@ class UrlRewrite(object):
         return root
 
     def on_task_start(self, task):
+        resolves = self.resolves[task.name] = {}
         for name, config in task.config.get('urlrewrite', {}).iteritems():
             match = re.compile(config['regexp'])
             format = config['format']
-            self.resolves[name] = {'regexp_compiled': match, 'format': format, 'regexp': config['regexp']}
+            resolves[name] = {'regexp_compiled': match, 'format': format, 'regexp': config['regexp']}
             log.debug('Added rewrite %s' % name)
 
     def url_rewritable(self, task, entry):
         log.trace('running url_rewritable')
-        log.trace(self.resolves)
-        for name, config in self.resolves.iteritems():
+        resolves = self.resolves.get(task.name, {})
+        log.trace(resolves)
+        for name, config in resolves.iteritems():
             regexp = config['regexp_compiled']
             log.trace('testing %s' % config['regexp'])
             if regexp.search(entry['url']):
@@ -54,7 +58,7 @@ class UrlRewrite(object):
         return False
 
     def url_rewrite(self, task, entry):
-        for name, config in self.resolves.iteritems():
+        for name, config in self.resolves.get(task.name, {}).iteritems():
             regexp = config['regexp_compiled']
             format = config['format']
             if regexp.search(entry['url']):
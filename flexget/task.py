@@ -1,22 +1,34 @@
 import logging
 import copy
 import hashlib
+import threading
 from functools import wraps
 import itertools
 from sqlalchemy import Column, Unicode, String, Integer
 from flexget import validator
 from flexget import schema
 from flexget.manager import Session, register_config_key
-from flexget.plugin import get_plugins_by_phase, get_plugin_by_name, \
-    task_phases, PluginWarning, PluginError, DependencyError, plugins as all_plugins
+from flexget.plugin import get_plugins_by_phase_sorted, get_plugin_by_name, get_plugin_keywords, \
+    get_loaded_plugins, task_phases, PluginWarning, PluginError, DependencyError, plugins as all_plugins
 from flexget.utils.simple_persistence import SimpleTaskPersistence, SimplePersistence
+from flexget.utils.tools import LRUCache
 import flexget.utils.requests as requests
-from flexget.event import fire_event
+from flexget.event import fire_event, has_listeners
 from flexget.entry import Entry, EntryUnicodeError
 
 log = logging.getLogger('task')
 Base = schema.versioned_base('feed', 0)
 
+# Plugin validators share state while being built and validating, tasks executed concurrently must not validate
+# at the same time
+_validate_lock = threading.Lock()
+# Validator trees are built once per plugin and reused, plugin name -> (plugin instance, root validator)
+_validators = {}
+# Configs that have been validated, config hash -> list of errors
+_validated_configs = LRUCache(1000)
+# Number of plugins when caches above were filled, plugins registered later may change the validators
+_validated_plugin_count = [0]
+
 
 class TaskConfigHash(Base):
     """Stores the config hash for tasks so that we can tell if the config has changed since last run."""
@@ -47,22 +59,25 @@ def useTaskLogging(func):
 
 
 class EntryIterator(object):
-    """An iterator over a subset of entries to emulate old task.accepted/rejected/failed/entries properties."""
+    """A view over entries of an :class:`EntryContainer` which are in given states, to emulate old
+    task.accepted/rejected/failed/entries properties. Entries are in the same order as in the container."""
 
     def __init__(self, entries, states):
         self.all_entries = entries
         if isinstance(states, basestring):
             states = [states]
-        self.filter = lambda e: e._state in states
+        self.states = tuple(states)
 
     def __iter__(self):
-        return itertools.ifilter(self.filter, self.all_entries)
+        return iter(self.all_entries.in_states(self.states))
+
+    def __nonzero__(self):
+        return self.all_entries.count_in_states(self.states) > 0
 
-    def __bool__(self):
-        return any(e for e in self)
+    __bool__ = __nonzero__
 
     def __len__(self):
-        return sum(1 for e in self)
+        return self.all_entries.count_in_states(self.states)
 
     def __add__(self, other):
         return itertools.chain(self, other)
@@ -73,14 +88,13 @@ class EntryIterator(object):
     def __getitem__(self, item):
         if not isinstance(item, int):
             raise ValueError('Index must be integer.')
-        for index, entry in enumerate(self):
-            if index == item:
-                return entry
-        else:
+        entries = self.all_entries.in_states(self.states)
+        if not 0 <= item < len(entries):
             raise IndexError('%d is out of bounds' % item)
+        return entries[item]
 
     def __getslice__(self, a, b):
-        return list(itertools.islice(self, a, b))
+        return self.all_entries.in_states(self.states)[a:b]
 
     def reverse(self):
         self.all_entries.sort(reverse=True)
@@ -89,14 +103,32 @@ class EntryIterator(object):
         self.all_entries.sort(*args, **kwargs)
 
 
+def _reindexing(method):
+    """Decorates list method of :class:`EntryContainer`, so that state indexes are rebuilt after it is called."""
+
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._reindex()
+
+    wrapper.__name__ = method.__name__
+    return wrapper
+
+
 class EntryContainer(list):
-    """Container for a list of entries, also contains accepted, rejected failed iterators over them."""
+    """Container for a list of entries, also contains accepted, rejected failed iterators over them.
+
+    Entries are indexed by their state, index is kept up to date by :meth:`Entry.accept` and friends. This makes
+    lengths of the iterators constant time and iterating them proportional to number of entries in the state.
+    """
 
     def __init__(self, iterable=None, task=None):
         list.__init__(self, iterable or [])
         self.task = task
         for entry in self:
             entry.task = task
+        self._reindex()
 
         self._entries = EntryIterator(self, ['undecided', 'accepted'])
         self._accepted = EntryIterator(self, 'accepted') # accepted entries, can still be rejected
@@ -111,14 +143,81 @@ class EntryContainer(list):
     failed = property(lambda self: self._failed)
     undecided = property(lambda self: self._undecided)
 
+    def _reindex(self):
+        # state -> {position in container: entry}
+        self._states = {'undecided': {}, 'accepted': {}, 'rejected': {}, 'failed': {}}
+        # id(entry) -> positions of entry in container
+        self._positions = {}
+        # states -> list of entries in the states, in container order
+        self._ordered = {}
+        # Entries only notify container of their own task when their state changes. If entries belonging to some
+        # other task are put in this container (by assigning to slice), index cannot be kept up to date.
+        self._indexed = all(entry.task is self.task for entry in self)
+        if self._indexed:
+            for position, entry in enumerate(self):
+                self._index(position, entry)
+
+    def _index(self, position, entry):
+        self._positions.setdefault(id(entry), []).append(position)
+        self._states[entry._state][position] = entry
+        self._ordered = {}
+
+    def state_changed(self, entry, old_state):
+        """Called by *entry* when it's state has changed from *old_state*."""
+        if not self._indexed:
+            return
+        for position in self._positions.get(id(entry), []):
+            del self._states[old_state][position]
+            self._states[entry._state][position] = entry
+        self._ordered = {}
+
+    def in_states(self, states):
+        """
+        :param tuple states: Entry states
+        :return: List of entries in *states*, in container order. Must not be modified.
+        """
+        if not self._indexed:
+            return [entry for entry in self if entry._state in states]
+        result = self._ordered.get(states)
+        if result is None:
+            if len(states) == 1:
+                items = sorted(self._states[states[0]].iteritems())
+            else:
+                items = sorted(item for state in states for item in self._states[state].iteritems())
+            result = self._ordered[states] = [entry for position, entry in items]
+        return result
+
+    def count_in_states(self, states):
+        """
+        :param tuple states: Entry states
+        :return: Number of entries in *states*
+        """
+        if not self._indexed:
+            return len(self.in_states(states))
+        return sum(len(self._states[state]) for state in states)
+
     def append(self, entry):
         entry.task = self.task
         list.append(self, entry)
+        if self._indexed:
+            self._index(len(self) - 1, entry)
 
     def extend(self, iterable):
         for entry in iterable:
             self.append(entry)
 
+    # Other modifications may move entries around, rebuild the index after them
+    __setitem__ = _reindexing(list.__setitem__)
+    __delitem__ = _reindexing(list.__delitem__)
+    __setslice__ = _reindexing(list.__setslice__)
+    __delslice__ = _reindexing(list.__delslice__)
+    __iadd__ = _reindexing(list.__iadd__)
+    insert = _reindexing(list.insert)
+    remove = _reindexing(list.remove)
+    pop = _reindexing(list.pop)
+    sort = _reindexing(list.sort)
+    reverse = _reindexing(list.reverse)
+
     def __repr__(self):
         return '<EntryContainer(task=%s,%s)' % (self.task.name, list.__repr__(self))
 
@@ -200,6 +299,11 @@ class Task(object):
 
         self.disabled_phases = []
 
+        # Changes to plugin registry made for this execution only, by disable_builtins and plugin_priority.
+        # Registry itself is shared by all tasks, which may be executing at the same time.
+        self.disabled_builtins = set()
+        self.plugin_priorities = {}
+
         # TODO: task.abort() should be done by using exception? not a flag that has to be checked everywhere
         self._abort = False
         self._abort_reason = None
@@ -228,7 +332,7 @@ class Task(object):
     @property
     def undecided(self):
         """Iterate over undecided entries"""
-        return (entry for entry in self.entries if not entry in self.accepted and entry not in self.rejected)
+        return self.all_entries.undecided
 
     def disable_phase(self, phase):
         """Disable ``phase`` from execution.
@@ -334,10 +438,15 @@ class Task(object):
           An iterator over configured :class:`flexget.plugin.PluginInfo` instances enabled on this task.
         """
         if phase:
-            plugins = sorted(get_plugins_by_phase(phase), key=lambda p: p.phase_handlers[phase], reverse=True)
+            plugins = get_plugins_by_phase_sorted(phase)
+            if self.plugin_priorities:
+                plugins = sorted(plugins, key=lambda p: self.plugin_priorities.get(p.name,
+                                                                                  p.phase_handlers[phase].priority),
+                                 reverse=True)
         else:
-            plugins = all_plugins.itervalues()
-        return (p for p in plugins if p.name in self.config or p.builtin)
+            plugins = get_loaded_plugins()
+        return (p for p in plugins if p.name in self.config or
+                (p.builtin and p.name not in self.disabled_builtins))
 
     def __run_task_phase(self, phase):
         """Executes task phase, ie. call all enabled plugins on the task.
@@ -378,13 +487,15 @@ class Task(object):
                 args = (self, copy.copy(self.config.get(plugin.name)))
 
             try:
-                fire_event('task.execute.before_plugin', self, plugin.name)
+                if has_listeners('task.execute.before_plugin'):
+                    fire_event('task.execute.before_plugin', self, plugin.name)
                 response = self.__run_plugin(plugin, phase, args)
                 if phase == 'input' and response:
                     # add entries returned by input to self.entries
                     self.all_entries.extend(response)
             finally:
-                fire_event('task.execute.after_plugin', self, plugin.name)
+                if has_listeners('task.execute.after_plugin'):
+                    fire_event('task.execute.after_plugin', self, plugin.name)
 
             # Make sure we abort if any plugin sets our abort flag
             if self._abort and phase != 'abort':
@@ -506,6 +617,7 @@ class Task(object):
 
         log.debug('starting session')
         self.session = Session()
+        self.simple_persistence.reset()
 
         # Save current config hash and set config_modidied flag
         config_hash = hashlib.md5(str(self.config.items())).hexdigest()
@@ -543,11 +655,14 @@ class Task(object):
                     return
 
             log.debug('committing session, abort=%s' % self._abort)
+            self.simple_persistence.flush()
             self.session.commit()
             fire_event('task.execute.completed', self)
         finally:
             # this will cause database rollback on exception and task.abort
             self.session.close()
+            # values loaded during this execution may be stale next time, unflushed changes are rolled back
+            self.simple_persistence.reset()
 
         # rerun task
         if self._rerun:
@@ -595,12 +710,57 @@ class Task(object):
 
     @staticmethod
     def validate_config(config):
-        """Plugin configuration validation. Return list of error messages that were detected."""
-        validate_errors = []
+        """
+        Plugin configuration validation. Return list of error messages that were detected.
+
+        Results are cached by config hash, so an unchanged config is only validated once. Results of configs
+        whose validation checked the filesystem (file and path validators) are not cached.
+        """
         # validate config is a dictionary
         if not isinstance(config, dict):
-            validate_errors.append('Config is not a dictionary.')
-            return validate_errors
+            return ['Config is not a dictionary.']
+        _validate_lock.acquire()
+        try:
+            if _validated_plugin_count[0] != len(all_plugins):
+                _validators.clear()
+                _validated_configs.clear()
+                _validated_plugin_count[0] = len(all_plugins)
+            config_hash = hashlib.md5(str(config.items())).hexdigest()
+            validate_errors = _validated_configs.get(config_hash)
+            if validate_errors is None:
+                validate_errors, checked_filesystem = Task._validate_plugins(config)
+                if not checked_filesystem:
+                    _validated_configs.set(config_hash, validate_errors)
+        finally:
+            _validate_lock.release()
+        return list(validate_errors)
+
+    @staticmethod
+    def get_validator(plugin):
+        """
+        Return root validator for plugin, built once and reused for every validation.
+
+        :param plugin: :class:`flexget.plugin.PluginInfo` having validator method
+        :raises TypeError: If plugin validator method is invalid
+        """
+        cached = _validators.get(plugin.name)
+        if cached and cached[0] is plugin.instance:
+            validator = cached[1]
+        else:
+            validator = plugin.instance.validator()
+            if not validator.name == 'root':
+                # if validator is not root type, add root validator as it's parent
+                validator = validator.add_root_parent()
+            _validators[plugin.name] = (plugin.instance, validator)
+        # errors are collected to the root, start with no errors from previous validations
+        validator._errors = None
+        return validator
+
+    @staticmethod
+    def _validate_plugins(config):
+        """:return: Tuple of error messages, and whether any validator checked the filesystem"""
+        validate_errors = []
+        checked_filesystem = False
         # validate all plugins
         for keyword in config:
             if keyword.startswith('_'):
@@ -612,27 +772,27 @@ class Task(object):
                 continue
             if hasattr(plugin.instance, 'validator'):
                 try:
-                    validator = plugin.instance.validator()
+                    validator = Task.get_validator(plugin)
                 except TypeError, e:
                     log.critical('Invalid validator method in plugin %s' % keyword)
                     log.exception(e)
                     continue
-                if not validator.name == 'root':
-                    # if validator is not root type, add root validator as it's parent
-                    validator = validator.add_root_parent()
                 if not validator.validate(config[keyword]):
                     for msg in validator.errors.messages:
                         validate_errors.append('%s %s' % (keyword, msg))
+                checked_filesystem = checked_filesystem or validator.errors.checked_filesystem
             else:
                 log.warning('Used plugin %s does not support validating. Please notify author!' % keyword)
 
-        return validate_errors
+        return validate_errors, checked_filesystem
 
 
 def root_config_validator():
     """Returns a validator for the 'tasks' key of config."""
     # TODO: better error messages
-    valid_plugins = [p for p in all_plugins if hasattr(all_plugins[p].instance, 'validator')]
+    # plugins not loaded yet are assumed to have a validator
+    valid_plugins = [p for p in get_plugin_keywords()
+                     if p not in all_plugins or hasattr(all_plugins[p].instance, 'validator')]
     root = validator.factory('dict')
     root.reject_keys(valid_plugins, message='plugins should go under a specific task. '
         '(and tasks are not allowed to be named the same as any plugins)')
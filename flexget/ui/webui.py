@@ -136,11 +136,11 @@ def start(mg):
     global manager
     manager = mg
 
-    # Create sqlalchemy session for Flask usage
+    # Create sqlalchemy session for Flask usage, requests use connections separate from running tasks
     global db_session
     db_session = scoped_session(sessionmaker(autocommit=False,
                                              autoflush=False,
-                                             bind=manager.engine))
+                                             bind=manager.reader_engine))
     if db_session is None:
         raise Exception('db_session is None')
 
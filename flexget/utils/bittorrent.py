@@ -1,6 +1,4 @@
 """Torrenting utils, mostly for handling bencoding and torrent files."""
-# Torrent decoding is a short fragment from effbot.org. Site copyright says:
-# Test scripts and other short code fragments can be considered as being in the public domain.
 import re
 import logging
 
@@ -89,99 +87,195 @@ def is_torrent_file(metafilepath):
     return bool(magic_marker)
 
 
-def tokenize(text, match=re.compile("([idel])|(\d+):|(-?\d+)").match):
-    i = 0
-    while i < len(text):
-        m = match(text, i)
-        s = m.group(m.lastindex)
-        i = m.end()
-        if m.lastindex == 2:
-            yield "s"
-            yield text[i:i + int(s)]
-            i += int(s)
+def decode(text, start=0, end=None):
+    """
+    Decode bencoded :text: in a single iterative pass.
+
+    :param start: Offset where bencoded value starts in text
+    :param end: Offset where bencoded value ends in text, defaults to end of text
+    :return: Tuple (data, info_span), where info_span is (start, end) offsets of the value of `info` key in the
+      top level dictionary, or None if there is no such key.
+    :raises SyntaxError: If text is not valid bencoding
+    """
+    # containers being decoded, as (type, items, start offset); dictionary items are stored as flat key, value list
+    stack = []
+    info_span = None
+    pos = start
+    length = len(text) if end is None else end
+    try:
+        while True:
+            if pos >= length:
+                raise ValueError('unexpected end of data')
+            c = text[pos]
+            if c == 'i':
+                end = text.index('e', pos + 1, length)
+                value = int(text[pos + 1:end])
+                pos = end + 1
+            elif '0' <= c <= '9':
+                colon = text.index(':', pos, length)
+                start = colon + 1
+                pos = start + int(text[pos:colon])
+                if pos > length:
+                    raise ValueError('string exceeds data')
+                value = text[start:pos]
+            elif c == 'l' or c == 'd':
+                stack.append((c, [], pos))
+                pos += 1
+                continue
+            elif c == 'e':
+                kind, items, start = stack.pop()
+                pos += 1
+                if kind == 'd':
+                    if len(items) % 2:
+                        raise ValueError('dictionary key without value')
+                    value = dict(zip(items[0::2], items[1::2]))
+                    if len(stack) == 1:
+                        parent = stack[0]
+                        if parent[0] == 'd' and len(parent[1]) % 2 and parent[1][-1] == 'info':
+                            info_span = (start, pos)
+                else:
+                    value = items
+            else:
+                raise ValueError('invalid token %r' % c)
+            if not stack:
+                break
+            stack[-1][1].append(value)
+    except (IndexError, ValueError):
+        raise SyntaxError("syntax error")
+    if pos != length:
+        raise SyntaxError("trailing junk")
+    return value, info_span
+
+
+def _skip(text, pos, length):
+    """Return offset where bencoded value starting at :pos: ends, checking its structure without decoding it."""
+    depth = 0
+    while True:
+        if pos >= length:
+            raise ValueError('unexpected end of data')
+        c = text[pos]
+        if c == 'i':
+            end = text.index('e', pos + 1, length)
+            int(text[pos + 1:end])
+            pos = end + 1
+        elif '0' <= c <= '9':
+            colon = text.index(':', pos, length)
+            pos = colon + 1 + int(text[pos:colon])
+            if pos > length:
+                raise ValueError('string exceeds data')
+        elif c == 'l' or c == 'd':
+            depth += 1
+            pos += 1
+            continue
+        elif c == 'e' and depth:
+            depth -= 1
+            pos += 1
         else:
-            yield s
-
-
-def decode_item(next, token):
-    if token == "i":
-        # integer: "i" value "e"
-        data = int(next())
-        if next() != "e":
-            raise ValueError
-    elif token == "s":
-        # string: "s" value (virtual tokens)
-        data = next()
-    elif token == "l" or token == "d":
-        # container: "l" (or "d") values "e"
-        data = []
-        tok = next()
-        while tok != "e":
-            data.append(decode_item(next, tok))
-            tok = next()
-        if token == "d":
-            data = dict(zip(data[0::2], data[1::2]))
-    else:
-        raise ValueError
-    return data
+            raise ValueError('invalid token %r' % c)
+        if not depth:
+            return pos
 
 
-def bdecode(text):
+def scan_dictionary(text):
+    """
+    Locate values of bencoded dictionary :text: without decoding them.
+
+    :return: Dict of key -> (start, end) offsets of bencoded value in text
+    :raises SyntaxError: If text is not valid bencoded dictionary
+    """
+    spans = {}
+    length = len(text)
     try:
-        src = tokenize(text)
-        data = decode_item(src.next, src.next()) # pylint:disable=E1101
-        for token in src: # look for more tokens
-            raise SyntaxError("trailing junk")
-    except (AttributeError, ValueError, StopIteration):
+        if text[:1] != 'd':
+            raise ValueError('not a dictionary')
+        pos = 1
+        while text[pos] != 'e':
+            colon = text.index(':', pos, length)
+            start = colon + 1 + int(text[pos:colon])
+            if start > length:
+                raise ValueError('string exceeds data')
+            key = text[colon + 1:start]
+            pos = _skip(text, start, length)
+            spans[key] = (start, pos)
+    except (IndexError, ValueError):
         raise SyntaxError("syntax error")
-    return data
+    if pos + 1 != length:
+        raise SyntaxError("trailing junk")
+    return spans
+
+
+def bdecode(text):
+    return decode(text)[0]
 
 
 # encoding implementation by d0b
-def encode_string(data):
-    return "%d:%s" % (len(data), data)
+# Encoders append bencoded data into a list of chunks, which is joined once in the end. Join sizes the result up front,
+# instead of copying the encoded data again for each enclosing container.
+def _encode_string(data, chunks):
+    chunks.extend(('%d:' % len(data), data))
 
 
-def encode_unicode(data):
-    return encode_string(str(data))
+def _encode_unicode(data, chunks):
+    _encode_string(str(data), chunks)
 
 
-def encode_integer(data):
-    return "i%de" % data
+def _encode_integer(data, chunks):
+    chunks.append('i%de' % data)
 
 
-def encode_list(data):
-    encoded = "l"
+def _encode_list(data, chunks):
+    chunks.append('l')
     for item in data:
-        encoded += bencode(item)
-    encoded += "e"
-    return encoded
+        _encoders[type(item)](item, chunks)
+    chunks.append('e')
+
+
+def _encode_dictionary(data, chunks):
+    chunks.append('d')
+    for key, value in sorted(data.iteritems()):
+        chunks.extend(('%d:' % len(key), key))
+        _encoders[type(value)](value, chunks)
+    chunks.append('e')
+
+
+_encoders = {
+    str: _encode_string,
+    unicode: _encode_unicode,
+    int: _encode_integer,
+    long: _encode_integer,
+    list: _encode_list,
+    dict: _encode_dictionary}
+
+
+def _encoder(encode_func):
+    def encode(data):
+        chunks = []
+        encode_func(data, chunks)
+        return ''.join(chunks)
+    return encode
 
 
-def encode_dictionary(data):
-    encoded = "d"
-    items = data.items()
-    items.sort()
-    for (key, value) in items:
-        encoded += encode_string(key)
-        encoded += bencode(value)
-    encoded += "e"
-    return encoded
+encode_string = _encoder(_encode_string)
+encode_unicode = _encoder(_encode_unicode)
+encode_integer = _encoder(_encode_integer)
+encode_list = _encoder(_encode_list)
+encode_dictionary = _encoder(_encode_dictionary)
 
 
 def bencode(data):
-    encode_func = {
-        str: encode_string,
-        unicode: encode_unicode,
-        int: encode_integer,
-        long: encode_integer,
-        list: encode_list,
-        dict: encode_dictionary}
-    return encode_func[type(data)](data)
+    chunks = []
+    _encoders[type(data)](data, chunks)
+    return ''.join(chunks)
 
 
 class Torrent(object):
-    """Represents a torrent"""
+    """
+    Represents a torrent. Top level keys are decoded when they are first accessed, values derived from content (file
+    list, size, info hash) are calculated once, and unmodified torrent encodes back to the original bytes.
+
+    Changes made to :attr:`content` directly must set :attr:`modified`. Changes made with the methods of this class
+    are tracked per key, keys they do not change (most importantly info) keep their original bytes when encoded.
+    """
     # string type used for keys, if this ever changes, stuff like "x in y"
     # gets broken unless you coerce to this type
     KEY_TYPE = str
@@ -199,30 +293,100 @@ class Torrent(object):
         """Accepts torrent file as string"""
         # Make sure there is no trailing whitespace. see #1592
         content = content.strip()
-        # decoded torrent structure
-        self.content = bdecode(content)
-        self.modified = False
+        # original bencoded content
+        self._raw = content
+        # key -> (start, end) of bencoded value in original content, for all top level keys
+        self._original = scan_dictionary(content)
+        # spans of top level keys not decoded yet
+        self._spans = dict(self._original)
+        # decoded top level keys
+        self._content = {}
+        # values derived from content, cleared when torrent is modified
+        self._cache = {}
+        self._modified = False
+        # decoded keys which have been changed, None when any decoded key may have been changed
+        self._changed = set()
+
+    def _get_modified(self):
+        return self._modified
+
+    def _set_modified(self, modified):
+        self._modified = modified
+        if modified:
+            self._cache.clear()
+            # not known what was changed
+            self._changed = None
+        else:
+            self._changed = set()
+
+    modified = property(_get_modified, _set_modified)
+
+    def _get_content(self):
+        """Decoded torrent structure"""
+        for key in self._spans.keys():
+            self._value(key)
+        return self._content
+
+    def _set_content(self, content):
+        self._original = {}
+        self._spans = {}
+        self._content = content
+        self.modified = True
+
+    content = property(_get_content, _set_content)
+
+    def _value(self, key, *default):
+        """Return decoded value of top level :key:, decoding it if needed."""
+        if key in self._spans:
+            start, end = self._spans.pop(key)
+            self._content[key] = decode(self._raw, start, end)[0]
+        if default:
+            return self._content.get(key, default[0])
+        return self._content[key]
+
+    def _key_modified(self, key):
+        """Mark torrent modified by a change of top level :key:"""
+        self._modified = True
+        self._cache.clear()
+        if self._changed is not None:
+            self._changed.add(key)
+
+    def _is_original(self, key):
+        """Return True if value of top level :key: is known to be the same as in original content."""
+        if key not in self._original:
+            return False
+        return key in self._spans or (self._changed is not None and key not in self._changed)
+
+    def _cached(self, name, func):
+        if name not in self._cache:
+            self._cache[name] = func()
+        return self._cache[name]
 
     def __repr__(self):
+        info = self._value('info')
         return "%s(%s, %s)" % (self.__class__.__name__,
-            ", ".join("%s=%r" % (key, self.content["info"].get(key))
+            ", ".join("%s=%r" % (key, info.get(key))
                for key in ("name", "length", "private",)),
-            ", ".join("%s=%r" % (key, self.content.get(key))
+            ", ".join("%s=%r" % (key, self._value(key, None))
                for key in ("announce", "comment",)))
 
     def get_filelist(self):
         """Return array containing fileinfo dictionaries (name, length, path)"""
+        return [dict(item) for item in self._cached('filelist', self._filelist)]
+
+    def _filelist(self):
+        info = self._value('info')
         files = []
-        if 'length' in self.content['info']:
+        if 'length' in info:
             # single file torrent
             t = {}
-            t['name'] = self.content['info']['name']
-            t['size'] = self.content['info']['length']
+            t['name'] = info['name']
+            t['size'] = info['length']
             t['path'] = ''
             files.append(t)
         else:
             # multifile torrent
-            for item in self.content['info']['files']:
+            for item in info['files']:
                 t = {}
                 t['path'] = '/'.join(item['path'][:-1])
                 t['name'] = item['path'][-1]
@@ -233,7 +397,7 @@ class Torrent(object):
         for item in files:
             for field in ('name', 'path'):
                 # The standard mandates UTF-8, but try other common things
-                for encoding in ('utf-8', self.content.get('encoding', None), 'cp1252'):
+                for encoding in ('utf-8', self._value('encoding', None), 'cp1252'):
                     if encoding:
                         try:
                             item[field] = item[field].decode(encoding)
@@ -244,26 +408,34 @@ class Torrent(object):
                     # Broken beyond anything reasonable
                     fallback = unicode(item[field], 'utf-8', 'replace').replace(u'\ufffd', '_')
                     log.warning("%s=%r field in torrent %r is wrongly encoded, falling back to '%s'" % (
-                        field, item[field], self.content['info']['name'], fallback))
+                        field, item[field], info['name'], fallback))
                     item[field] = fallback
 
         return files
 
     def get_size(self):
         """Return total size of the torrent"""
+        return self._cached('size', self._size)
+
+    def _size(self):
+        info = self._value('info')
         size = 0
         # single file torrent
-        if 'length' in self.content['info']:
-            size = int(self.content['info']['length'])
+        if 'length' in info:
+            size = int(info['length'])
         else:
             # multifile torrent
-            for item in self.content['info']['files']:
+            for item in info['files']:
                 size += int(item['length'])
         return size
 
     @property
     def private(self):
-        return self.content['info'].get('private', False)
+        return self._value('info').get('private', False)
+
+    def get_announce(self):
+        """Return announce url of the torrent, or None if there is none."""
+        return self._value('announce', None)
 
     def get_multitrackers(self):
         """
@@ -274,46 +446,73 @@ class Torrent(object):
         # the spec says, if announce-list present use ONLY that
         # funny iteration because of nesting, ie:
         # [ [ tracker1, tracker2 ], [backup1] ]
-        for tl in self.content.get('announce-list', []):
+        for tl in self._value('announce-list', []):
             for t in tl:
                 trackers.append(t)
         return trackers
 
     def get_info_hash(self):
-        """Return Torrent info hash"""
+        """
+        Return Torrent info hash. It is calculated from the original info dictionary bytes unless info may have been
+        changed.
+        """
+        return self._cached('info_hash', self._info_hash)
+
+    def _info_hash(self):
         import hashlib
         hash = hashlib.sha1()
-        info_data = encode_dictionary(self.content['info'])
+        if self._is_original('info'):
+            start, end = self._original['info']
+            info_data = buffer(self._raw, start, end - start)
+        else:
+            info_data = bencode(self._value('info'))
         hash.update(info_data)
         return hash.hexdigest().upper()
 
     def get_comment(self):
-        return self.content['comment']
+        return self._value('comment')
 
     def set_comment(self, comment):
-        self.content['comment'] = comment
-        self.modified = True
+        self._spans.pop('comment', None)
+        self._content['comment'] = comment
+        self._key_modified('comment')
 
     def remove_multitracker(self, tracker):
         """Removes passed multi-tracker from this torrent"""
-        for tl in self.content.get('announce-list', [])[:]:
+        announce_list = self._value('announce-list', [])
+        for tl in announce_list[:]:
             try:
                 tl.remove(tracker)
-                self.modified = True
+                self._key_modified('announce-list')
                 # if no trackers left in list, remove whole list
                 if not tl:
-                    self.content['announce-list'].remove(tl)
+                    announce_list.remove(tl)
             except:
                 pass
 
     def add_multitracker(self, tracker):
         """Appends multi-tracker to this torrent"""
-        self.content.setdefault('announce-list', [])
-        self.content['announce-list'].append([tracker])
-        self.modified = True
+        self._value('announce-list', None)
+        self._content.setdefault('announce-list', [])
+        self._content['announce-list'].append([tracker])
+        self._key_modified('announce-list')
 
     def __str__(self):
         return '<Torrent instance. Files: %s>' % self.get_filelist()
 
     def encode(self):
-        return bencode(self.content)
+        """Return bencoded torrent, original bytes unless torrent has been modified."""
+        if not self.modified:
+            return self._raw
+        # copy original bytes of keys which have not been changed
+        chunks = ['d']
+        for key in sorted(set(self._spans) | set(self._content)):
+            chunks.extend(('%d:' % len(key), key))
+            if self._is_original(key):
+                start, end = self._original[key]
+                chunks.append(self._raw[start:end])
+            else:
+                value = self._content[key]
+                _encoders[type(value)](value, chunks)
+        chunks.append('e')
+        return ''.join(chunks)
@@ -0,0 +1,66 @@
+"""Probabilistic set membership"""
+
+import math
+import struct
+import hashlib
+
+
+class BloomFilter(object):
+    """
+    Space efficient set which may answer false positives, but never false negatives.
+    Values cannot be removed once added.
+
+    :param int capacity: Number of values filter is sized for, error rate grows when exceeded
+    :param float error_rate: Probability of false positive when filter holds *capacity* values
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # optimal number of bits and hash functions for given capacity and error rate
+        self.size = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, int(round(float(self.size) / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    @classmethod
+    def restore(cls, capacity, error_rate, bits, count):
+        """
+        Create filter from saved :attr:`bits` and :attr:`count` of a filter with same capacity and error rate.
+
+        :raises ValueError: If bits do not fit given capacity and error rate
+        """
+        bloom = cls(capacity, error_rate)
+        if len(bits) != len(bloom.bits):
+            raise ValueError('Size of bits does not match capacity and error rate')
+        bloom.bits = bytearray(bits)
+        bloom.count = count
+        return bloom
+
+    def _positions(self, value):
+        if isinstance(value, unicode):
+            value = value.encode('utf-8')
+        # derive all hash functions from two halves of one digest (double hashing)
+        h1, h2 = struct.unpack('<QQ', hashlib.md5(value).digest())
+        return [(h1 + i * h2) % self.size for i in xrange(self.hashes)]
+
+    def add(self, value):
+        """Add *value* into the filter."""
+        for pos in self._positions(value):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        bits = self.bits
+        for pos in self._positions(value):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def full(self):
+        """True when filter holds more values than it was sized for."""
+        return self.count > self.capacity
@@ -1,18 +1,33 @@
 import copy
 import logging
 import hashlib
-from datetime import datetime, timedelta
+from datetime import datetime, date, time, timedelta
 from sqlalchemy import Column, Integer, String, DateTime, PickleType, Unicode, ForeignKey
 from sqlalchemy.orm import relation
 from flexget import schema
-from flexget.utils.database import safe_pickle_synonym
+from flexget.utils.database import safe_pickle_synonym, delete_chunked
+from flexget.utils.sqlalchemy_utils import table_columns, drop_tables
 from flexget.utils.tools import parse_timedelta
-from flexget.entry import Entry
+from flexget.entry import Entry, LazyField
 from flexget.event import event
 from flexget.plugin import PluginError
 
 log = logging.getLogger('input_cache')
-Base = schema.versioned_base('input_cache', 0)
+Base = schema.versioned_base('input_cache', 1)
+
+
+@schema.upgrade('input_cache')
+def upgrade(ver, session):
+    if ver is None:
+        ver = 0
+    if ver == 0:
+        if not 'task' in table_columns('input_cache_http', session):
+            # validators were cached per url, they are only valid for the task which fetched them
+            log.info('Dropping old version of input_cache_http table from db')
+            drop_tables(['input_cache_http'], session)
+            Base.metadata.create_all(bind=session.bind)
+        ver = 1
+    return ver
 
 
 class InputCache(Base):
@@ -38,12 +53,93 @@ class InputCacheEntry(Base):
     cache_id = Column(Integer, ForeignKey('input_cache.id'), nullable=False)
 
 
+class InputHTTPCache(Base):
+    """
+    HTTP validators of last successful fetch of an url by a task, and optionally the entries produced from that
+    response.
+    """
+
+    __tablename__ = 'input_cache_http'
+
+    id = Column(Integer, primary_key=True)
+    task = Column(Unicode)
+    url = Column(Unicode, index=True)
+    etag = Column(Unicode)
+    modified = Column(Unicode)
+    _entries = Column('entries', PickleType)
+    entries = safe_pickle_synonym('_entries')
+    updated = Column(DateTime, default=datetime.now)
+
+    def __repr__(self):
+        return '<InputHTTPCache(task=%s,url=%s,etag=%s,modified=%s)>' % (self.task, self.url, self.etag,
+                                                                          self.modified)
+
+    @property
+    def headers(self):
+        """Conditional request headers for validators of the last fetch."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.modified:
+            headers['If-Modified-Since'] = self.modified
+        return headers
+
+    def get_entries(self):
+        """:return: New :class:`Entry` instances of cached entries"""
+        self.updated = datetime.now()
+        return [Entry(e) for e in self.entries or []]
+
+    def store(self, response, entries=None):
+        """
+        Remember validators from `response`, and `entries` produced from it if given.
+
+        Entries should only be given when the input produces all entries of the response, they are returned as is
+        when the response is not modified on next fetch.
+
+        :param response: Requests response with status 200
+        :param list entries: Entries produced from response
+        """
+        self.etag = response.headers.get('etag')
+        self.modified = response.headers.get('last-modified')
+        if entries is not None and (self.etag or self.modified):
+            self.entries = entries
+        else:
+            # server doesn't support conditional requests, no point in keeping entries around
+            self._entries = None
+        self.updated = datetime.now()
+
+
+def http_cache(session, task, url):
+    """
+    :param session: Database session
+    :param task: Name of the task fetching the url
+    :param url: Fetched url
+    :return: :class:`InputHTTPCache` for `url` fetched by `task`, new instance is added into session if there
+        wasn't one
+    """
+    task = unicode(task)
+    url = unicode(url)
+    cache = session.query(InputHTTPCache).filter(InputHTTPCache.task == task).\
+                                          filter(InputHTTPCache.url == url).first()
+    if not cache:
+        cache = InputHTTPCache(task=task, url=url)
+        session.add(cache)
+    return cache
+
+
 @event('manager.db_cleanup')
 def db_cleanup(session):
     """Removes old input caches from plugins that are no longer configured."""
-    result = session.query(InputCache).filter(InputCache.added < datetime.now() - timedelta(days=7)).delete()
+    result, finished = delete_chunked(session, InputCache, InputCache.added < datetime.now() - timedelta(days=7))
     if result:
         log.verbose('Removed %s old input caches.' % result)
+    if not finished:
+        return False
+    result, finished = delete_chunked(session, InputHTTPCache,
+                                      InputHTTPCache.updated < datetime.now() - timedelta(days=7))
+    if result:
+        log.verbose('Removed %s old http caches.' % result)
+    return finished
 
 
 def config_hash(config):
@@ -58,6 +154,55 @@ def config_hash(config):
         return hashlib.md5(str(config)).hexdigest()
 
 
+# Field values of these types are shared between entries restored from the cache
+IMMUTABLE_TYPES = (basestring, int, long, float, bool, type(None), datetime, date, time, timedelta)
+
+
+def is_immutable(value):
+    if isinstance(value, (tuple, frozenset)):
+        return all(is_immutable(item) for item in value)
+    return isinstance(value, IMMUTABLE_TYPES)
+
+
+class FrozenEntry(object):
+    """
+    Read-only record of an :class:`Entry` held in the memory cache.
+
+    Immutable field values are shared by all entries thawed from the record, so restoring an entry costs a dict
+    update instead of a recursive deepcopy. Only mutable values (lists, dicts ...) are copied.
+
+    :raises TypeError: If entry contains values which cannot be copied
+    """
+
+    __slots__ = ['immutable', 'mutable', 'lazy']
+
+    def __init__(self, entry):
+        self.immutable = {}
+        self.mutable = {}
+        self.lazy = {}
+        # iterate raw values, lazy fields must not be evaluated
+        for field, value in dict.iteritems(entry):
+            if isinstance(value, LazyField):
+                self.lazy[field] = list(value.funcs)
+            elif is_immutable(value):
+                self.immutable[field] = value
+            else:
+                self.mutable[field] = copy.deepcopy(value)
+
+    def thaw(self):
+        """:return: New :class:`Entry` with the frozen fields"""
+        entry = Entry()
+        # values were already validated by Entry when they were frozen, no need to go through __setitem__
+        dict.update(entry, self.immutable)
+        for field, value in self.mutable.iteritems():
+            dict.__setitem__(entry, field, copy.deepcopy(value))
+        for field, funcs in self.lazy.iteritems():
+            lazy = LazyField(entry, field, funcs[0])
+            lazy.funcs = list(funcs)
+            dict.__setitem__(entry, field, lazy)
+        return entry
+
+
 class cached(object):
     """
     Implements transparent caching decorator @cached for inputs.
@@ -107,10 +252,7 @@ class cached(object):
             if cache_name in self.cache:
                 # return from the cache
                 log.trace('cache hit')
-                entries = []
-                for entry in self.cache[cache_name]:
-                    fresh = copy.deepcopy(entry)
-                    entries.append(fresh)
+                entries = [frozen.thaw() for frozen in self.cache[cache_name]]
                 if entries:
                     log.verbose('Restored %s entries from cache' % len(entries))
                 return entries
@@ -125,7 +267,7 @@ class cached(object):
                         entries = [Entry(e.entry) for e in db_cache.entries]
                         log.verbose('Restored %s entries from db cache' % len(entries))
                         # Store to in memory cache
-                        self.cache[cache_name] = copy.deepcopy(entries)
+                        self.cache[cache_name] = [FrozenEntry(e) for e in entries]
                         return entries
 
                 # Nothing was restored from db or memory cache, run the function
@@ -144,7 +286,7 @@ class cached(object):
                             entries = [Entry(e.entry) for e in db_cache.entries]
                             log.verbose('Restored %s entries from db cache' % len(entries))
                             # Store to in memory cache
-                            self.cache[cache_name] = copy.deepcopy(entries)
+                            self.cache[cache_name] = [FrozenEntry(e) for e in entries]
                             return entries
                     # If there was nothing in the db cache, re-raise the error.
                     raise
@@ -156,7 +298,7 @@ class cached(object):
                 # store results to cache
                 log.debug('storing to cache %s %s entries' % (cache_name, len(response)))
                 try:
-                    self.cache[cache_name] = copy.deepcopy(response)
+                    self.cache[cache_name] = [FrozenEntry(e) for e in response]
                 except TypeError:
                     # might be caused because of backlog restoring some idiotic stuff, so not neccessarily a bug
                     log.critical('Unable to save task content into cache, if problem persists longer than a day please report this as a bug')
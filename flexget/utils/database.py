@@ -1,3 +1,4 @@
+import time
 from datetime import datetime
 from sqlalchemy import extract, func, case
 from sqlalchemy.orm import synonym
@@ -29,6 +30,43 @@ def with_session(func):
     return wrapper
 
 
+# time.time() when running database cleanup must stop, None when cleanup is not limited
+cleanup_deadline = None
+# Number of rows deleted per transaction by :func:`delete_chunked`
+CLEANUP_CHUNK_SIZE = 1000
+
+
+def cleanup_time_left():
+    """
+    :return: False if database cleanup has used its time budget, and handlers should stop and continue on
+      next cleanup run
+    """
+    return cleanup_deadline is None or time.time() < cleanup_deadline
+
+
+def delete_chunked(session, model, *criterion):
+    """
+    Deletes rows of `model` matching `criterion` in chunks, committing after each one, until all are deleted
+    or cleanup time budget is used. Meant for `manager.db_cleanup` handlers, what is left is deleted on next run.
+
+    :param session: Session to delete with
+    :param model: Declarative model class
+    :param criterion: Filter criteria for rows to delete
+    :return: Tuple of (number of rows deleted, True if all rows were deleted)
+    """
+    pk = model.__mapper__.primary_key[0]
+    deleted = 0
+    while True:
+        ids = [row[0] for row in session.query(pk).filter(*criterion).limit(CLEANUP_CHUNK_SIZE)]
+        if ids:
+            deleted += session.query(model).filter(pk.in_(ids)).delete(synchronize_session=False)
+            session.commit()
+        if len(ids) < CLEANUP_CHUNK_SIZE:
+            return deleted, True
+        if not cleanup_time_left():
+            return deleted, False
+
+
 def pipe_list_synonym(name):
     """Converts pipe separated text into a list"""
 
@@ -2,10 +2,12 @@
 
 import logging
 import hashlib
+import threading
 from datetime import datetime, timedelta
 from sqlalchemy import Column, Integer, String, DateTime, Index
 from flexget import schema
 from flexget.utils.sqlalchemy_utils import table_schema
+from flexget.utils.database import delete_chunked
 from flexget.manager import Session
 from flexget.event import event
 
@@ -39,14 +41,66 @@ class LogMessage(Base):
         return "<LogMessage('%s')>" % self.md5sum
 
 
+# md5sums of messages already logged, loaded from database on first use
+_logged = None
+# md5sums logged during this execution, not yet stored in database
+_pending = set()
+_lock = threading.Lock()
+
+
+@event('manager.startup')
+def reset(manager=None):
+    """Forgets loaded and pending md5sums, they are reloaded from database on next use."""
+    global _logged
+    _lock.acquire()
+    try:
+        _logged = None
+        _pending.clear()
+    finally:
+        _lock.release()
+
+
+@event('manager.execute.completed')
+@event('manager.shutdown')
+def flush(manager=None):
+    """Stores md5sums of messages logged since last flush in one batch."""
+    _lock.acquire()
+    try:
+        if not _pending:
+            return
+        md5sums = list(_pending)
+        _pending.clear()
+    finally:
+        _lock.release()
+
+    session = Session()
+    try:
+        # another process may have logged some of these meanwhile
+        existing = set()
+        for i in xrange(0, len(md5sums), 500):
+            query = session.query(LogMessage.md5sum).filter(LogMessage.md5sum.in_(md5sums[i:i + 500]))
+            existing.update(row.md5sum for row in query)
+        now = datetime.now()
+        rows = [{'md5sum': md5sum, 'added': now} for md5sum in md5sums if md5sum not in existing]
+        if rows:
+            session.execute(LogMessage.__table__.insert(), rows)
+        session.commit()
+    finally:
+        session.close()
+
+
 @event('manager.db_cleanup')
 def purge(session):
     """Purge old messages from database"""
+    global _logged
     old = datetime.now() - timedelta(days=365)
 
-    result = session.query(LogMessage).filter(LogMessage.added < old).delete()
+    result, finished = delete_chunked(session, LogMessage, LogMessage.added < old)
     if result:
         log.verbose('Purged %s entries from log_once table.' % result)
+        # purged messages may be logged again
+        _logged = None
+    return finished
 
 
 def log_once(message, logger=logging.getLogger('log_once')):
@@ -54,23 +108,33 @@ def log_once(message, logger=logging.getLogger('log_once')):
     Log message only once using given logger. Returns False if suppressed logging.
     When suppressed verbose level is still logged.
     """
+    global _logged
 
     digest = hashlib.md5()
     digest.update(message.encode('latin1', 'replace')) # ticket:250
     md5sum = digest.hexdigest()
 
-    session = Session()
+    _lock.acquire()
     try:
+        if _logged is None:
+            session = Session()
+            try:
+                _logged = set(row.md5sum for row in session.query(LogMessage.md5sum))
+            finally:
+                session.close()
+            _logged.update(_pending)
         # abort if this has already been logged
-        if session.query(LogMessage).filter_by(md5sum=md5sum).first():
-            logger.verbose(message)
-            return False
-
-        row = LogMessage(md5sum)
-        session.add(row)
-        session.commit()
+        if md5sum in _logged:
+            suppress = True
+        else:
+            suppress = False
+            _logged.add(md5sum)
+            _pending.add(md5sum)
     finally:
-        session.close()
+        _lock.release()
 
+    if suppress:
+        logger.verbose(message)
+        return False
     logger.info(message)
     return True
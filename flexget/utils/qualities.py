@@ -1,6 +1,7 @@
 import re
 import copy
 import logging
+from flexget.utils.tools import LRUCache
 
 log = logging.getLogger('utils.qualities')
 
@@ -28,6 +29,7 @@ class QualityComponent(object):
         # compile regexp
         if regexp is None:
             regexp = re.escape(name)
+        self.pattern = regexp
         self.regexp = re.compile('(?<![^\W_])(' + regexp + ')(?![^\W_])', re.IGNORECASE)
 
     def matches(self, text):
@@ -181,6 +183,19 @@ for type in (_resolutions, _sources, _codecs, _audios):
         _registry[item.name] = item
 
 
+def _combined_regexp(qlist):
+    """Single regexp matching text if any of the components in `qlist` match it."""
+    return re.compile('(?<![^\W_])(?:' + '|'.join('(?:%s)' % item.pattern for item in qlist) + ')(?![^\W_])',
+                      re.IGNORECASE)
+
+# Each category is first scanned with one regexp, components are tried one by one only if it matches
+_categories = [(category, qlist, _combined_regexp(qlist)) for category, qlist in
+               [('resolution', _resolutions), ('source', _sources), ('codec', _codecs), ('audio', _audios)]]
+
+# Parse results by text, same titles get parsed repeatedly by different plugins
+_parse_cache = LRUCache(10000)
+
+
 def all_components():
     return _registry.itervalues()
 
@@ -208,17 +223,25 @@ class Quality(object):
         :param text: The string to parse
         """
         self.text = text
+        # clean_text must be of same type as text, str and unicode keys could be equal
+        key = (text.__class__, text)
+        cached = _parse_cache.get(key)
+        if cached:
+            self.resolution, self.source, self.codec, self.audio, self.clean_text = cached
+            return
         self.clean_text = text
-        self.resolution = self._find_best(_resolutions, _UNKNOWNS['resolution'])
-        self.source = self._find_best(_sources, _UNKNOWNS['source'])
-        self.codec = self._find_best(_codecs, _UNKNOWNS['codec'])
-        self.audio = self._find_best(_audios, _UNKNOWNS['audio'])
+        for category, qlist, combined in _categories:
+            if combined.search(self.clean_text):
+                setattr(self, category, self._find_best(qlist, _UNKNOWNS[category]))
+            else:
+                setattr(self, category, _UNKNOWNS[category])
         # If any of the matched components have defaults, set them now.
         for component in self.components:
             for default in component.defaults:
                 default = _registry[default]
                 if not getattr(self, default.type):
                     setattr(self, default.type, default)
+        _parse_cache.set(key, (self.resolution, self.source, self.codec, self.audio, self.clean_text))
 
     def _find_best(self, qlist, default=None):
         """Finds the highest matching quality component from `qlist`"""
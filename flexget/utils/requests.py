@@ -2,9 +2,12 @@ from __future__ import absolute_import
 import urllib2
 import time
 import logging
+import threading
+from Queue import Queue, Empty
 from datetime import timedelta, datetime
 from urlparse import urlparse
 import requests
+from requests.packages.urllib3.poolmanager import PoolManager
 # Allow some request objects to be imported from here instead of requests
 from requests import RequestException
 from flexget.utils.tools import parse_timedelta
@@ -19,6 +22,23 @@ unresponsive_hosts = {}
 # Time to wait before trying an unresponsive site again
 WAIT_TIME = timedelta(seconds=60)
 
+# Number of hosts to keep connection pools for, and number of keep-alive connections kept per host
+POOL_CONNECTIONS = 20
+POOL_MAXSIZE = 4
+# Default number of worker threads used by map_concurrently
+MAX_CONCURRENT_REQUESTS = 8
+# Maximum number of requests in progress to one host at the same time, over all sessions
+MAX_REQUESTS_PER_HOST = POOL_MAXSIZE
+# Seconds to wait for a response when no timeout was given, requests must not hold a host slot forever
+DEFAULT_TIMEOUT = 15
+
+# Connection pools are shared by all sessions, so keep-alive connections are reused between tasks and runs
+poolmanager = PoolManager(num_pools=POOL_CONNECTIONS, maxsize=POOL_MAXSIZE)
+# host -> semaphore limiting requests in progress to the host
+host_slots = {}
+# Guards domain delay bookkeeping and host slots, sessions may be used from several threads
+_lock = threading.Lock()
+
 
 def is_unresponsive(url):
     """
@@ -29,9 +49,8 @@ def is_unresponsive(url):
     :rtype: bool
     """
     host = urlparse(url).hostname
-    if host in unresponsive_hosts and unresponsive_hosts[host] + WAIT_TIME < datetime.now():
-        return True
-    return False
+    timed_out = unresponsive_hosts.get(host)
+    return bool(timed_out and timed_out + WAIT_TIME > datetime.now())
 
 
 def set_unresponsive(url):
@@ -44,13 +63,95 @@ def set_unresponsive(url):
     unresponsive_hosts[host] = datetime.now()
 
 
+def get_host_slot(url):
+    """
+    :param url: Url to be requested
+    :return: Semaphore which must be held while request to host of `url` is in progress
+    """
+    host = urlparse(url).hostname
+    _lock.acquire()
+    try:
+        slot = host_slots.get(host)
+        if slot is None:
+            slot = host_slots[host] = threading.BoundedSemaphore(MAX_REQUESTS_PER_HOST)
+        return slot
+    finally:
+        _lock.release()
+
+
+def map_concurrently(func, items, workers=MAX_CONCURRENT_REQUESTS):
+    """
+    Calls `func` for each of `items` using a pool of worker threads. Meant for firing many requests at once,
+    the number of requests in progress is limited by `workers` and to :data:`MAX_REQUESTS_PER_HOST` per host.
+
+    `func` must not use database session of the caller, sessions cannot be shared between threads.
+
+    :param func: Function taking one item as argument
+    :param items: Iterable of items
+    :param int workers: Maximum number of worker threads
+    :return: List of results in the same order as `items`. If call raised an exception, the exception
+      instance is in place of the result.
+    """
+    from flexget import logger
+    from flexget.manager import manager
+
+    items = list(items)
+    results = [None] * len(items)
+    # in-memory database is not visible to worker threads, run in calling thread
+    if manager and manager.in_memory_database:
+        workers = 1
+    workers = min(workers, len(items))
+    if workers <= 1:
+        for index, item in enumerate(items):
+            try:
+                results[index] = func(item)
+            except Exception, e:
+                results[index] = e
+        return results
+
+    # logging context is thread local, pass it to worker threads
+    task = getattr(logger.FlexGetLogger.local, 'task', u'')
+    execution = getattr(logger.FlexGetLogger.local, 'execution', '')
+    queue = Queue()
+    for index_item in enumerate(items):
+        queue.put(index_item)
+
+    def worker():
+        logger.set_task(task)
+        logger.set_execution(execution)
+        while True:
+            try:
+                index, item = queue.get_nowait()
+            except Empty:
+                return
+            try:
+                results[index] = func(item)
+            except Exception, e:
+                results[index] = e
+
+    threads = []
+    for i in xrange(workers):
+        thread = threading.Thread(target=worker, name='request-worker-%s' % i)
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        # join with timeout, otherwise main thread would not receive KeyboardInterrupt
+        while thread.is_alive():
+            thread.join(0.1)
+    return results
+
+
 class Session(requests.Session):
     """Subclass of requests Session class which defines some of our own defaults, records unresponsive sites,
-    and raises errors by default."""
+    and raises errors by default.
+
+    All sessions share process wide connection pools and limits for concurrent requests per host, sessions are
+    cheap to create and can be used from several threads at once."""
 
     def __init__(self, **kwargs):
         """Set some defaults for our session if not explicitly defined."""
-        kwargs.setdefault('timeout', 15)
+        kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
         kwargs.setdefault('config', {}).setdefault('max_retries', 1)
         kwargs.setdefault('prefetch', False)
         # TODO: This is a temporary fix for requests not properly handling deflate encoding, can be removed when
@@ -61,6 +162,13 @@ class Session(requests.Session):
         # Stores min intervals between requests for certain sites
         self.domain_delay = {}
 
+    def init_poolmanager(self):
+        self.poolmanager = poolmanager
+
+    def close(self):
+        """Connection pools are shared with other sessions, they are left open."""
+        pass
+
     def add_cookiejar(self, cookiejar):
         """
         Merges cookies from `cookiejar` into cookiejar for this session.
@@ -106,31 +214,54 @@ class Session(requests.Session):
         # Check if we need to add a delay before request to this site
         for domain, domain_dict in self.domain_delay.iteritems():
             if domain in url:
-                next_req = domain_dict.get('next_req')
-                if next_req and datetime.now() < next_req:
-                    wait_time = next_req - datetime.now()
+                # Reserve time slot for this request, so concurrent requests to domain are spaced by delay
+                _lock.acquire()
+                try:
+                    now = datetime.now()
+                    next_req = max(domain_dict.get('next_req') or now, now)
+                    domain_dict['next_req'] = next_req + domain_dict['delay']
+                finally:
+                    _lock.release()
+                if next_req > now:
+                    wait_time = next_req - now
                     seconds = wait_time.seconds + (wait_time.microseconds / 1000000.0)
                     log.debug('Waiting %.2f seconds until next request to %s' % (seconds, domain))
                     # Sleep until it is time for the next request
                     time.sleep(seconds)
-                # Record the next allowable request time for this domain
-                domain_dict['next_req'] = datetime.now() + domain_dict['delay']
                 break
 
         # Pop our custom keyword argument before calling super method
         config = kwargs.pop('config', {})
         config['danger_mode'] = kwargs.pop('raise_status', True)
         kwargs['config'] = config
+        # Other requests to the host wait for this one, do not let it wait for response forever
+        if kwargs.get('timeout') is None and self.timeout is None:
+            kwargs['timeout'] = DEFAULT_TIMEOUT
 
+        slot = get_host_slot(url)
+        slot.acquire()
         try:
             result = requests.Session.request(self, method, url, *args, **kwargs)
         except requests.Timeout:
             # Mark this site in known unresponsive list
             set_unresponsive(url)
             raise
+        finally:
+            slot.release()
 
         return result
 
+    def get_many(self, urls, **kwargs):
+        """
+        Sends GET requests to all `urls` concurrently, honoring domain delays and unresponsive sites.
+
+        :param urls: List of urls
+        :param kwargs: Optional arguments that ``request`` takes.
+        :return: List of :class:`Response` objects, or exception instances for failed requests, in order of `urls`
+        """
+        kwargs.setdefault('allow_redirects', True)
+        return map_concurrently(lambda url: self.request('get', url, **kwargs), urls)
+
 
 # Define some module level functions that use our Session, so this module can be used like main requests module
 def request(method, url, **kwargs):
@@ -8,11 +8,14 @@ can replace underlying mechanism in single point (and provide transparent switch
 """
 
 import logging
+import threading
+import weakref
 from datetime import datetime
 import pickle
 from sqlalchemy import Column, Integer, String, DateTime, PickleType, select, Index
 from UserDict import DictMixin
 from flexget import schema
+from flexget.event import event
 from flexget.manager import Session
 from flexget.utils.database import safe_pickle_synonym
 from flexget.utils.sqlalchemy_utils import table_schema, create_index
@@ -20,6 +23,10 @@ from flexget.utils.sqlalchemy_utils import table_schema, create_index
 log = logging.getLogger('util.simple_persistence')
 Base = schema.versioned_base('simple_persistence', 2)
 
+# Instances without bound session, eg. manager.persist and ones created at plugin module level. They live as long
+# as the process, so values they have loaded are forgotten after each execution.
+_unbound = weakref.WeakSet()
+
 
 @schema.upgrade('simple_persistence')
 def upgrade(ver, session):
@@ -69,63 +76,131 @@ Index('ix_simple_persistence_feed_plugin_key', SimpleKeyValue.task, SimpleKeyVal
 
 
 class SimplePersistence(DictMixin):
+    """
+    Dictionary like storage for a plugin. All keys of a plugin are loaded with one query on first access and
+    served from memory after that.
+
+    Without bound session changes are written to database immediately. When bound to a session changes are kept
+    in memory until :meth:`flush` adds them to the session, owner of the session must call it before committing.
+    """
 
     def __init__(self, plugin, session=None):
         self.taskname = None
         self.plugin = plugin
         self.session = session
+        self._lock = threading.RLock()
+        self.reset()
+        if session is None:
+            _unbound.add(self)
+
+    def reset(self):
+        """Forgets loaded values and any changes not flushed yet."""
+        # plugin -> {key: value}
+        self._stores = {}
+        # (plugin, key) pairs set or deleted since last flush
+        self._dirty = set()
+
+    def _store(self):
+        plugin = self.plugin
+        store = self._stores.get(plugin)
+        if store is None:
+            self._lock.acquire()
+            try:
+                store = self._stores.get(plugin)
+                if store is None:
+                    session = self.session or Session()
+                    try:
+                        query = session.query(SimpleKeyValue).filter(SimpleKeyValue.task == self.taskname).\
+                            filter(SimpleKeyValue.plugin == plugin)
+                        store = dict((skv.key, skv.value) for skv in query)
+                    finally:
+                        if not self.session:
+                            session.close()
+                    log.debug('loaded %s keys for %s' % (len(store), plugin))
+                    self._stores[plugin] = store
+            finally:
+                self._lock.release()
+        return store
+
+    def _changed(self, key):
+        self._dirty.add((self.plugin, key))
+        if not self.session:
+            self.flush()
+
+    def flush(self):
+        """Writes changed keys into database in one batch."""
+        self._lock.acquire()
+        try:
+            if not self._dirty:
+                return
+            session = self.session or Session()
+            try:
+                by_plugin = {}
+                for plugin, key in self._dirty:
+                    by_plugin.setdefault(plugin, set()).add(key)
+                for plugin, keys in by_plugin.iteritems():
+                    store = self._stores.get(plugin, {})
+                    query = session.query(SimpleKeyValue).filter(SimpleKeyValue.task == self.taskname).\
+                        filter(SimpleKeyValue.plugin == plugin).filter(SimpleKeyValue.key.in_(keys))
+                    for skv in query.all():
+                        if skv.key in store:
+                            # update existing
+                            log.debug('updating key %s value %s' % (skv.key, repr(store[skv.key])))
+                            skv.value = store[skv.key]
+                        else:
+                            log.debug('deleting key %s' % skv.key)
+                            session.delete(skv)
+                        keys.discard(skv.key)
+                    for key in keys:
+                        if key in store:
+                            # add new key
+                            log.debug('adding key %s value %s' % (key, repr(store[key])))
+                            session.add(SimpleKeyValue(self.taskname, plugin, key, store[key]))
+                if not self.session:
+                    # If we created a temporary session for this call, make sure we commit
+                    session.commit()
+            finally:
+                if not self.session:
+                    session.close()
+            self._dirty.clear()
+        finally:
+            self._lock.release()
 
     def __setitem__(self, key, value):
-        session = self.session or Session()
-        skv = session.query(SimpleKeyValue).filter(SimpleKeyValue.task == self.taskname).\
-                filter(SimpleKeyValue.plugin == self.plugin).filter(SimpleKeyValue.key == key).first()
-        if skv:
-            # update existing
-            log.debug('updating key %s value %s' % (key, repr(value)))
-            skv.value = value
-        else:
-            # add new key
-            skv = SimpleKeyValue(self.taskname, self.plugin, key, value)
-            log.debug('adding key %s value %s' % (key, repr(value)))
-            session.add(skv)
-        if not self.session:
-            # If we created a temporary session for this call, make sure we commit
-            session.commit()
-            session.close()
+        self._lock.acquire()
+        try:
+            self._store()[key] = value
+            self._changed(key)
+        finally:
+            self._lock.release()
 
     def __getitem__(self, key):
-        session = self.session or Session()
-        skv = session.query(SimpleKeyValue).filter(SimpleKeyValue.task == self.taskname).\
-            filter(SimpleKeyValue.plugin == self.plugin).filter(SimpleKeyValue.key == key).first()
-        if not self.session:
-            session.close()
-        if not skv:
+        try:
+            return self._store()[key]
+        except KeyError:
             raise KeyError('%s is not contained in the simple_persistence table.' % key)
-        else:
-            return skv.value
 
     def __delitem__(self, key):
-        session = self.session or Session()
-        session.query(SimpleKeyValue).filter(SimpleKeyValue.task == self.taskname).\
-            filter(SimpleKeyValue.plugin == self.plugin).filter(SimpleKeyValue.key == key).delete()
-        if not self.session:
-            session.commit()
-            session.close()
+        self._lock.acquire()
+        try:
+            self._store().pop(key, None)
+            self._changed(key)
+        finally:
+            self._lock.release()
+
+    def __contains__(self, key):
+        return key in self._store()
 
     def keys(self):
-        session = self.session or Session()
-        query = session.query(SimpleKeyValue.key).filter(SimpleKeyValue.task == self.taskname).\
-             filter(SimpleKeyValue.plugin == self.plugin).all()
-        if query:
-            return [item.key for item in query]
-        else:
-            return []
+        return self._store().keys()
 
 
 class SimpleTaskPersistence(SimplePersistence):
 
     def __init__(self, task):
         self.task = task
+        self._lock = threading.RLock()
+        self.reset()
 
     @property
     def plugin(self):
@@ -138,3 +213,15 @@ class SimpleTaskPersistence(SimplePersistence):
     @property
     def session(self):
         return self.task.session
+
+
+@event('manager.execute.completed')
+def reset_unbound(manager):
+    """Forget values loaded by long living instances, so that next execution sees changes made by others."""
+    for persistence in list(_unbound):
+        persistence._lock.acquire()
+        try:
+            persistence.flush()
+            persistence.reset()
+        finally:
+            persistence._lock.release()
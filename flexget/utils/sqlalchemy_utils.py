@@ -2,7 +2,7 @@
 Miscellaneous SQLAlchemy helpers.
 """
 import logging
-from sqlalchemy import ColumnDefault, Sequence, Index
+from sqlalchemy import ColumnDefault, Sequence, Index, select
 from sqlalchemy.types import AbstractType
 from sqlalchemy.schema import Table, MetaData
 from sqlalchemy.exc import NoSuchTableError, OperationalError
@@ -124,3 +124,44 @@ def create_index(table_name, session, *column_names):
         Index(index_name, *columns).create(bind=session.bind)
     except OperationalError:
         log.debug('Error creating index.', exc_info=True)
+
+
+def bulk_insert(session, table, rows):
+    """
+    Inserts rows with a single executemany statement, bypassing the ORM unit of work.
+
+    .. note:: Relies on SQLite allowing only one writer at a time, so that the rows with highest
+              primary keys after the insert are the ones just inserted.
+
+    :param Session session: SQLAlchemy Session, insert is done within its transaction
+    :param table: Table schema to insert into
+    :param list rows: List of dicts mapping column names to values, all must contain the same keys
+    :return: List of primary keys of the inserted rows in same order as *rows*
+    """
+    if not rows:
+        return []
+    session.execute(table.insert(), rows)
+    pk = list(table.primary_key.columns)[0]
+    ids = [row[0] for row in session.execute(select([pk]).order_by(pk.desc()).limit(len(rows)))]
+    ids.reverse()
+    return ids
+
+
+def set_sqlite_pragmas(engine, pragmas):
+    """
+    Executes PRAGMA statements on every new connection of `engine`.
+
+    :param engine: SQLAlchemy engine using SQLite
+    :param list pragmas: List of (name, value) tuples
+    """
+    from sqlalchemy import event
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute('PRAGMA %s=%s' % (name, value))
+        finally:
+            cursor.close()
+
+    event.listen(engine, 'connect', on_connect)
@@ -0,0 +1,84 @@
+"""
+Records where time goes while FlexGet starts up, reported with --profile-startup. Nothing is recorded unless
+:data:`enabled` is set.
+
+Timings are self times, time of :func:`timed` calls nested in a :func:`timed` call of the same category is not
+included in the time of that call. Timings of a category do not overlap, so they can be summed.
+"""
+import time
+import threading
+
+# Set when startup profile is requested, before plugins are loaded
+enabled = False
+# Recorded timings as (category, name, seconds) in the order they were recorded
+timings = []
+# Holds stack of [category, seconds of nested timed calls] for timed calls running in each thread
+_local = threading.local()
+
+CATEGORIES = [('startup', 'Startup steps'),
+              ('import', 'Plugin module imports'),
+              ('plugin', 'Plugin registrations'),
+              ('cleanup', 'Database cleanup jobs')]
+
+
+def record(category, name, seconds):
+    """Record that :name: in :category: took :seconds:"""
+    if enabled:
+        timings.append((category, name, seconds))
+
+
+def timed(category, name, func, *args, **kwargs):
+    """
+    Call :func: with given arguments, recording time it took excluding timed calls of the same category nested in
+    it. Returns what func returns.
+    """
+    if not enabled:
+        return func(*args, **kwargs)
+    if not hasattr(_local, 'spans'):
+        _local.spans = []
+    spans = _local.spans
+    span = [category, 0.0]
+    spans.append(span)
+    start = time.time()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        took = time.time() - start
+        spans.pop()
+        # charge measured time to innermost enclosing call of the same category
+        for parent in reversed(spans):
+            if parent[0] == category:
+                parent[1] += took
+                break
+        timings.append((category, name, took - span[1]))
+
+
+def ranked(category):
+    """Return list of (name, seconds) recorded in :category:, slowest first."""
+    return sorted(((name, took) for cat, name, took in timings if cat == category), key=lambda t: t[1], reverse=True)
+
+
+def report(limit=20):
+    """Print timings of each category, :limit: slowest of each."""
+    for category, title in CATEGORIES:
+        items = ranked(category)
+        if not items:
+            continue
+        print '-' * 79
+        print '%-64s%9.3f sec' % ('%s (%s)' % (title, len(items)), sum(took for name, took in items))
+        print '-' * 79
+        for name, took in items[:limit]:
+            print '%-64s%9.3f sec' % (name, took)
+    print '-' * 79
+
+
+def dump(path):
+    """Write all timings as JSON into :path:"""
+    from flexget.utils import json
+    data = dict((category, [{'name': name, 'seconds': took} for name, took in ranked(category)])
+                for category, title in CATEGORIES)
+    f = open(path, 'w')
+    try:
+        json.dump(data, f, indent=2)
+    finally:
+        f.close()
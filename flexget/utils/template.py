@@ -2,7 +2,6 @@ import logging
 import os
 import re
 import sys
-from copy import copy
 from datetime import datetime, date, time
 import locale
 from email.utils import parsedate
@@ -12,11 +11,16 @@ from jinja2 import (Environment, StrictUndefined, ChoiceLoader, FileSystemLoader
 from flexget.event import event
 from flexget.plugin import PluginError
 from flexget.utils.pathscrub import pathscrub
+from flexget.utils.tools import LRUCache
 
 log = logging.getLogger('utils.template')
 
 # The environment will be created after the manager has started
 environment = None
+# Templates compiled from strings, template string -> Template
+compiled_templates = LRUCache(1000)
+# Matches anything that makes jinja render a string differently from the string itself
+jinja_syntax = re.compile(r'\{[{%#]|\r|\n$')
 
 
 class RenderError(Exception):
@@ -112,6 +116,7 @@ filter_d = filter_default
 def make_environment(manager):
     """Create our environment and add our custom filters"""
     global environment
+    compiled_templates.clear()
     environment = Environment(undefined=StrictUndefined,
         loader=ChoiceLoader([PackageLoader('flexget'),
                              FileSystemLoader(os.path.join(manager.config_base, 'templates'))]),
@@ -142,32 +147,78 @@ def get_template(templatename, pluginname=None):
         raise PluginError('Template not found: %s (%s)' % (templatename, pluginname))
 
 
+class EntryVariables(object):
+    """
+    Template variables from an Entry, with some additional variables. Works as the context of jinja rendering without
+    copying the Entry or casting it into a dict (and losing lazy loading).
+    """
+
+    def __init__(self, entry, **variables):
+        self.entry = entry
+        self.variables = variables
+
+    def __contains__(self, key):
+        return key in self.variables or key in self.entry
+
+    def __getitem__(self, key):
+        if key in self.variables:
+            return self.variables[key]
+        return self.entry[key]
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def keys(self):
+        return list(set(self.entry.keys()) | set(self.variables))
+
+    def __iter__(self):
+        return iter(self.keys())
+
+
+def compile_template(template_string):
+    """
+    Returns Template compiled from :template_string:. Compiled templates are cached, so the same template string
+    is compiled only once.
+    """
+    template = compiled_templates.get(template_string)
+    if template is None:
+        template = environment.from_string(template_string)
+        compiled_templates.set(template_string, template)
+    return template
+
+
 def render_from_entry(template_string, entry):
     """Renders a Template or template string with an Entry as its context."""
 
-    # If a plain string was passed, turn it into a Template
-    if isinstance(template_string, basestring):
-        try:
-            template = environment.from_string(template_string)
-        except TemplateSyntaxError, e:
-            raise PluginError('Error in template syntax: ' + e.message)
+    if isinstance(template_string, basestring) and not jinja_syntax.search(template_string):
+        # Jinja would render plain string as it is, only string replacement is needed
+        if '%' not in template_string:
+            return template_string
+        result = template_string
     else:
-        # We can also support an actual Template being passed in
-        template = template_string
-    # Make a copy of the Entry so we can add some more fields
-    variables = copy(entry)
-    variables['now'] = datetime.now()
-    # We use the lower level render function, so that our Entry is not cast into a dict (and lazy loading lost)
-    try:
-        result = u''.join(template.root_render_func(template.new_context(variables, shared=True)))
-    except:
-        exc_info = sys.exc_info()
+        # If a plain string was passed, turn it into a Template
+        if isinstance(template_string, basestring):
+            try:
+                template = compile_template(template_string)
+            except TemplateSyntaxError, e:
+                raise PluginError('Error in template syntax: ' + e.message)
+        else:
+            # We can also support an actual Template being passed in
+            template = template_string
+        variables = EntryVariables(entry, now=datetime.now())
+        # We use the lower level render function, so that our Entry is not cast into a dict (and lazy loading lost)
         try:
-            return environment.handle_exception(exc_info, True)
-        except Exception, e:
-            error = RenderError('(%s) %s' % (type(e).__name__, e))
-            log.debug('Error during rendering: %s' % error)
-            raise error
+            result = u''.join(template.root_render_func(template.new_context(variables, shared=True)))
+        except:
+            exc_info = sys.exc_info()
+            try:
+                return environment.handle_exception(exc_info, True)
+            except Exception, e:
+                error = RenderError('(%s) %s' % (type(e).__name__, e))
+                log.debug('Error during rendering: %s' % error)
+                raise error
 
     # Only try string replacement if jinja didn't do anything
     if result == template_string:
@@ -192,7 +243,7 @@ def render_from_task(template, task):
     :return: The rendered template text.
     """
     if isinstance(template, basestring):
-        template = environment.from_string(template)
+        template = compile_template(template)
     try:
         result = template.render({'task': task})
     except Exception, e:
@@ -27,6 +27,9 @@ class TitleParser(object):
 
     sounds = ['AC3', 'DD5.1', 'DTS']
 
+    # Compiled ireplace regexps, words are replaced often so compiling them on every call is costly
+    ireplace_cache = {}
+
     @staticmethod
     def re_not_in_word(regexp):
         return r'(?<![^\W_])' + regexp + r'(?![^\W_])'
@@ -48,8 +51,10 @@ class TitleParser(object):
     @staticmethod
     def ireplace(data, old, new, count=0, not_in_word=False):
         """Case insensitive string replace"""
-        old = re.escape(old)
-        if not_in_word:
-            old = TitleParser.re_not_in_word(old)
-        pattern = re.compile(old, re.I)
-        return re.sub(pattern, new, data, count)
+        pattern = TitleParser.ireplace_cache.get((old, not_in_word))
+        if pattern is None:
+            regexp = re.escape(old)
+            if not_in_word:
+                regexp = TitleParser.re_not_in_word(regexp)
+            pattern = TitleParser.ireplace_cache[(old, not_in_word)] = re.compile(regexp, re.I)
+        return pattern.sub(new, data, count)
@@ -4,7 +4,7 @@ from datetime import datetime, timedelta
 from dateutil.parser import parse as parsedate
 from flexget.utils.titles.parser import TitleParser, ParseWarning
 from flexget.utils import qualities
-from flexget.utils.tools import ReList
+from flexget.utils.tools import ReList, LRUCache
 
 log = logging.getLogger('seriesparser')
 
@@ -14,6 +14,45 @@ log.setLevel(logging.INFO)
 
 ID_TYPES = ['ep', 'date', 'sequence', 'id']
 
+# Compiled regexps shared by all parser instances, keyed by whatever configuration they were built from
+COMPILED_REGEXPS_LIMIT = 10000
+compiled_regexps = LRUCache(COMPILED_REGEXPS_LIMIT)
+# Name regexps generated for series names guessed from data by metainfo_series, one for each unique guess
+GUESSED_REGEXPS_LIMIT = 1000
+guessed_regexps = LRUCache(GUESSED_REGEXPS_LIMIT)
+
+dirt_re = re.compile(r'[_.,\[\]\(\): ]+')
+split_re = re.compile('[\W_]+')
+expect_ep_re = re.compile(TitleParser.re_not_in_word(r'(0?\d)(\d\d)'), re.IGNORECASE | re.UNICODE)
+
+
+# Blanks of name regexps generated by SeriesParser.name_to_re, any non word characters except & and _
+blanks_re = re.compile(r'(?:[^\w&]|_)+', re.UNICODE)
+
+
+def compact_name(text):
+    """Lowercase `text` with blanks removed, form in which generated name regexps can be compared to data."""
+    return blanks_re.sub('', text).lower().replace('&', 'and')
+
+
+def compiled(key, build, guessed=False):
+    """
+    Returns compiled regexps for `key`, built and compiled only on first request.
+
+    :param key: Hashable key identifying regexps
+    :param build: Function returning :class:`ReList` or tuple with one as first item, called on cache miss
+    :param bool guessed: Regexps are built from a guessed series name, they are kept in a separate bounded cache so
+        that guesses cannot evict regexps of configured series
+    """
+    cache = guessed_regexps if guessed else compiled_regexps
+    result = cache.get(key)
+    if result is None:
+        result = build()
+        # compile all regexps now, so that parsers sharing the list never need to
+        list(result[0] if isinstance(result, tuple) else result)
+        cache.set(key, result)
+    return result
+
 
 class SeriesParser(TitleParser):
 
@@ -67,7 +106,7 @@ class SeriesParser(TitleParser):
 
     def __init__(self, name='', identified_by='auto', name_regexps=None, ep_regexps=None, date_regexps=None,
                  sequence_regexps=None, id_regexps=None, strict_name=False, allow_groups=None, allow_seasonless=True,
-                 date_dayfirst=None, date_yearfirst=None):
+                 date_dayfirst=None, date_yearfirst=None, name_guessed=False):
         """Init SeriesParser.
 
         :param string name: Name of the series parser is going to try to parse.
@@ -84,6 +123,7 @@ class SeriesParser(TitleParser):
         :param date_dayfirst: Prefer day first notation of dates when there are multiple possible interpretations.
         :param date_yearfirst: Prefer year first notation of dates when there are multiple possible interpretations.
         This will also populate attribute `group`.
+        :param boolean name_guessed: Name is guessed from data rather than configured.
         """
 
         self.name = name
@@ -91,18 +131,22 @@ class SeriesParser(TitleParser):
         self.identified_by = identified_by
         # Stores the type of identifier found, 'ep', 'date', 'sequence' or 'special'
         self.id_type = None
-        self.name_regexps = ReList(name_regexps or [])
+        name_regexps = tuple(name_regexps or [])
+        self.name_regexps = compiled(('name_regexps', name_regexps), lambda: ReList(name_regexps))
         self.re_from_name = False
         # If custom identifier regexps were provided, prepend them to the appropriate type of built in regexps
         for mode in ID_TYPES:
             listname = mode + '_regexps'
-            if locals()[listname]:
-                setattr(self, listname, ReList(locals()[listname] + getattr(SeriesParser, listname)))
+            custom = tuple(locals()[listname] or [])
+            if custom:
+                setattr(self, listname, compiled((listname, custom),
+                                                 lambda: ReList(list(custom) + getattr(SeriesParser, listname))))
         self.strict_name = strict_name
         self.allow_groups = allow_groups or []
         self.allow_seasonless = allow_seasonless
         self.date_dayfirst = date_dayfirst
         self.date_yearfirst = date_yearfirst
+        self.name_guessed = name_guessed
 
         self.field = None
         self._reset()
@@ -138,16 +182,20 @@ class SeriesParser(TitleParser):
 
     def remove_dirt(self, data):
         """Replaces some characters with spaces"""
-        return re.sub(r'[_.,\[\]\(\): ]+', ' ', data).strip().lower()
+        return dirt_re.sub(' ', data).strip().lower()
 
-    def name_to_re(self, name):
-        """Convert 'foo bar' to '^[^...]*foo[^...]*bar[^...]+"""
-        parenthetical = None
+    @staticmethod
+    def split_parenthetical(name):
+        """Split 'Show (US)' into tuple ('Show', 'US'). Parenthetical is None if name does not end with one."""
         if name.endswith(')'):
             p_start = name.rfind('(')
             if p_start != -1:
-                parenthetical = name[p_start + 1:-1]
-                name = name[:p_start - 1]
+                return name[:p_start - 1], name[p_start + 1:-1]
+        return name, None
+
+    def name_to_re(self, name):
+        """Convert 'foo bar' to '^[^...]*foo[^...]*bar[^...]+"""
+        name, parenthetical = self.split_parenthetical(name)
         # Blanks are any non word characters except & and _
         blank = r'(?:[^\w&]|_)'
         ignore = '(?:' + '|'.join(self.ignore_prefixes) + ')?'
@@ -164,6 +212,23 @@ class SeriesParser(TitleParser):
         res = '^' + ignore + blank + '*' + '(' + res + ')' + blank + '+'
         return res
 
+    def compiled_name_regexps(self):
+        """
+        Regexps generated from name, compiled only once for each name.
+
+        :return: Tuple (name_regexps, strict_name)
+        """
+        name, strict_name = self.name, self.strict_name
+
+        def build():
+            regexps = ReList([self.name_to_re(name)])
+            # name_to_re may turn on strict_name
+            result = regexps, self.strict_name
+            self.strict_name = strict_name
+            return result
+
+        return compiled(('name', name, strict_name), build, guessed=self.name_guessed)
+
     def parse(self, data=None, field=None, quality=None):
         # Clear the output variables before parsing
         self._reset()
@@ -175,13 +240,11 @@ class SeriesParser(TitleParser):
             raise Exception('SeriesParser initialization error, name: %s data: %s' % \
                (repr(self.name), repr(self.data)))
 
-        name = self.remove_dirt(self.name)
-
         # check if data appears to be unwanted (abort)
         if self.parse_unwanted(self.remove_dirt(self.data)):
             return
 
-        log.debug('name: %s data: %s' % (name, self.data))
+        log.debug('name: %s data: %s' % (self.name, self.data))
 
         # name end position
         name_start = 0
@@ -190,11 +253,11 @@ class SeriesParser(TitleParser):
         # regexp name matching
         if not self.name_regexps:
             # if we don't have name_regexps, generate one from the name
-            self.name_regexps = ReList([self.name_to_re(self.name)])
+            self.name_regexps, self.strict_name = self.compiled_name_regexps()
             self.re_from_name = True
         # try all specified regexps on this data
         for name_re in self.name_regexps:
-            match = re.search(name_re, self.data)
+            match = name_re.search(self.data)
             if match:
                 if self.re_from_name:
                     name_start, name_end = match.span(1)
@@ -242,7 +305,7 @@ class SeriesParser(TitleParser):
         # Remove unwanted words from data for ep / id parsing
         data_stripped = self.remove_words(data_stripped, self.remove, not_in_word=True)
 
-        data_parts = re.split('[\W_]+', data_stripped)
+        data_parts = split_re.split(data_stripped)
 
         for part in data_parts[:]:
             if part in self.propers:
@@ -307,7 +370,7 @@ class SeriesParser(TitleParser):
                 # ressu: Added matching for 0101, 0102... It will fail on
                 #        season 11 though
                 log.debug('expect_ep enabled')
-                match = re.search(self.re_not_in_word(r'(0?\d)(\d\d)'), data_stripped, re.IGNORECASE | re.UNICODE)
+                match = expect_ep_re.search(data_stripped)
                 if match:
                     # strict_name
                     if self.strict_name:
@@ -329,7 +392,7 @@ class SeriesParser(TitleParser):
         # Check id regexps
         if self.identified_by in ['id', 'auto']:
             for id_re in self.id_regexps:
-                match = re.search(id_re, data_stripped)
+                match = id_re.search(data_stripped)
                 if match:
                     # strict_name
                     if self.strict_name:
@@ -345,7 +408,7 @@ class SeriesParser(TitleParser):
         # Check sequences last as they contain the broadest matches
         if self.identified_by in ['sequence', 'auto']:
             for sequence_re in self.sequence_regexps:
-                match = re.search(sequence_re, data_stripped)
+                match = sequence_re.search(data_stripped)
                 if match:
                     # strict_name
                     if self.strict_name:
@@ -387,7 +450,7 @@ class SeriesParser(TitleParser):
     def parse_unwanted(self, data):
         """Parses data for an unwanted hits. Return True if the data contains unwanted hits."""
         for ep_unwanted_re in self.unwanted_ep_regexps:
-            match = re.search(ep_unwanted_re, data)
+            match = ep_unwanted_re.search(data)
             if match:
                 log.debug('unwanted regexp %s matched %s' % (ep_unwanted_re.pattern, match.groups()))
                 return True
@@ -395,7 +458,7 @@ class SeriesParser(TitleParser):
     def parse_unwanted_id(self, data):
         """Parses data for an unwanted id hits. Return True if the data contains unwanted hits."""
         for id_unwanted_re in self.unwanted_id_regexps:
-            match = re.search(id_unwanted_re, data)
+            match = id_unwanted_re.search(data)
             if match:
                 log.debug('unwanted id regexp %s matched %s' % (id_unwanted_re, match.groups()))
                 return True
@@ -407,7 +470,7 @@ class SeriesParser(TitleParser):
         If no date is found returns False
         """
         for date_re in self.date_regexps:
-            match = re.search(date_re, data)
+            match = date_re.search(data)
             if match:
                 # Check if this is a valid date
                 possdates = []
@@ -455,7 +518,7 @@ class SeriesParser(TitleParser):
 
         # search for season and episode number
         for ep_re in self.ep_regexps:
-            match = re.search(ep_re, data)
+            match = ep_re.search(data)
 
             if match:
                 log.debug('found episode number with regexp %s (%s)' % (ep_re.pattern, match.groups()))
@@ -569,3 +632,51 @@ class SeriesParser(TitleParser):
 
     def __eq__(self, other):
         return self is other
+
+
+class SeriesNameIndex(object):
+    """
+    Index of series names, tells which series a title may belong to without trying name regexps of every series.
+
+    Candidates are a superset of series whose name regexp can match, they still need to be parsed. Series with
+    custom name regexps cannot be indexed and are candidates for everything.
+    """
+
+    ignore_prefix_re = re.compile('|'.join(SeriesParser.ignore_prefixes), re.IGNORECASE | re.UNICODE)
+
+    def __init__(self):
+        # compact name -> set of series names
+        self.names = {}
+        # distinct lengths of compact names
+        self.lengths = set()
+        self.unindexed = set()
+
+    def add(self, name, name_regexps=None):
+        """
+        :param name: Series name
+        :param name_regexps: Custom name regexps of the series, if any
+        """
+        key = compact_name(SeriesParser.split_parenthetical(name)[0])
+        if name_regexps or not key:
+            self.unindexed.add(name)
+            return
+        self.names.setdefault(key, set()).add(name)
+        self.lengths.add(len(key))
+
+    def candidates(self, data):
+        """
+        :param data: Title or other text parsed for series
+        :return: Set of series names which may match `data`
+        """
+        result = set(self.unindexed)
+        texts = [data]
+        # name regexps accept some prefixes before the name
+        prefix = self.ignore_prefix_re.match(data)
+        if prefix:
+            texts.append(data[prefix.end():])
+        for text in texts:
+            text = compact_name(text)
+            for length in self.lengths:
+                if length <= len(text):
+                    result.update(self.names.get(text[:length], ()))
+        return result
@@ -7,6 +7,8 @@ from urlparse import urlparse
 import time
 from htmlentitydefs import name2codepoint
 import re
+import threading
+from collections import OrderedDict
 from datetime import timedelta
 
 
@@ -321,6 +323,52 @@ class ReList(list):
             yield self[i]
 
 
+class LRUCache(object):
+    """
+    Thread safe mapping holding at most `size` items, least recently used item is dropped when it gets full.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        self._lock.acquire()
+        try:
+            # move to end, marking as most recently used
+            value = self._items.pop(key)
+            self._items[key] = value
+            return value
+        except KeyError:
+            return default
+        finally:
+            self._lock.release()
+
+    def set(self, key, value):
+        self._lock.acquire()
+        try:
+            self._items.pop(key, None)
+            self._items[key] = value
+            if len(self._items) > self.size:
+                self._items.popitem(last=False)
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            self._items.clear()
+        finally:
+            self._lock.release()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+
 def console(text):
     """Print to console safely."""
     if isinstance(text, str):
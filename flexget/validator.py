@@ -11,6 +11,8 @@ class Errors(object):
         self.messages = []
         self.path = []
         self.path_level = None
+        # True when result depends on state of the filesystem, and may change without the data changing
+        self.checked_filesystem = False
 
     def count(self):
         """Return number of errors."""
@@ -442,6 +444,7 @@ class FileValidator(TextValidator):
     def validate(self, data):
         import os
 
+        self.errors.checked_filesystem = True
         if not os.path.isfile(os.path.expanduser(data)):
             self.errors.add('File %s does not exist' % data)
             return False
@@ -482,6 +485,7 @@ class PathValidator(TextValidator):
             if result:
                 path = os.path.dirname(data[0:result.start()])
 
+        self.errors.checked_filesystem = True
         if not os.path.isdir(os.path.expanduser(path)):
             self.errors.add('Path %s does not exist' % path)
             return False
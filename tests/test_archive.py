@@ -0,0 +1,39 @@
+from tests import FlexGetBase
+from flexget.manager import Session
+
+
+class TestArchive(FlexGetBase):
+
+    __yaml__ = """
+        tasks:
+          test:
+            mock:
+              - {title: 'Archived 1', url: 'http://localhost/archived1', description: 'first'}
+              - {title: 'Archived 2', url: 'http://localhost/archived2'}
+            archive: [tag1, tag2]
+
+          test2:
+            mock:
+              - {title: 'Archived 1', url: 'http://localhost/archived1'}
+              - {title: 'Archived 3', url: 'http://localhost/archived3'}
+            archive: [tag3]
+    """
+
+    def test_archive(self):
+        from flexget.plugins.generic.archive import ArchiveEntry
+        self.execute_task('test')
+        # second run should not create duplicates
+        self.execute_task('test')
+        self.execute_task('test2')
+        session = Session()
+        try:
+            assert session.query(ArchiveEntry).count() == 3, 'Archive should contain 3 entries'
+            ae = session.query(ArchiveEntry).filter(ArchiveEntry.title == u'Archived 1').one()
+            assert ae.description == 'first', 'Description was not archived'
+            assert sorted(s.name for s in ae.sources) == ['test', 'test2'], 'Sources are wrong: %s' % ae.sources
+            assert sorted(t.name for t in ae.tags) == ['tag1', 'tag2', 'tag3'], 'Tags are wrong: %s' % ae.tags
+            ae = session.query(ArchiveEntry).filter(ArchiveEntry.title == u'Archived 3').one()
+            assert [s.name for s in ae.sources] == ['test2'], 'Sources are wrong: %s' % ae.sources
+            assert [t.name for t in ae.tags] == ['tag3'], 'Tags are wrong: %s' % ae.tags
+        finally:
+            session.close()
@@ -56,3 +56,47 @@ class TestInputCache(FlexGetBase):
         assert self.task.entries, 'should have created entries at the start'
         self.execute_task('test_db')
         assert self.task.entries, 'should have created entries from the cache'
+
+    def test_http_cache(self):
+        """Test http validator cache"""
+        from flexget.manager import Session
+        from flexget.utils.cached_input import http_cache
+
+        class Response(object):
+            headers = {'etag': '"abc"', 'last-modified': 'Sat, 29 Oct 1994 19:43:31 GMT'}
+
+        session = Session()
+        cache = http_cache(session, 'test', 'http://localhost/rss')
+        assert not cache.headers, 'should not send conditional headers before first fetch'
+        cache.store(Response())
+        assert cache.entries is None, 'should not keep entries unless they are given'
+        cache.store(Response(), [Entry(title='Test', url='http://localhost/test')])
+        session.commit()
+
+        session = Session()
+        assert not http_cache(session, 'other', 'http://localhost/rss').headers, 'validators are kept per task'
+        cache = http_cache(session, 'test', 'http://localhost/rss')
+        assert cache.headers == {'If-None-Match': '"abc"', 'If-Modified-Since': 'Sat, 29 Oct 1994 19:43:31 GMT'}
+        entries = cache.get_entries()
+        assert len(entries) == 1 and isinstance(entries[0], Entry)
+        assert entries[0]['title'] == 'Test'
+        session.close()
+
+    def test_frozen_entry(self):
+        """Test entries thawed from memory cache do not share state"""
+        from flexget.utils.cached_input import FrozenEntry
+
+        entry = Entry(title='Test', url='http://localhost/test', urls=['http://localhost/test'])
+        entry.register_lazy_fields(['lazy'], lambda e, field: e['title'] + ' lazy')
+        frozen = FrozenEntry(entry)
+        entry['urls'].append('http://localhost/changed')
+
+        first, second = frozen.thaw(), frozen.thaw()
+        assert isinstance(first, Entry)
+        assert first['urls'] == ['http://localhost/test'], 'cache should not see changes made after storing'
+        first['urls'].append('http://localhost/other')
+        first['title'] = 'Changed'
+        assert second['urls'] == ['http://localhost/test'], 'thawed entries should not share mutable values'
+        assert second['title'] == 'Test'
+        assert first.is_lazy('lazy')
+        assert first['lazy'] == 'Changed lazy', 'lazy field should be bound to thawed entry'
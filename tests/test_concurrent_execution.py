@@ -0,0 +1,199 @@
+import os
+import time
+import shutil
+import threading
+from tests import FlexGetBase, util
+from flexget.plugin import register_plugin, get_plugin_by_name
+
+
+class InputOverlap(object):
+    """Fake input plugin, waits until configured number of tasks are running their input phase at the same time."""
+
+    condition = threading.Condition()
+    running = 0
+    most = 0
+    timeout = 5
+
+    def on_task_input(self, task, config):
+        cls = InputOverlap
+        with cls.condition:
+            cls.running += 1
+            cls.most = max(cls.most, cls.running)
+            cls.condition.notify_all()
+            deadline = time.time() + cls.timeout
+            while cls.running < config and time.time() < deadline:
+                cls.condition.wait(deadline - time.time())
+            cls.running -= 1
+        return []
+
+
+class InputOverlapSerial(InputOverlap):
+    """Same as InputOverlap, but cannot be used by tasks executing at the same time."""
+
+register_plugin(InputOverlap, 'test_overlap', api_ver=2, concurrent=True)
+register_plugin(InputOverlapSerial, 'test_overlap_serial', api_ver=2, concurrent=False)
+
+
+class ConcurrentBase(FlexGetBase):
+
+    def setup(self):
+        # in-memory database cannot be shared between worker threads
+        self.tmpdir = util.maketemp()
+        self.database_uri = 'sqlite:///%s' % os.path.join(self.tmpdir, 'test.sqlite')
+        super(ConcurrentBase, self).setup()
+        self.manager.options.workers = 3
+        InputOverlap.running = InputOverlap.most = 0
+        InputOverlap.timeout = 5
+
+    def teardown(self):
+        self.manager.options.workers = 1
+        try:
+            super(ConcurrentBase, self).teardown()
+        finally:
+            shutil.rmtree(self.tmpdir)
+
+
+class TestConcurrentExecution(ConcurrentBase):
+
+    __yaml__ = """
+        tasks:
+          first:
+            priority: 1
+            mock:
+              - {title: 'foo', url: 'http://localhost/foo'}
+            accept_all: yes
+          second:
+            mock:
+              - {title: 'foo', url: 'http://localhost/foo'}
+            accept_all: yes
+          third:
+            mock:
+              - {title: 'bar', url: 'http://localhost/bar'}
+            accept_all: yes
+          fourth:
+            mock:
+              - {title: 'baz', url: 'http://localhost/baz'}
+            accept_all: yes
+    """
+
+    def test_concurrent(self):
+        self.manager.create_tasks()
+        self.manager.execute()
+        tasks = self.manager.tasks
+        for name in ['first', 'third', 'fourth']:
+            assert not tasks[name].aborted, 'Task %s should not have aborted' % name
+            assert len(tasks[name].accepted) == 1, 'Task %s should have accepted an entry' % name
+        # first has lower priority value, so it must have been completed (and learned seen) before second started
+        assert not tasks['second'].accepted, 'foo should have been rejected by seen in task second'
+        self.manager.tasks = {}
+
+
+class TestConcurrentOverlap(ConcurrentBase):
+
+    __yaml__ = """
+        tasks:
+          overlap_first:
+            test_overlap: 2
+            mock:
+              - {title: 'bar', url: 'http://localhost/bar'}
+            accept_all: yes
+          overlap_second:
+            test_overlap: 2
+            mock:
+              - {title: 'baz', url: 'http://localhost/baz'}
+            accept_all: yes
+          learn:
+            priority: 1
+            mock:
+              - {title: 'foo', url: 'http://localhost/foo'}
+            accept_all: yes
+          no_seen:
+            test_overlap: 2
+            disable_builtins: [seen]
+            mock:
+              - {title: 'foo', url: 'http://localhost/foo'}
+            accept_all: yes
+          with_seen:
+            test_overlap: 2
+            mock:
+              - {title: 'foo', url: 'http://localhost/foo'}
+            accept_all: yes
+          serial:
+            test_overlap_serial: 2
+            mock:
+              - {title: 'foo', url: 'http://localhost/foo'}
+            accept_all: yes
+    """
+
+    def execute_tasks(self, names):
+        self.manager.create_tasks()
+        tasks = self.manager.tasks
+        self.manager.execute(tasks=names)
+        self.manager.tasks = {}
+        return tasks
+
+    def test_overlap(self):
+        tasks = self.execute_tasks(['overlap_first', 'overlap_second'])
+        assert InputOverlap.most == 2, 'tasks should have been executing at the same time'
+        for name in ['overlap_first', 'overlap_second']:
+            assert len(tasks[name].accepted) == 1, 'Task %s should have accepted an entry' % name
+
+    def test_disable_builtins(self):
+        tasks = self.execute_tasks(['learn', 'no_seen', 'with_seen'])
+        assert InputOverlap.most == 2, 'tasks should have been executing at the same time'
+        assert tasks['no_seen'].accepted, 'seen should have been disabled in task no_seen'
+        assert not tasks['with_seen'].accepted, 'seen should not have been disabled in concurrently executing task'
+        assert get_plugin_by_name('seen').builtin, 'seen should still be a builtin plugin'
+
+    def test_serial_plugin(self):
+        # tasks give up waiting for each other
+        InputOverlap.timeout = 0.5
+        tasks = self.execute_tasks(['overlap_first', 'serial'])
+        assert InputOverlap.most == 1, 'task using non concurrent plugin should have been executed alone'
+        assert tasks['serial'].accepted, 'task using non concurrent plugin should have been executed'
+
+
+class TestWalProfile(FlexGetBase):
+
+    __yaml__ = """
+        tasks:
+          test:
+            mock:
+              - {title: 'foo', url: 'http://localhost/foo'}
+            accept_all: yes
+    """
+
+    def setup(self):
+        import tests
+        tests.setup_once()
+        tests.test_arguments.db_profile = 'wal'
+        self.tmpdir = util.maketemp()
+        self.database_uri = 'sqlite:///%s' % os.path.join(self.tmpdir, 'test.sqlite')
+        super(TestWalProfile, self).setup()
+
+    def teardown(self):
+        import tests
+        tests.test_arguments.db_profile = 'default'
+        try:
+            super(TestWalProfile, self).teardown()
+        finally:
+            shutil.rmtree(self.tmpdir)
+
+    def test_reader_during_write(self):
+        from flexget.manager import Session, ReaderSession
+        from flexget.plugins.filter.seen import SeenEntry
+        self.execute_task('test')
+        assert self.manager.reader_engine is not self.manager.engine
+        assert self.manager.engine.execute('PRAGMA journal_mode').scalar() == 'wal'
+
+        writer = Session()
+        reader = ReaderSession()
+        try:
+            # keep write transaction open like a running task does
+            writer.query(SeenEntry).delete()
+            writer.flush()
+            assert reader.query(SeenEntry).count() == 1, 'reader should see last committed state'
+        finally:
+            reader.close()
+            writer.rollback()
+            writer.close()
@@ -0,0 +1,44 @@
+from nose.tools import raises
+from flexget import event
+
+
+class TestEvent(object):
+
+    def teardown(self):
+        event._events.pop('test.event', None)
+
+    def test_order(self):
+        called = []
+        event.add_event_handler('test.event', lambda: called.append('low'), 10)
+        event.add_event_handler('test.event', lambda: called.append('first'), 100)
+        event.add_event_handler('test.event', lambda: called.append('second'), 100)
+        handler = event.add_event_handler('test.event', lambda: called.append('moved'), 1)
+        handler.priority = 50
+        event.fire_event('test.event')
+        assert called == ['first', 'second', 'moved', 'low'], called
+
+    def test_remove(self):
+        called = []
+
+        def handler():
+            called.append('handler')
+            # removal during firing does not affect handlers being fired
+            event.remove_event_handler('test.event', other)
+
+        def other():
+            called.append('other')
+
+        assert not event.has_listeners('test.event')
+        event.add_event_handler('test.event', handler, 200)
+        event.add_event_handler('test.event', other)
+        assert event.has_listeners('test.event')
+        event.fire_event('test.event')
+        assert called == ['handler', 'other']
+        event.remove_event_handler('test.event', handler)
+        assert not event.has_listeners('test.event')
+        event.fire_event('test.event')
+        assert called == ['handler', 'other']
+
+    @raises(ValueError)
+    def test_remove_unknown(self):
+        event.remove_event_handler('test.event', lambda: None)
@@ -257,3 +257,152 @@ class TestSetPlugin(FlexGetBase):
         assert 'field' not in entry,\
                 '`field` should not have been created when jinja rendering fails'
         assert entry['otherfield'] == 'no series'
+
+
+class TestEntryContainer(FlexGetBase):
+
+    __yaml__ = """
+        tasks:
+          test:
+            mock:
+              - {title: 'A', url: 'http://localhost/a'}
+              - {title: 'B', url: 'http://localhost/b'}
+              - {title: 'C', url: 'http://localhost/c'}
+              - {title: 'D', url: 'http://localhost/d'}
+            regexp:
+              accept:
+                - D
+                - B
+              reject:
+                - C
+            sort_by:
+              field: title
+              reverse: yes
+    """
+
+    def test_state_views(self):
+        self.execute_task('test')
+        task = self.task
+        assert [e['title'] for e in task.accepted] == ['D', 'B'], 'accepted should follow sorted order'
+        assert [e['title'] for e in task.entries] == ['D', 'B', 'A']
+        assert [e['title'] for e in task.undecided] == ['A']
+        assert len(task.rejected) == 1 and task.rejected[0]['title'] == 'C'
+        assert not task.failed
+        task.all_entries.sort(key=lambda e: e['title'])
+        assert [e['title'] for e in task.accepted] == ['B', 'D'], 'accepted should follow container order'
+        task.reject(task.find_entry(title='B'))
+        assert [e['title'] for e in task.accepted] == ['D']
+        assert [e['title'] for e in task.rejected] == ['B', 'C']
+
+
+class TestStartupProfile(object):
+
+    def setup(self):
+        from flexget.utils import startup_profile
+        startup_profile.enabled = True
+
+    def teardown(self):
+        from flexget.utils import startup_profile
+        startup_profile.enabled = False
+        startup_profile.timings[:] = [t for t in startup_profile.timings if t[0] != 'test']
+
+    def test_ranked(self):
+        from flexget.utils import startup_profile
+        assert startup_profile.timed('test', 'first', lambda x: x * 2, 2) == 4
+        startup_profile.record('test', 'second', 10)
+        assert [name for name, took in startup_profile.ranked('test')] == ['second', 'first']
+
+    def test_nested(self):
+        import time
+        from flexget.utils import startup_profile
+
+        def outer():
+            startup_profile.timed('test', 'inner', time.sleep, 0.1)
+            startup_profile.record('test', 'recorded', 10)
+
+        startup_profile.timed('test', 'outer', outer)
+        timings = dict(startup_profile.ranked('test'))
+        assert timings['inner'] >= 0.1
+        assert 0 <= timings['outer'] < 0.1, 'nested timed calls should not be included in outer'
+
+    def test_disabled(self):
+        from flexget.utils import startup_profile
+        startup_profile.enabled = False
+        assert startup_profile.timed('test', 'first', lambda x: x * 2, 2) == 4
+        startup_profile.record('test', 'second', 10)
+        assert not startup_profile.ranked('test'), 'nothing should be recorded when profiling is not enabled'
+
+
+class TestLogOnce(FlexGetBase):
+
+    __yaml__ = """
+        tasks:
+          test:
+            mock:
+              - {title: 'irrelevant'}
+    """
+
+    def test_log_once(self):
+        from flexget.manager import Session
+        from flexget.utils import log
+        assert log.log_once('test log once message')
+        assert not log.log_once('test log once message'), 'second call should have been suppressed'
+        session = Session()
+        try:
+            assert not session.query(log.LogMessage).count(), 'message should not be stored before flush'
+            self.execute_task('test')
+            assert session.query(log.LogMessage).count() == 1, 'message should be stored after execution'
+        finally:
+            session.close()
+        log.reset()
+        assert not log.log_once('test log once message'), 'stored message should be suppressed after reload'
+
+
+class TestDatabaseCleanup(FlexGetBase):
+
+    __yaml__ = """
+        tasks: {}
+    """
+
+    def test_delete_chunked(self):
+        import time
+        from datetime import datetime
+        from flexget.manager import Session
+        from flexget.utils import database
+        from flexget.utils.log import LogMessage
+        session = Session()
+        old_chunk_size = database.CLEANUP_CHUNK_SIZE
+        database.CLEANUP_CHUNK_SIZE = 10
+        try:
+            for i in xrange(25):
+                session.add(LogMessage('%032d' % i))
+            session.commit()
+            database.cleanup_deadline = time.time() - 1
+            assert database.delete_chunked(session, LogMessage, LogMessage.added < datetime.now()) == (10, False), \
+                'should stop after one chunk when out of time'
+            database.cleanup_deadline = None
+            assert database.delete_chunked(session, LogMessage, LogMessage.added < datetime.now()) == (15, True)
+            assert not session.query(LogMessage).count()
+        finally:
+            database.CLEANUP_CHUNK_SIZE = old_chunk_size
+            database.cleanup_deadline = None
+            session.close()
+
+    def test_resume(self):
+        from flexget.event import add_event_handler, remove_event_handler
+        calls = []
+
+        def unfinished_job(session):
+            calls.append(session)
+            return len(calls) > 1
+
+        add_event_handler('manager.db_cleanup', unfinished_job, 255)
+        try:
+            assert not self.manager.run_cleanup_jobs(set()), 'cleanup should not have finished'
+            assert self.manager.persist['db_cleanup_done'] == [], 'unfinished job should not be marked done'
+            done = set()
+            assert self.manager.run_cleanup_jobs(done)
+            assert len(calls) == 2
+            assert '%s.unfinished_job' % __name__ in done
+        finally:
+            remove_event_handler('manager.db_cleanup', unfinished_job)
@@ -50,3 +50,62 @@ class TestPluginApi(object):
         assert 'test_plugin' in plugin.plugins
         assert 'oneword' in plugin.plugins
         assert 'test_html' in plugin.plugins
+
+    def test_phase_order_cache(self):
+        ordered = plugin.get_plugins_by_phase_sorted('filter')
+        assert ordered is plugin.get_plugins_by_phase_sorted('filter'), 'order should be cached'
+        first, last = ordered[0], ordered[-1]
+        handler = last.phase_handlers['filter']
+        original = handler.priority
+        handler.priority = first.phase_handlers['filter'].priority + 1
+        try:
+            assert plugin.get_plugins_by_phase_sorted('filter')[0] is last, \
+                'priority change should invalidate cached order'
+        finally:
+            handler.priority = original
+
+    def test_manifest(self):
+        from tests import util
+        import shutil
+        tmpdir = util.maketemp()
+        try:
+            plugin_file = os.path.join(tmpdir, 'some_plugin.py')
+            open(plugin_file, 'w').close()
+            manifest_path = os.path.join(tmpdir, 'plugins.manifest')
+            plugin.write_manifest(manifest_path, [tmpdir])
+            modules = plugin.read_manifest(manifest_path, [tmpdir])
+            assert modules, 'manifest should be valid'
+            info = modules['flexget.plugins.filter.accept_all']
+            assert not info['eager'], 'accept_all only registers a plugin'
+            assert 'accept_all' in info['plugins']
+            assert modules['flexget.plugins.cli.plugins']['eager'], 'module registering options must be loaded eagerly'
+            assert plugin.read_manifest(manifest_path, [tmpdir, tmpdir]) is None, 'other dirs should invalidate'
+            os.utime(plugin_file, (0, 0))
+            assert plugin.read_manifest(manifest_path, [tmpdir]) is None, 'modified file should invalidate'
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_load_plugins_for_config(self):
+        from tests import util
+        import shutil
+        import sys
+        tmpdir = util.maketemp()
+        sys.path.insert(0, tmpdir)
+        try:
+            f = open(os.path.join(tmpdir, 'lazy_test_plugin.py'), 'w')
+            f.write('from flexget.plugin import register_plugin\n\n\n'
+                    'class LazyTest(object):\n    pass\n\n'
+                    'register_plugin(LazyTest, \'lazy_test\', api_ver=2)\n')
+            f.close()
+            plugin._lazy_modules['lazy_test_plugin'] = (tmpdir, {'eager': False, 'plugins': {'lazy_test': {}}})
+            plugin._lazy_plugins['lazy_test'] = 'lazy_test_plugin'
+            plugin.load_plugins_for_config({'tasks': {'test': {'inputs': [{'lazy_test': 'yes'}]}}})
+            assert 'lazy_test' in plugin.plugins, 'plugin referenced from nested config should have been loaded'
+        finally:
+            plugin._lazy_modules.pop('lazy_test_plugin', None)
+            plugin._lazy_plugins.pop('lazy_test', None)
+            plugin._module_info.pop('lazy_test_plugin', None)
+            plugin.plugins.pop('lazy_test', None)
+            sys.modules.pop('lazy_test_plugin', None)
+            sys.path.remove(tmpdir)
+            shutil.rmtree(tmpdir)
@@ -70,6 +70,14 @@ class TestQualityParser(object):
             quality = Quality(item[0]).name
             assert quality == item[1], '`%s` quality should be `%s` not `%s`' % (item[0], item[1], quality)
 
+    def test_cached_parse(self):
+        first = Quality('Test.File.720p.hdtv.avi')
+        first.source = Quality('bluray').source
+        second = Quality('Test.File.720p.hdtv.avi')
+        assert second.name == '720p hdtv', 'changing parsed quality should not affect later parses'
+        assert second.clean_text == first.clean_text
+        assert isinstance(Quality(u'Test.File.720p.hdtv.avi').clean_text, unicode)
+
 
 class TestFilterQuality(FlexGetBase):
 
@@ -0,0 +1,58 @@
+import os
+from datetime import datetime, timedelta
+from nose.tools import raises
+from flexget.utils import requests
+
+
+class TestRequests(object):
+
+    def test_map_concurrently(self):
+        def func(item):
+            if item == 3:
+                raise ValueError('three')
+            return item * 2
+
+        results = requests.map_concurrently(func, range(10), workers=4)
+        assert len(results) == 10
+        assert isinstance(results[3], ValueError), 'exception should be returned in place of result'
+        assert results[:3] + results[4:] == [0, 2, 4, 8, 10, 12, 14, 16, 18], 'results are not in order'
+
+    def test_host_slots(self):
+        slot = requests.get_host_slot('http://slots.test/foo')
+        assert slot is requests.get_host_slot('http://slots.test/bar'), 'requests to host should share slots'
+        assert slot is not requests.get_host_slot('http://other.slots.test/foo'), 'hosts should not share slots'
+        # a host having all slots in use does not block requests to other hosts
+        for i in xrange(requests.MAX_REQUESTS_PER_HOST):
+            slot.acquire()
+        try:
+            assert requests.get_host_slot('http://other.slots.test/foo').acquire(False)
+            requests.get_host_slot('http://other.slots.test/foo').release()
+        finally:
+            for i in xrange(requests.MAX_REQUESTS_PER_HOST):
+                slot.release()
+
+    def test_get_many(self):
+        url = 'file://' + os.path.join(os.path.dirname(__file__), 'rss.xml')
+        session = requests.Session()
+        results = session.get_many([url, url + '.missing', url])
+        assert results[0].raw.read() == results[2].raw.read()
+        assert isinstance(results[1], requests.RequestException)
+
+    def test_unresponsive(self):
+        url = 'http://unresponsive.test/foo'
+        requests.set_unresponsive(url)
+        try:
+            assert requests.is_unresponsive(url)
+            requests.unresponsive_hosts['unresponsive.test'] = datetime.now() - timedelta(minutes=5)
+            assert not requests.is_unresponsive(url), 'host should be retried after WAIT_TIME'
+        finally:
+            del requests.unresponsive_hosts['unresponsive.test']
+
+    @raises(requests.requests.Timeout)
+    def test_unresponsive_raises(self):
+        url = 'http://unresponsive.test/foo'
+        requests.set_unresponsive(url)
+        try:
+            requests.get(url)
+        finally:
+            del requests.unresponsive_hosts['unresponsive.test']
@@ -1,3 +1,4 @@
+import os
 import yaml
 from tests import FlexGetBase
 from nose.plugins.attrib import attr
@@ -128,6 +129,65 @@ class TestInputRSS(FlexGetBase):
         assert self.task.entries, 'Entries should have been produced on second run.'
 
 
+class TestRssNotModified(FlexGetBase):
+
+    __yaml__ = """
+        presets:
+          global:
+            rss:
+              url: http://localhost/rss.xml
+              silent: yes
+        tasks:
+          test_last_entry: {}
+          test_all_entries:
+            rss:
+              all_entries: yes
+    """
+
+    def setup(self):
+        FlexGetBase.setup(self)
+        from flexget.utils.cached_input import cached
+        cached.cache = {}
+        from flexget.utils import requests
+        self.requests_session = requests.Session
+        self.orig_get = requests.Session.get
+        self.sent_headers = []
+
+        class Response(object):
+            def __init__(self, status_code, content=''):
+                self.status_code = status_code
+                self.content = content
+                self.headers = {'etag': '"rss"'}
+
+        def get(session, url, **kwargs):
+            headers = kwargs.get('headers') or {}
+            self.sent_headers.append(headers)
+            if headers.get('If-None-Match') == '"rss"':
+                return Response(304)
+            return Response(200, open(os.path.join(os.path.dirname(__file__), 'rss.xml'), 'rb').read())
+
+        requests.Session.get = get
+
+    def teardown(self):
+        self.requests_session.get = self.orig_get
+        FlexGetBase.teardown(self)
+
+    def test_last_entry(self):
+        self.execute_task('test_last_entry')
+        assert self.task.entries, 'Entries should have been produced on first run.'
+        self.execute_task('test_last_entry')
+        assert self.sent_headers[-1], 'Conditional headers should have been sent on second run.'
+        assert not self.task.entries, 'Entries from last run should not be replayed when feed is not modified.'
+
+    def test_all_entries(self):
+        self.execute_task('test_all_entries')
+        count = len(self.task.entries)
+        assert count, 'Entries should have been produced on first run.'
+        self.execute_task('test_all_entries')
+        assert self.sent_headers[-1], 'Conditional headers should have been sent on second run.'
+        assert len(self.task.entries) == count, 'Entries from last run should be reused when feed is not modified.'
+
+
 class TestRssOnline(FlexGetBase):
 
     __yaml__ = """
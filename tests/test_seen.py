@@ -7,6 +7,9 @@ class TestFilterSeen(FlexGetBase):
         presets:
           global:
             accept_all: true
+          archive:
+            seen:
+              cold_after: 1 week
 
         tasks:
           test:
@@ -23,8 +26,40 @@ class TestFilterSeen(FlexGetBase):
             mock:
               - {title: 'New title 1', url: 'http://localhost/new1', imdb_score: 5}
               - {title: 'New title 2', url: 'http://localhost/new2', imdb_score: 5}
+
+          test_retention:
+            mock:
+              - {title: 'Retention title', url: 'http://localhost/retention'}
+            seen:
+              cold_after: 1 week
+
+          test_archived:
+            mock:
+              - {title: 'Seen title 1', url: 'http://localhost/seen1'}
+            preset: archive
     """
 
+    def age_seen(self, **kwargs):
+        from datetime import datetime, timedelta
+        from flexget.manager import Session
+        from flexget.plugins.filter.seen import SeenEntry
+        session = Session()
+        session.query(SeenEntry).update({'added': datetime.now() - timedelta(**kwargs)})
+        session.commit()
+        session.close()
+
+    def cleanup_seen(self):
+        from flexget.manager import Session
+        from flexget.plugins.filter import seen
+        session = Session()
+        try:
+            assert seen.db_cleanup(session), 'seen cleanup should have finished'
+            session.commit()
+            return session.query(seen.SeenEntry.title).all(), \
+                session.execute(seen.select([seen.func.count(seen.seen_cold.c.id)])).scalar()
+        finally:
+            session.close()
+
     def test_seen(self):
         self.execute_task('test')
         assert self.task.find_entry(title='Seen title 1'), 'Test entry missing'
@@ -46,6 +81,118 @@ class TestFilterSeen(FlexGetBase):
         assert self.task.find_entry(title='New title 1') and self.task.find_entry(title='New title 2'), \
             'Item should not have been rejected because of number field'
 
+    def test_seen_chunked(self):
+        from flexget.plugins.filter import seen
+        chunk_size = seen.LOOKUP_CHUNK_SIZE
+        # make sure values are looked up using multiple queries
+        seen.LOOKUP_CHUNK_SIZE = 2
+        try:
+            self.execute_task('test')
+            self.execute_task('test2')
+            assert len(self.task.rejected) == 2, 'Both seen entries should have been rejected'
+            assert self.task.find_entry(title='Seen title 3'), 'Unseen test entry 3 not in second task'
+        finally:
+            seen.LOOKUP_CHUNK_SIZE = chunk_size
+
+    def test_seen_index(self):
+        from flexget.plugins.filter.seen import seen_index
+        self.execute_task('test')
+        # index must contain values learned after it was built
+        self.execute_task('test')
+        assert u'Seen title 1' in seen_index.bloom, 'Learned title missing from seen index'
+        self.execute_task('test2')
+        assert len(self.task.rejected) == 2, 'Both seen entries should have been rejected'
+        assert seen_index.hits >= 3, 'Seen values should have been found'
+        assert seen_index.misses >= 1, 'Unseen values should not have been looked up'
+
+    def test_seen_index_saved(self):
+        from flexget.plugins.filter import seen
+        self.execute_task('test')
+        seen.save_index(self.manager)
+        # new process loads saved index
+        seen.seen_index.invalidate()
+        builds = []
+        seen.seen_index.build = builds.append
+        try:
+            self.execute_task('test2')
+        finally:
+            del seen.seen_index.build
+        assert not builds, 'Saved index should have been loaded instead of building it'
+        assert len(self.task.rejected) == 2, 'Both seen entries should have been rejected'
+
+    def test_seen_index_reused_ids(self):
+        from flexget.plugins.filter import seen
+        self.execute_task('test')
+        seen.save_index(self.manager)
+        seen.forget(u'Seen title 1')
+        # new rows get ids of forgotten ones
+        self.execute_task('test2')
+        assert len(self.task.accepted) == 3, 'Forgotten entries should have been accepted'
+        seen.seen_index.invalidate()
+        self.execute_task('test2')
+        assert len(self.task.rejected) == 3, 'Rows reusing ids of forgotten rows should be in saved index'
+
+    def test_seen_forget(self):
+        self.execute_task('test')
+        from flexget.event import fire_event
+        fire_event('forget', u'Seen title 1')
+        self.execute_task('test')
+        assert self.task.find_entry('accepted', title='Seen title 1'), 'Forgotten entry should be accepted again'
+
+    def test_seen_cold_tier(self):
+        from flexget.plugins.filter.seen import seen_index
+        self.execute_task('test_archived')
+        self.age_seen(days=365)
+        hot, cold = self.cleanup_seen()
+        assert not hot, 'Old entries should have been moved from hot tier'
+        assert cold == 2, 'Title and url should have been moved to cold tier'
+        seen_index.invalidate()
+        self.execute_task('test2')
+        assert len(self.task.rejected) == 2, 'Both entries seen in cold tier should have been rejected'
+        assert self.task.find_entry(title='Seen title 3'), 'Unseen test entry 3 not in second task'
+
+    def test_seen_cold_tier_forget(self):
+        self.execute_task('test_archived')
+        self.age_seen(days=365)
+        self.cleanup_seen()
+        from flexget.plugins.filter.seen import forget
+        assert forget(u'http://localhost/seen1') == (1, 2), 'Whole entry should have been forgotten'
+        self.execute_task('test')
+        assert self.task.find_entry('accepted', title='Seen title 1'), 'Forgotten entry should be accepted again'
+
+    def test_seen_retention_policy(self):
+        self.execute_task('test')
+        self.execute_task('test_retention')
+        self.age_seen(days=10)
+        hot, cold = self.cleanup_seen()
+        assert hot == [(u'Seen title 1',)], 'Only entries of task with short retention should have been moved'
+        assert cold == 2
+        self.execute_task('test_retention')
+        assert self.task.find_entry('rejected', title='Retention title'), 'Entry should be seen from cold tier'
+
+    def test_seen_cold_tier_opt_in(self):
+        self.execute_task('test')
+        self.age_seen(days=365)
+        hot, cold = self.cleanup_seen()
+        assert hot == [(u'Seen title 1',)], 'Entries of task without cold_after should stay in hot tier'
+        assert not cold
+
+    def test_seen_compact(self):
+        from flexget.manager import Session
+        from flexget.plugins.filter.seen import SeenEntry
+        self.execute_task('test_archived')
+        self.age_seen(days=365)
+        self.manager.options.seen_compact = True
+        try:
+            self.execute_task('test_archived')
+        finally:
+            self.manager.options.seen_compact = False
+        session = Session()
+        try:
+            assert not session.query(SeenEntry).count(), 'Old entries should have been moved to cold tier'
+        finally:
+            session.close()
+
 
 class TestFilterSeenMovies(FlexGetBase):
 
@@ -568,3 +568,39 @@ class TestSeriesParser(object):
         # Make sure it doesn't work with a different country
         s.parse('The Show (UK) S01E01')
         assert not s.valid
+
+    def test_compiled_regexps_shared(self):
+        """SeriesParser: compiled regexps are reused between parsers of same series"""
+        first = self.parse(name='The Show (US)', data='The Show (US) S01E01', ep_regexps=['(\d+) (\d+)'])
+        second = self.parse(name='The Show (US)', data='The Show (UK) S01E01', ep_regexps=['(\d+) (\d+)'])
+        assert first.ep_regexps is second.ep_regexps
+        assert first.name_regexps is second.name_regexps
+        assert first.valid and not second.valid, 'strict name should be enabled for cached parenthetical name'
+        assert self.parse(name='Other Show', data='Other Show 2-3', ep_regexps=['(\d+) (\d+)']).episode == 3
+        assert self.parse(name='Other Show', data='Other Show 2-3').id_type == 'sequence', \
+            'custom regexps should not leak to other parsers'
+
+    def test_guessed_names_do_not_evict(self):
+        """SeriesParser: regexps of guessed names do not evict regexps of configured series"""
+        from flexget.utils.titles import series
+        configured = self.parse(name='Configured Show', data='Configured Show S01E01')
+        for i in xrange(series.GUESSED_REGEXPS_LIMIT + 10):
+            guessed = SeriesParser(name='Guessed Show %s' % i, name_guessed=True)
+            guessed.parse(data='Guessed Show %s S01E01' % i)
+        assert len(series.guessed_regexps) == series.GUESSED_REGEXPS_LIMIT
+        assert self.parse(name='Configured Show', data='Configured Show S01E02').name_regexps is \
+            configured.name_regexps, 'configured series regexps should still be cached'
+
+
+class TestSeriesNameIndex(object):
+
+    def test_candidates(self):
+        from flexget.utils.titles.series import SeriesNameIndex
+        index = SeriesNameIndex()
+        for name in ['The Show', 'The Show (US)', 'Law & Order', 'Other']:
+            index.add(name)
+        index.add('Custom', name_regexps=['^cust'])
+        assert index.candidates('The.Show.S01E01.720p') == set(['The Show', 'The Show (US)', 'Custom'])
+        assert index.candidates('[group] TheShow - 1x01') == set(['The Show', 'The Show (US)', 'Custom'])
+        assert index.candidates('Law and Order S01E01') == set(['Law & Order', 'Custom'])
+        assert index.candidates('Something Else S01E01') == set(['Custom'])
@@ -8,6 +8,10 @@ class TestSimplePersistence(FlexGetBase):
           test:
             mock:
               - {title: 'irrelevant'}
+          test_interval:
+            mock:
+              - {title: 'irrelevant'}
+            interval: 1 day
     """
 
     def test_setdefault(self):
@@ -19,3 +23,50 @@ class TestSimplePersistence(FlexGetBase):
         value2 = task.simple_persistence.setdefault('test', 'def')
 
         assert value1 == value2, 'set default broken'
+
+    def test_flushed_on_commit(self):
+        self.execute_task('test_interval')
+        assert not self.task.aborted
+        # last_time written in previous execution must have been committed
+        self.execute_task('test_interval')
+        assert self.task._abort, 'interval should not have been met'
+
+    def test_write_through(self):
+        from flexget.utils.simple_persistence import SimplePersistence
+        persist = SimplePersistence('test_write_through')
+        persist['a'] = 1
+        persist['b'] = 2
+        del persist['b']
+        fresh = SimplePersistence('test_write_through')
+        assert fresh.items() == [('a', 1)]
+
+    def test_bound_session(self):
+        from flexget.manager import Session
+        from flexget.utils.simple_persistence import SimplePersistence
+        session = Session()
+        try:
+            persist = SimplePersistence('test_bound_session', session=session)
+            persist['a'] = 1
+            assert persist['a'] == 1
+            assert 'a' not in SimplePersistence('test_bound_session'), 'changes should not be written before flush'
+            # rollback discards changes like before
+            session.rollback()
+            persist.reset()
+            assert 'a' not in persist
+            persist['a'] = 2
+            persist.flush()
+            session.commit()
+        finally:
+            session.close()
+        assert SimplePersistence('test_bound_session')['a'] == 2
+
+    def test_unbound_reset_after_execution(self):
+        from flexget.utils.simple_persistence import SimplePersistence
+        persist = SimplePersistence('test_unbound_reset')
+        other = SimplePersistence('test_unbound_reset')
+        assert 'a' not in persist
+        # changed by another instance, eg. in another process
+        other['a'] = 1
+        assert 'a' not in persist, 'loaded values should be cached during execution'
+        self.execute_task('test')
+        assert persist['a'] == 1, 'values should be reloaded after execution'
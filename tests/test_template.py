@@ -0,0 +1,32 @@
+from tests import FlexGetBase
+from flexget.entry import Entry
+
+
+class TestRenderFromEntry(FlexGetBase):
+
+    __yaml__ = """
+        tasks:
+          test:
+            mock:
+              - {title: 'foo'}
+    """
+
+    def test_render(self):
+        from flexget.utils import template
+        from flexget.utils.template import render_from_entry
+
+        entry = Entry(title=u'foo', url=u'http://localhost/foo', season=2)
+        assert render_from_entry('/plain/path', entry) == '/plain/path'
+        assert render_from_entry('/path/%(title)s', entry) == '/path/foo'
+        assert render_from_entry('/path/{{title}}/{{season|pad(2)}}', entry) == '/path/foo/02'
+        assert '/path/{{title}}/{{season|pad(2)}}' in template.compiled_templates, 'template should be cached'
+        assert render_from_entry('{{title}}-{{now.year}}', entry).startswith('foo-')
+        # jinja drops one trailing newline, plain strings must render the same way
+        assert render_from_entry('text\n', entry) == 'text'
+
+    def test_lazy_fields(self):
+        from flexget.utils.template import render_from_entry
+
+        entry = Entry(title=u'foo', url=u'http://localhost/foo')
+        entry.register_lazy_fields(['lazy'], lambda entry, field: u'value')
+        assert render_from_entry('{{lazy}}', entry) == 'value'
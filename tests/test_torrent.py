@@ -2,7 +2,7 @@ import os
 
 from nose.plugins.attrib import attr
 from tests import FlexGetBase, with_filecopy
-from flexget.utils.bittorrent import Torrent
+from flexget.utils.bittorrent import Torrent, bdecode, bencode
 from .util import date_aged
 
 
@@ -24,6 +24,68 @@ class TestInfoHash(FlexGetBase):
             'InfoHash does not match (got %s)' % hash
 
 
+class TestBencode(object):
+
+    def test_roundtrip(self):
+        data = {'announce': 'http://localhost/announce', 'info': {'name': 'foo', 'length': 10 ** 12,
+                'files': [{'path': ['a', 'b'], 'length': -1}]}, 'list': [[], {}, '', 0]}
+        assert bdecode(bencode(data)) == data
+        assert bencode(u'unicode') == '7:unicode'
+
+    def test_invalid(self):
+        for text in ['', 'i1', 'd3:fooe', '5:abc', 'x', 'l', 'i1ei2e']:
+            try:
+                bdecode(text)
+            except SyntaxError:
+                pass
+            else:
+                assert False, '%r should not decode' % text
+
+    def test_info_hash_from_original_bytes(self):
+        import hashlib
+        # keys are not in sorted order, re-encoding would change info hash
+        info = 'd4:name3:foo6:lengthi1ee'
+        torrent = Torrent('d8:announce4:test4:info%se' % info)
+        assert torrent.get_info_hash() == hashlib.sha1(info).hexdigest().upper()
+        # info may have been modified once it has been decoded
+        info = torrent.content['info']
+        torrent.modified = True
+        assert torrent.get_info_hash() == hashlib.sha1(bencode(info)).hexdigest().upper()
+
+    def test_lazy_decoding(self):
+        data = 'd8:announce4:test7:comment3:foo4:infod6:lengthi1e4:name3:fooee'
+        torrent = Torrent(data)
+        assert torrent.get_size() == 1
+        assert torrent.encode() == data, 'unmodified torrent should encode to original bytes'
+        info_hash = torrent.get_info_hash()
+        torrent.set_comment('bar')
+        assert torrent.modified
+        assert torrent.get_info_hash() == info_hash
+        assert bdecode(torrent.encode()) == dict(bdecode(data), comment='bar')
+        torrent.content['info']['length'] = 2
+        torrent.modified = True
+        assert torrent.get_size() == 2, 'cached size should be cleared when modified'
+
+    def test_decoded_info_kept_when_adding_tracker(self):
+        import hashlib
+        # keys are not in sorted order, re-encoding would change info hash
+        info = 'd4:name3:foo6:lengthi1ee'
+        torrent = Torrent('d8:announce4:test4:info%se' % info)
+        info_hash = hashlib.sha1(info).hexdigest().upper()
+        # torrent plugin decodes info (file list, size) before trackers are modified
+        assert torrent.get_size() == 1
+        torrent.add_multitracker('http://localhost/announce')
+        assert torrent.get_info_hash() == info_hash
+        assert info in torrent.encode(), 'original info bytes should be kept when info is not changed'
+        assert Torrent(torrent.encode()).get_info_hash() == info_hash
+
+    def test_get_announce(self):
+        torrent = Torrent('d8:announce4:test4:infod4:name3:foo6:lengthi1eee')
+        assert torrent.get_announce() == 'test'
+        assert 'info' in torrent._spans, 'info should not be decoded for announce'
+        assert Torrent('d4:infod4:name3:foo6:lengthi1eee').get_announce() is None
+
+
 class TestSeenInfoHash(FlexGetBase):
 
     __yaml__ = """
@@ -247,8 +309,37 @@ class TestTorrentAlive(FlexGetBase):
             mock:
               - {title: 'test', file: 'test_torrent_alive.torrent', url: fake}
             torrent_alive: 0
+          test_torrent_alive_cached:
+            mock:
+              - {title: 'test', file: 'test_torrent_alive.torrent', url: fake}
+            torrent_alive: 5
     """
 
+    def test_scrape_url(self):
+        from flexget.plugins.filter.torrent_alive import get_scrape_url
+        url = get_scrape_url('udp://localhost/announce?passkey=a', ['00' * 20, 'FF' * 20])
+        assert url == 'http://localhost/scrape?passkey=a&info_hash=%s&info_hash=%s' % ('%00' * 20, '%FF' * 20)
+
+    def test_scrape_batches(self):
+        from flexget.plugins.filter import torrent_alive
+        hashes = ['%040d' % i for i in xrange(torrent_alive.SCRAPE_BATCH + 1)]
+        batches = torrent_alive.scrape_batches({'http://a/announce': hashes, 'http://b/announce': hashes[:1]})
+        assert [(tracker, len(batch)) for tracker, batch in batches] == \
+               [('http://a/announce', torrent_alive.SCRAPE_BATCH), ('http://a/announce', 1), ('http://b/announce', 1)]
+
+    @with_filecopy('test.torrent', 'test_torrent_alive.torrent')
+    def test_torrent_alive_cached(self):
+        from flexget.manager import Session
+        from flexget.plugins.filter.torrent_alive import TrackerSeeds
+        session = Session()
+        session.add(TrackerSeeds(tracker='http://torrent.ubuntu.com:6969/announce',
+                                 info_hash='20AE692114DC343C86DF5B07C276E5077E581766', seeds=5))
+        session.commit()
+        session.close()
+        # tracker is not scraped while seeds are cached
+        self.execute_task('test_torrent_alive_cached')
+        assert self.task.accepted, 'Cached seeds should have met seed requirement.'
+
     @attr(online=True)
     @with_filecopy('test.torrent', 'test_torrent_alive.torrent')
     def test_torrent_alive_fail(self):
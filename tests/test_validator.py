@@ -91,3 +91,31 @@ class TestValidator(object):
         assert recursive_validator().validate(test_config), 'Config should pass validation'
         test_config['recurse']['badkey'] = 4
         assert not recursive_validator().validate(test_config), 'Config should not be valid'
+
+    def test_task_validation_cache(self):
+        from flexget.task import Task
+        from flexget.plugin import get_plugin_by_name
+
+        plugin = get_plugin_by_name('accept_all')
+        assert Task.get_validator(plugin) is Task.get_validator(plugin), 'validator should be reused'
+        errors = Task.validate_config({'accept_all': 'invalid'})
+        assert errors, 'invalid config should have errors'
+        # validator is reused, errors from previous validations must not leak
+        assert len(Task.validate_config({'accept_all': 'also invalid'})) == len(errors)
+        assert not Task.validate_config({'accept_all': True})
+        assert Task.validate_config({'accept_all': 'invalid'}) == errors
+
+    def test_task_validation_cache_filesystem(self):
+        import os
+        import shutil
+        from flexget.task import Task
+        from tests import util
+
+        tmp = util.maketemp()
+        path = os.path.join(tmp, 'missing')
+        try:
+            assert Task.validate_config({'download': path}), 'missing path should not be valid'
+            os.mkdir(path)
+            assert not Task.validate_config({'download': path}), 'created path should be valid, result is not cached'
+        finally:
+            shutil.rmtree(tmp)